@@ -0,0 +1,143 @@
+"""
+ASGI 下的异步接口
+
+preview / pdf_info / progress 的 async 版本：数据库查询使用 Django 的异步 ORM，
+PyMuPDF 的打开和渲染交给 offload.pdf_executor 的进程池，事件循环在等待渲染时
+可以继续处理其他请求。响应格式与 FileViewSet 中对应的同步接口一致。
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .docpool import doc_pool
+from .ingest import page_count_path
+from .models import Annotation, File
+from .offload import ExecutorBusy, pdf_executor
+from .preview_cache import cache_relpath, normalize_zoom, preview_cache, render_page_png, source_key
+from .progress import file_progress
+
+
+async def _authenticate(request):
+    """与 DRF 的默认认证一致：先尝试 JWT，再尝试 session"""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    if result is not None:
+        return result[0]
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def login_required(view):
+    async def wrapper(request, *args, **kwargs):
+        request.user = await _authenticate(request)
+        if request.user is None:
+            return JsonResponse(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        try:
+            return await view(request, *args, **kwargs)
+        except ExecutorBusy as e:
+            response = JsonResponse({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = '1'
+            return response
+    wrapper.__name__ = view.__name__
+    wrapper.__doc__ = view.__doc__
+    return wrapper
+
+
+async def _get_file(pk):
+    return await File.objects.filter(pk=pk, is_deleted=False).only(
+        'id', 'name', 'pdf_file', 'checksum', 'page_count', 'file_size', 'uploaded_at'
+    ).afirst()
+
+
+def _not_found():
+    return JsonResponse({'detail': 'No File matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+
+
+async def _page_count(file):
+    if file.page_count > 0:
+        return file.page_count
+    # 老数据没有记录页数时才打开 PDF
+    return await pdf_executor.run(page_count_path, file.pdf_file.path)
+
+
+@login_required
+async def preview(request, pk):
+    file = await _get_file(pk)
+    if file is None:
+        return _not_found()
+    try:
+        page = int(request.GET.get('page', 1))
+        zoom = normalize_zoom(request.GET.get('zoom', 1.0))
+        total_pages = await _page_count(file)
+        if not 1 <= page <= total_pages:
+            return JsonResponse({'error': 'Invalid page number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        relpath = cache_relpath(source_key(file), page, zoom)
+        # 缓存的文件操作（store 可能触发扫描整个缓存目录的淘汰）同样不能阻塞事件循环；
+        # PreviewCache 自带锁，不需要在主线程执行
+        cached = await sync_to_async(preview_cache.lookup, thread_sensitive=False)(relpath)
+        if not cached:
+            size = await pdf_executor.run(
+                render_page_png, file.pdf_file.path, page, zoom, preview_cache.abspath(relpath)
+            )
+            await sync_to_async(preview_cache.store, thread_sensitive=False)(size)
+        return JsonResponse({
+            'preview_url': request.build_absolute_uri(settings.MEDIA_URL + relpath),
+            'page': page,
+            'total_pages': total_pages,
+            'cached': cached
+        })
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@login_required
+async def pdf_info(request, pk):
+    file = await _get_file(pk)
+    if file is None:
+        return _not_found()
+    try:
+        return JsonResponse({
+            'pdf_url': request.build_absolute_uri(file.pdf_file.url),
+            'total_pages': await _page_count(file),
+            'file_name': file.name,
+            'file_size': file.file_size,
+            'uploaded_at': file.uploaded_at
+        })
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@login_required
+async def progress(request, pk):
+    if not await File.objects.filter(pk=pk, is_deleted=False).aexists():
+        return _not_found()
+    counts = await Annotation.objects.filter(file_id=pk, is_deleted=False).order_by('-version').values(
+        'total_fields', 'verified_fields', 'section_progress'
+    ).afirst()
+    if not counts:
+        return JsonResponse({'error': '找不到标注'}, status=status.HTTP_404_NOT_FOUND)
+
+    return JsonResponse(file_progress(counts, Annotation.FIELD_ORDER))
+
+
+@login_required
+async def metrics(request):
+    """PDF 进程池的排队深度、执行耗时，以及预览缓存和文档池的命中统计"""
+    return JsonResponse({
+        'pdf_executor': pdf_executor.metrics(),
+        'preview_cache': preview_cache.stats(),
+        'document_pool': doc_pool.stats()
+    })
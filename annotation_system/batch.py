@@ -0,0 +1,89 @@
+"""
+批量验证
+
+整个批次先逐条校验，全部通过后在同一个事务中用 bulk_create 写入标注
+和对应的历史记录，任何一条失败都不会留下部分结果。
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .history import build_history
+from .models import Annotation, AnnotationHistory, FileProgress
+from .serializers import BatchVerifyItemSerializer
+from .validators import validate_content
+
+_FIELD_TYPES = {choice for choice, _ in Annotation.FIELD_TYPES}
+
+
+def get_field_type(field_path):
+    """根据字段路径的第一段判断字段类型"""
+    section = field_path.split('.', 1)[0]
+    return section if section in _FIELD_TYPES else 'others'
+
+
+def validate_items(items, file_type):
+    """校验整个批次（json_content 按文件类型在 field_path 处的格式校验），
+    返回 (条目列表, None) 或 (None, 每个条目的错误列表)"""
+    if not isinstance(items, list) or not items:
+        return None, [{'error': 'annotations 必须是非空数组'}]
+    serializer = BatchVerifyItemSerializer(data=items, many=True)
+    if not serializer.is_valid():
+        return None, serializer.errors
+    errors = [
+        validate_content(file_type, item['json_content'], item['field_path'])
+        for item in serializer.validated_data
+    ]
+    if any(errors):
+        return None, [{'json_content': item_errors} if item_errors else {} for item_errors in errors]
+    return serializer.validated_data, None
+
+
+def write_batch(file_id, items, user):
+    """在一个事务中写入整个批次，返回每个条目的结果"""
+    annotations = []
+    for item in items:
+        annotation = Annotation(
+            file_id=file_id,
+            field_type=get_field_type(item['field_path']),
+            field_path=item['field_path'],
+            pdf_content=item['pdf_content'],
+            json_content=item['json_content'],
+            position=item['position'],
+            verification_status='verified' if item['is_correct'] else 'incorrect',
+            is_correct=item['is_correct'],
+            confidence_score=item['confidence_score'],
+            comment=item['comment'],
+            annotator=user
+        )
+        annotations.append(annotation.prepare_bulk())
+
+    batch_size = settings.BATCH_CREATE_SIZE
+    with transaction.atomic():
+        Annotation.objects.bulk_create(annotations, batch_size=batch_size)
+        AnnotationHistory.objects.bulk_create([
+            build_history(
+                annotation, user,
+                change_type='verify',
+                description=f'批量验证字段 {annotation.field_path}',
+                field_path=annotation.field_path
+            )
+            for annotation in annotations
+        ], batch_size=batch_size)
+        # 每个涉及的文件都用它版本最高的新标注同步汇总行
+        latest = {}
+        for annotation in annotations:
+            current = latest.get(annotation.file_id)
+            if current is None or annotation.version >= current.version:
+                latest[annotation.file_id] = annotation
+        for annotation in latest.values():
+            FileProgress.track(annotation)
+
+    return [
+        {
+            'index': index,
+            'id': annotation.id,
+            'field_path': annotation.field_path,
+            'verification_status': annotation.verification_status
+        }
+        for index, annotation in enumerate(annotations)
+    ]
@@ -0,0 +1,78 @@
+"""
+JSON 编解码
+
+大的简历标注有数 MB，标准库 json 和 DRF 的 JSONRenderer 编码一次要几十到上百毫秒。
+安装了 orjson（可选依赖）且 JSON_FAST_CODEC 开启时，请求解析、响应渲染和
+json_content 的数据库读写都改用 orjson；未安装或编码遇到 orjson 不支持的数据
+（超出 64 位的整数等）时回退到标准库，输出与 DRF 的 JSON 渲染器语义一致。
+注意 orjson 把超出 64 位范围的整数解析为浮点数（与前端 JavaScript 相同）；
+标注内容都是字符串，需要精确保留这类整数时设置 JSON_FAST_CODEC=0。
+"""
+import json
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+# 时间交给 DRF 的编码器，保持 'Z' 结尾等格式不变；允许非字符串的字典键
+_DUMPS_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+_drf_encoder = DRFJSONEncoder()
+
+
+def enabled():
+    return orjson is not None and settings.JSON_FAST_CODEC
+
+
+def _reject_constant(name):
+    raise ValueError(f'JSON 中不允许出现 {name}')
+
+
+def dumps(data):
+    """编码为紧凑的 UTF-8 JSON 字节"""
+    if enabled():
+        try:
+            return orjson.dumps(data, default=_drf_encoder.default, option=_DUMPS_OPTIONS)
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    return json.dumps(
+        data, cls=DRFJSONEncoder, ensure_ascii=False, allow_nan=False, separators=(',', ':')
+    ).encode()
+
+
+def loads(data):
+    """解析 str 或 UTF-8 字节；NaN / Infinity 视为无效 JSON"""
+    if enabled():
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # 由标准库重新解析，给出与关闭 orjson 时一致的错误信息
+            pass
+    return json.loads(data, parse_constant=_reject_constant)
+
+
+class FastJSONEncoder(json.JSONEncoder):
+    """JSONField 写入数据库时的编码器"""
+
+    def encode(self, o):
+        if enabled():
+            try:
+                return orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS).decode()
+            except (orjson.JSONEncodeError, TypeError):
+                pass
+        return super().encode(o)
+
+
+class FastJSONDecoder(json.JSONDecoder):
+    """JSONField 从数据库读取时的解码器"""
+
+    def decode(self, s, *args, **kwargs):
+        if enabled():
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass
+        return super().decode(s, *args, **kwargs)
@@ -0,0 +1,73 @@
+"""
+HTTP 条件请求
+
+轮询接口先用一次只取版本号的轻量查询算出强 ETag（和 Last-Modified），
+客户端带着 If-None-Match / If-Modified-Since 且内容未变时直接返回 304，
+不加载 json_content 也不做序列化。
+写接口接受 If-Match：与当前 ETag 不一致时返回 412，不执行修改。
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+
+# JSON 接口：允许客户端缓存，但每次使用前必须重新验证
+REVALIDATE = 'private, no-cache'
+# 内容寻址的预览图片永远不会变化
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class PreconditionFailed(Exception):
+    """If-Match 与资源的当前 ETag 不一致"""
+
+    def __init__(self, message, current_version=None):
+        self.current_version = current_version
+        super().__init__(message)
+
+
+def make_etag(*parts):
+    """由版本号等组成部分生成强 ETag"""
+    digest = hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def annotation_validators(values, *extra):
+    """由标注的 id / version / updated_at 生成 (ETag, Last-Modified)；没有标注时 ETag 也是确定的"""
+    if values is None:
+        return make_etag('annotation', None, *extra), None
+    updated_at = values['updated_at']
+    etag = make_etag('annotation', values['id'], values['version'], updated_at.isoformat(), *extra)
+    return etag, updated_at
+
+
+def not_modified(request, etag, last_modified=None, cache_control=REVALIDATE):
+    """条件满足时返回 304（或 412）响应，否则返回 None"""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None
+    )
+    if response is not None and response.status_code == 304:
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+    return response
+
+
+def with_validators(response, etag, last_modified=None, cache_control=REVALIDATE):
+    """给成功的响应加上 ETag / Last-Modified / Cache-Control"""
+    if response.status_code == 200:
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        response['Cache-Control'] = cache_control
+    return response
+
+
+def if_match(request, etags):
+    """没有 If-Match 请求头、为 * 或与 etags 中任意一个相同时返回 True。
+    压缩中间件会把响应的 ETag 改为弱 ETag，内容并未改变，比较时去掉 W/ 前缀"""
+    header = request.headers.get('If-Match')
+    if not header:
+        return True
+    candidates = [etag.removeprefix('W/') for etag in parse_etags(header)]
+    return '*' in candidates or any(etag in candidates for etag in etags)
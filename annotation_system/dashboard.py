@@ -0,0 +1,87 @@
+"""
+进度看板
+
+看板只聚合 FileProgress 汇总表：每个文件一行，保存文件类型、状态、上传人、
+上传日期和最新版本标注的计数，写入标注时同步更新（见 FileProgress.track）。
+因此看板不读取 json_content，也不逐个文件调用 progress 接口；
+参数无效时抛出 ValueError，由视图转换为 400 响应。
+"""
+from django.contrib.auth.models import User
+from django.db.models import Count, F, Q, Sum
+
+from .filters import filter_dashboard
+from .models import FileProgress
+from .progress import progress_payload
+
+# 可用的分组维度 -> 汇总表中的列
+GROUP_FIELDS = {
+    'file_type': 'file_type',
+    'status': 'status',
+    'uploaded_by': 'uploaded_by_id',
+    'day': 'uploaded_on',
+}
+DEFAULT_GROUP_BY = 'file_type,status'
+# 每组的统计：文件数、全部字段已验证的文件数、字段总数和已验证数
+AGGREGATES = {
+    'files': Count('file_id'),
+    'completed_files': Count('file_id', filter=Q(total_fields__gt=0, verified_fields__gte=F('total_fields'))),
+    'total_fields': Sum('total_fields'),
+    'verified_fields': Sum('verified_fields'),
+}
+
+
+def _totals(row):
+    return {
+        'files': row['files'],
+        'completed_files': row['completed_files'],
+        **progress_payload(row['total_fields'] or 0, row['verified_fields'] or 0),
+    }
+
+
+def dashboard(params):
+    """按 group_by 分组返回文件数、完成数和字段进度；提供 ids 时同时返回每个文件的进度"""
+    group_by = [v for v in (params.get('group_by') or DEFAULT_GROUP_BY).split(',') if v]
+    unknown = set(group_by) - GROUP_FIELDS.keys()
+    if unknown:
+        raise ValueError(f'未知的 group_by: {", ".join(sorted(unknown))}')
+
+    rows, ids = filter_dashboard(FileProgress.objects.filter(is_deleted=False), params)
+    columns = [GROUP_FIELDS[name] for name in group_by]
+    groups = list(rows.values(*columns).annotate(**AGGREGATES).order_by(*columns))
+
+    usernames = {}
+    if 'uploaded_by' in group_by:
+        usernames = dict(
+            User.objects.filter(id__in={g['uploaded_by_id'] for g in groups}).values_list('id', 'username')
+        )
+
+    result = {
+        'group_by': group_by,
+        'totals': _totals({
+            name: sum(g[name] or 0 for g in groups) for name in AGGREGATES
+        }),
+        'groups': [
+            {
+                **{name: _group_value(name, g[GROUP_FIELDS[name]], usernames) for name in group_by},
+                **_totals(g),
+            }
+            for g in groups
+        ],
+    }
+    if ids:
+        result['files'] = [
+            {'id': row['file_id'], 'version': row['version'],
+             **progress_payload(row['total_fields'], row['verified_fields'])}
+            for row in rows.values('file_id', 'version', 'total_fields', 'verified_fields').order_by('file_id')
+        ]
+        found = {entry['id'] for entry in result['files']}
+        result['missing_ids'] = [file_id for file_id in ids if file_id not in found]
+    return result
+
+
+def _group_value(name, value, usernames):
+    if name == 'uploaded_by':
+        return {'id': value, 'username': usernames.get(value)}
+    if name == 'day':
+        return value.isoformat()
+    return value
@@ -0,0 +1,144 @@
+"""
+打开的 PyMuPDF 文档池
+
+同步视图不再每次请求都 fitz.open 一遍（每次都要完整解析 xref），而是从这里
+借用已经打开的文档。池按 (文件 ID, checksum) 索引，进程内 LRU：
+- 同时打开的文档数超过 DOCPOOL_MAX_OPEN 时关闭最久未用的；
+- 空闲超过 DOCPOOL_IDLE_SECONDS 的文档在下次借用时关闭；
+- 文件删除时 invalidate 关闭该文件的文档。
+fitz.Document 不是线程安全的，同一文档同一时间只借给一个线程；
+被淘汰时仍在使用的文档在归还后才关闭。
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import fitz
+from django.conf import settings
+
+
+class _Entry:
+    __slots__ = ('doc', 'lock', 'users', 'last_used', 'retired')
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.lock = threading.Lock()
+        self.users = 0
+        self.last_used = time.monotonic()
+        self.retired = False
+
+
+class DocumentPool:
+    """每个进程内一个实例"""
+
+    def __init__(self, max_open=None, idle_seconds=None):
+        self._max_open = max_open
+        self._idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def max_open(self):
+        return self._max_open or settings.DOCPOOL_MAX_OPEN
+
+    @property
+    def idle_seconds(self):
+        return self._idle_seconds or settings.DOCPOOL_IDLE_SECONDS
+
+    @contextmanager
+    def document(self, file):
+        """借用文件对应的已打开文档，退出 with 块时归还"""
+        entry = self._checkout(file)
+        try:
+            with entry.lock:
+                yield entry.doc
+        finally:
+            self._release(entry)
+
+    def _checkout(self, file):
+        key = (file.pk, file.checksum)
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                entry.users += 1
+                return entry
+            self.misses += 1
+
+        # 在全局锁外打开，避免大文件的解析阻塞其他文档的借用
+        doc = fitz.open(file.pdf_file.path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # 其他线程已经打开了同一文档
+                doc.close()
+            else:
+                entry = _Entry(doc)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_open:
+                    _, oldest = self._entries.popitem(last=False)
+                    self._retire(oldest)
+                    self.evictions += 1
+            entry.users += 1
+            return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+            if entry.retired and entry.users == 0:
+                entry.doc.close()
+
+    def _retire(self, entry):
+        """调用方持有 self._lock，且已把 entry 移出索引"""
+        entry.retired = True
+        if entry.users == 0:
+            entry.doc.close()
+
+    def _expire(self):
+        deadline = time.monotonic() - self.idle_seconds
+        for key, entry in list(self._entries.items()):
+            if entry.users == 0 and entry.last_used < deadline:
+                del self._entries[key]
+                self._retire(entry)
+                self.expirations += 1
+
+    def invalidate(self, file_id):
+        """关闭某个文件的所有文档（文件被删除或替换时调用）"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == file_id]:
+                self._retire(self._entries.pop(key))
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            while self._entries:
+                _, entry = self._entries.popitem()
+                self._retire(entry)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'open': len(self._entries),
+                'in_use': sum(1 for entry in self._entries.values() if entry.users),
+                'max_open': self.max_open,
+                'idle_seconds': self.idle_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+doc_pool = DocumentPool()
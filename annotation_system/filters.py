@@ -0,0 +1,129 @@
+"""
+列表、导出接口共用的查询参数过滤
+
+参数无效时抛出 ValueError，由视图转换为 400 响应。
+"""
+from datetime import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Annotation, AnnotationHistory, File
+
+# 看板 ?ids= 一次最多查询的文件数
+MAX_IDS = 1000
+
+
+def parse_time(value, name):
+    """解析 ISO 8601 日期或时间；只有日期时取当天零点，无时区时按当前时区"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{name} 必须是 ISO 8601 日期或时间')
+        parsed = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _choices(params, name, choices):
+    """逗号分隔的多选参数，检查取值是否合法"""
+    values = [v for v in (params.get(name) or '').split(',') if v]
+    unknown = set(values) - {choice for choice, _ in choices}
+    if unknown:
+        raise ValueError(f'未知的 {name}: {", ".join(sorted(unknown))}')
+    return values
+
+
+def _time_range(queryset, params, field):
+    since = params.get('since')
+    if since:
+        queryset = queryset.filter(**{f'{field}__gte': parse_time(since, 'since')})
+    until = params.get('until')
+    if until:
+        queryset = queryset.filter(**{f'{field}__lt': parse_time(until, 'until')})
+    return queryset
+
+
+def filter_history(queryset, params):
+    """按 change_type / modified_by / version / since / until 过滤历史记录"""
+    change_types = _choices(params, 'change_type', AnnotationHistory.CHANGE_TYPES)
+    if change_types:
+        queryset = queryset.filter(change_type__in=change_types)
+
+    modified_by = params.get('modified_by')
+    if modified_by:
+        if modified_by.isdigit():
+            queryset = queryset.filter(modified_by_id=int(modified_by))
+        else:
+            queryset = queryset.filter(modified_by__username=modified_by)
+
+    for param, lookup in (('version', 'version'), ('version_min', 'version__gte'),
+                          ('version_max', 'version__lte')):
+        value = params.get(param)
+        if value:
+            try:
+                queryset = queryset.filter(**{lookup: int(value)})
+            except ValueError:
+                raise ValueError(f'{param} 必须是整数')
+
+    return _time_range(queryset, params, 'modified_at')
+
+
+def filter_export(queryset, params):
+    """按 file_id / file_type / status / verification_status / since / until（上传时间）过滤标注"""
+    file_ids = [v for v in (params.get('file_id') or '').split(',') if v]
+    if file_ids:
+        if not all(v.isdigit() for v in file_ids):
+            raise ValueError('file_id 必须是整数')
+        queryset = queryset.filter(file_id__in=[int(v) for v in file_ids])
+
+    file_types = _choices(params, 'file_type', File.FILE_TYPES)
+    if file_types:
+        queryset = queryset.filter(file__file_type__in=file_types)
+    statuses = _choices(params, 'status', File.STATUS_CHOICES)
+    if statuses:
+        queryset = queryset.filter(file__status__in=statuses)
+    verification = _choices(params, 'verification_status', Annotation.VERIFICATION_STATUS)
+    if verification:
+        queryset = queryset.filter(verification_status__in=verification)
+
+    return _time_range(queryset, params, 'file__uploaded_at')
+
+
+def parse_ids(value):
+    """逗号分隔的文件 ID 列表"""
+    ids = [v for v in (value or '').split(',') if v]
+    if not all(v.isdigit() for v in ids):
+        raise ValueError('ids 必须是逗号分隔的整数')
+    if len(ids) > MAX_IDS:
+        raise ValueError(f'ids 最多 {MAX_IDS} 个')
+    return [int(v) for v in ids]
+
+
+def filter_dashboard(queryset, params):
+    """按 ids / file_type / status / uploaded_by / since / until（上传日期）过滤进度汇总行，
+    返回 (查询集, ids)"""
+    ids = parse_ids(params.get('ids'))
+    if ids:
+        queryset = queryset.filter(file_id__in=ids)
+    file_types = _choices(params, 'file_type', File.FILE_TYPES)
+    if file_types:
+        queryset = queryset.filter(file_type__in=file_types)
+    statuses = _choices(params, 'status', File.STATUS_CHOICES)
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+
+    uploaded_by = params.get('uploaded_by')
+    if uploaded_by:
+        if uploaded_by.isdigit():
+            queryset = queryset.filter(uploaded_by_id=int(uploaded_by))
+        else:
+            queryset = queryset.filter(uploaded_by__username=uploaded_by)
+
+    for param, lookup in (('since', 'uploaded_on__gte'), ('until', 'uploaded_on__lt')):
+        value = params.get(param)
+        if value:
+            queryset = queryset.filter(**{lookup: timezone.localdate(parse_time(value, param))})
+    return queryset, ids
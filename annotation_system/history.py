@@ -0,0 +1,89 @@
+"""
+标注历史的差量存储
+
+每条 AnnotationHistory 记录该版本的完整内容：快照行 (patch 为空) 直接保存在
+new_value 中，差量行只保存相对上一条历史记录内容的 JSON Patch。
+每隔 HISTORY_SNAPSHOT_INTERVAL 条写一次快照，因此还原任意版本最多回放
+HISTORY_SNAPSHOT_INTERVAL - 1 个补丁。历史记录按 (version, id) 排序。
+
+写入时不读取已有的历史记录：Annotation.save_version 根据 history_chain 决定
+保存快照还是差量，差量就是本次请求应用到内容上的操作（JSON Patch 原样保存，
+merge patch 转换为等价操作，整体替换保存与修改前内容的差异）。
+"""
+from .jsonpatch import apply_patch
+from .models import AnnotationHistory
+
+
+def replay(snapshot, patches):
+    """从快照开始依次应用补丁"""
+    content = snapshot
+    for patch in patches:
+        content, _ = apply_patch(content, patch, track=False)
+    return content
+
+
+def _chain(annotation_id, upto=None):
+    """返回 (快照行, 其后的差量行列表)，upto 为 (version, id) 时只取到该行为止"""
+    rows = AnnotationHistory.objects.filter(annotation_id=annotation_id)
+    if upto is not None:
+        version, row_id = upto
+        rows = rows.filter(version__lte=version).exclude(version=version, id__gt=row_id)
+    snapshot = (
+        rows.filter(patch__isnull=True)
+        .order_by('-version', '-id')
+        .values('id', 'version', 'new_value')
+        .first()
+    )
+    if snapshot is None:
+        return None, []
+    deltas = list(
+        rows.filter(patch__isnull=False, version__gte=snapshot['version'])
+        .exclude(version=snapshot['version'], id__lt=snapshot['id'])
+        .order_by('version', 'id')
+        .values_list('patch', flat=True)
+    )
+    return snapshot, deltas
+
+
+def content_at(annotation_id, version):
+    """还原某个版本（同一版本有多条记录时取最后一条）的完整内容；版本不存在时返回 None"""
+    row = (
+        AnnotationHistory.objects.filter(annotation_id=annotation_id, version=version)
+        .order_by('-id')
+        .values('id')
+        .first()
+    )
+    if row is None:
+        return None
+    snapshot, deltas = _chain(annotation_id, upto=(version, row['id']))
+    if snapshot is None:
+        return None
+    return replay(snapshot['new_value'], deltas)
+
+
+def build_history(annotation, user, *, change_type, description, field_path='root',
+                  verification_status=None):
+    """构造（不保存）记录标注当前内容的历史行：save_version 留下差量时保存差量，否则保存快照"""
+    patch = annotation.history_patch
+    return AnnotationHistory(
+        annotation=annotation,
+        field_path=field_path,
+        old_value=None,
+        new_value=annotation.json_content if patch is None else None,
+        patch=patch,
+        pdf_content=annotation.pdf_content,
+        position=annotation.position or {},
+        verification_status=verification_status or annotation.verification_status,
+        change_type=change_type,
+        change_description=description,
+        modified_by=user,
+        version=annotation.version
+    )
+
+
+def record_history(annotation, user, **kwargs):
+    """在 save_version 创建新版本后为标注写入一条历史记录"""
+    entry = build_history(annotation, user, **kwargs)
+    entry.save()
+    annotation.history_patch = None
+    return entry
@@ -0,0 +1,292 @@
+"""
+批量导入 PDF + JSON 文件对
+
+目录（或解压后的 zip）中同一相对路径、同名的 foo.pdf 与 foo.json 组成一对。
+PDF 解析、校验和和 JSON 解析在进程池中并行执行，主进程按批在一个事务中
+bulk_create File、Annotation 和初始 AnnotationHistory。
+先并行计算全部 PDF 的校验和，与上传去重（File.find_blob）一样，已存储过相同内容的
+PDF 直接复用已有的 blob、页数和各页文本，不再解析。
+
+每批提交后把已导入的相对路径追加到检查点文件；File.metadata 中也记录了
+导入批次和相对路径，因此即使在提交之后、写检查点之前崩溃，重新运行时
+也不会重复导入。PDF 和 JSON 都按内容寻址存储，中断前已写入存储的文件重新运行时
+直接复用，不会留下重复的副本。
+"""
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .history import build_history
+from .ingest import inspect_pair, json_blob_name, sha256_or_none, store_blob
+from .models import Annotation, AnnotationHistory, File, FileProgress, PageText
+from .prerender import prerenderer
+from .preview_cache import lower_priority
+from .validators import validate_content
+
+
+def pair_files(root):
+    """返回 ([(相对路径不含扩展名, pdf 路径, json 路径)], [缺少配对的相对路径])"""
+    pdfs, jsons = {}, {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith(('.', '__MACOSX')))
+        for filename in filenames:
+            stem, ext = os.path.splitext(filename)
+            path = os.path.join(dirpath, filename)
+            key = os.path.relpath(os.path.join(dirpath, stem), root).replace(os.sep, '/')
+            if ext.lower() == '.pdf':
+                pdfs[key] = path
+            elif ext.lower() == '.json':
+                jsons[key] = path
+    pairs = [(key, pdfs[key], jsons[key]) for key in sorted(pdfs.keys() & jsons.keys())]
+    unpaired = sorted(pdfs.keys() ^ jsons.keys())
+    return pairs, unpaired
+
+
+def extract_archive(archive_path, dest):
+    """解压 zip，拒绝解压到目标目录之外的条目"""
+    dest = os.path.realpath(dest)
+    with zipfile.ZipFile(archive_path) as archive:
+        for member in archive.infolist():
+            target = os.path.realpath(os.path.join(dest, member.filename))
+            if target != dest and not target.startswith(dest + os.sep):
+                raise ValueError(f'压缩包中的路径不安全: {member.filename}')
+        archive.extractall(dest)
+    return dest
+
+
+def _with_throughput(stats, start):
+    elapsed = time.perf_counter() - start
+    return {
+        **stats,
+        'seconds': round(elapsed, 2),
+        'files_per_second': round(stats['imported'] / elapsed, 2) if elapsed else 0.0
+    }
+
+
+class Checkpoint:
+    """检查点文件：第一行为导入批次信息，之后每行一个已导入的相对路径"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self.run_id = None
+        self.resumed = bool(path and os.path.exists(path))
+        if self.resumed:
+            with open(path, encoding='utf-8') as fh:
+                header = fh.readline()
+                if header:
+                    self.run_id = json.loads(header)['run']
+                self.done.update(line.rstrip('\n') for line in fh if line.strip())
+        if self.run_id is None:
+            self.run_id = uuid.uuid4().hex
+            if path:
+                with open(path, 'w', encoding='utf-8') as fh:
+                    fh.write(json.dumps({'run': self.run_id}) + '\n')
+
+    def recover(self):
+        """补上已提交但未写入检查点的文件"""
+        if not self.resumed:
+            return 0
+        keys = File.objects.filter(metadata__import_run=self.run_id).values_list(
+            'metadata__import_source', flat=True
+        )
+        missing = set(keys) - self.done
+        self.mark(missing)
+        return len(missing)
+
+    def mark(self, keys):
+        keys = [key for key in keys if key not in self.done]
+        if not keys:
+            return
+        self.done.update(keys)
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as fh:
+                fh.write(''.join(f'{key}\n' for key in keys))
+                fh.flush()
+                os.fsync(fh.fileno())
+
+
+class FileImporter:
+    def __init__(self, user, *, file_type='cv', batch_size=None, workers=None,
+                 checkpoint_path=None, prerender=False, progress=None):
+        self.user = user
+        self.file_type = file_type
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.workers = workers or settings.IMPORT_WORKERS or os.cpu_count() or 1
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.prerender = prerender and settings.PRERENDER_ENABLED
+        # 每批提交后回调 progress(统计信息)
+        self.progress = progress
+
+    def run(self, source):
+        """导入目录或 zip 中的所有文件对，返回统计信息"""
+        if os.path.isfile(source) and zipfile.is_zipfile(source):
+            with tempfile.TemporaryDirectory() as root:
+                return self.run_directory(extract_archive(source, root))
+        return self.run_directory(source)
+
+    def run_directory(self, root):
+        start = time.perf_counter()
+        pairs, unpaired = pair_files(root)
+        recovered = self.checkpoint.recover()
+        todo = [pair for pair in pairs if pair[0] not in self.checkpoint.done]
+        stats = {
+            'run_id': self.checkpoint.run_id,
+            'pairs': len(pairs),
+            'skipped': len(pairs) - len(todo),
+            'recovered': recovered,
+            'imported': 0,
+            'reused': 0,
+            'failed': [],
+            'unpaired': unpaired,
+        }
+
+        if todo:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=lower_priority,
+                initargs=(settings.PRERENDER_NICE,),
+            ) as executor:
+                chunksize = max(1, min(16, len(todo) // (self.workers * 4) or 1))
+                pdf_paths = [pdf_path for _, pdf_path, _ in todo]
+                # 先算校验和：已存储过的 PDF 在第二轮只解析 JSON
+                checksums = list(executor.map(sha256_or_none, pdf_paths, chunksize=chunksize))
+                known = self._known_blobs(checksums)
+                stats['reused'] = sum(1 for checksum in checksums if checksum in known)
+                results = executor.map(
+                    inspect_pair,
+                    pdf_paths,
+                    [json_path for _, _, json_path in todo],
+                    checksums,
+                    [checksum not in known for checksum in checksums],
+                    chunksize=chunksize
+                )
+                batch = []
+                for pair, info in zip(todo, results):
+                    if 'error' in info:
+                        stats['failed'].append({'source': pair[0], 'error': info['error']})
+                        continue
+                    existing = known.get(info['checksum'])
+                    if existing is not None:
+                        info.update(pdf_name=existing.pdf_file.name, page_count=existing.page_count,
+                                    pages=None, pages_of=existing.pk)
+                    errors = validate_content(self.file_type, info['json_content'])
+                    if errors:
+                        first = errors[0]
+                        stats['failed'].append({
+                            'source': pair[0],
+                            'error': f'JSON 格式错误 {len(errors)} 处，首个在 {first["path"] or "根"}: {first["message"]}',
+                            'errors': errors
+                        })
+                        continue
+                    batch.append((pair, info))
+                    if len(batch) >= self.batch_size:
+                        self._commit(batch, stats, start)
+                        batch = []
+                if batch:
+                    self._commit(batch, stats, start)
+
+        return _with_throughput(stats, start)
+
+    def _known_blobs(self, checksums):
+        """已存储过且有各页文本的 PDF：{checksum: 文件}；存储中的 blob 已不存在时不复用"""
+        known = {}
+        checksums = sorted({checksum for checksum in checksums if checksum})
+        for start in range(0, len(checksums), 500):
+            found = File.find_blobs(checksums[start:start + 500])
+            with_pages = set(
+                PageText.objects.filter(file_id__in=[file.pk for file in found.values()])
+                .values_list('file_id', flat=True).distinct()
+            )
+            known.update(
+                (checksum, file) for checksum, file in found.items()
+                if file.pk in with_pages and default_storage.exists(file.pdf_file.name)
+            )
+        return known
+
+    def _commit(self, batch, stats, start):
+        files = self._write_batch(batch)
+        self.checkpoint.mark(pair[0] for pair, _ in batch)
+        stats['imported'] += len(files)
+        if self.prerender:
+            for file in files:
+                prerenderer.enqueue(file)
+        if self.progress:
+            self.progress(_with_throughput(stats, start))
+
+    def _write_batch(self, batch):
+        files = []
+        for (key, pdf_path, json_path), info in batch:
+            # 文件内容写入存储在事务外完成；PDF 和 JSON 都按内容寻址，重复写入是幂等的
+            pdf_name = info.get('pdf_name')
+            if pdf_name is None:
+                with open(pdf_path, 'rb') as fh:
+                    pdf_name = store_blob(DjangoFile(fh), info['checksum'])
+            with open(json_path, 'rb') as fh:
+                json_name = store_blob(DjangoFile(fh), info['json_checksum'], json_blob_name(info['json_checksum']))
+            files.append(File(
+                pdf_file=pdf_name,
+                json_file=json_name,
+                name=os.path.basename(key),
+                file_type=self.file_type,
+                status='processing' if self.prerender else 'ready',
+                uploaded_by=self.user,
+                page_count=info['page_count'],
+                file_size=info['file_size'],
+                checksum=info['checksum'],
+                metadata={
+                    'json_structure': list(info['json_content'].keys()),
+                    'import_run': self.checkpoint.run_id,
+                    'import_source': key
+                }
+            ))
+
+        # 复用已有 PDF 的文件从原文件复制各页文本
+        reused_pages = defaultdict(list)
+        rows = PageText.objects.filter(
+            file_id__in={info['pages_of'] for _, info in batch if info.get('pages_of')}
+        ).order_by('file_id', 'page').values_list('file_id', 'text')
+        for file_id, text in rows:
+            reused_pages[file_id].append(text)
+
+        batch_size = settings.BATCH_CREATE_SIZE
+        with transaction.atomic():
+            File.objects.bulk_create(files, batch_size=batch_size)
+            annotations = Annotation.objects.bulk_create([
+                Annotation(
+                    file=file,
+                    field_type='root',
+                    field_path='root',
+                    pdf_content='',
+                    json_content=info['json_content'],
+                    position={},
+                    verification_status='pending',
+                    annotator=self.user,
+                    version=1
+                ).prepare_bulk()
+                for file, (_, info) in zip(files, batch)
+            ], batch_size=batch_size)
+            AnnotationHistory.objects.bulk_create([
+                build_history(annotation, self.user, change_type='create', description='创建初始JSON')
+                for annotation in annotations
+            ], batch_size=batch_size)
+            PageText.objects.bulk_create([
+                page for file, (_, info) in zip(files, batch)
+                for page in PageText.for_file(file, info['pages'] or reused_pages[info.get('pages_of')])
+            ], batch_size=batch_size)
+            FileProgress.objects.bulk_create([
+                FileProgress.for_file(file, annotation) for file, annotation in zip(files, annotations)
+            ], batch_size=batch_size)
+        return files
@@ -0,0 +1,159 @@
+"""
+上传文件的流式处理
+
+校验和按块增量计算；超过 FILE_UPLOAD_MAX_MEMORY_SIZE 的上传已由 Django
+落盘为临时文件，PyMuPDF 直接按路径打开它而不是在内存中再复制一份，
+因此单次上传的额外内存占用与 PDF 大小无关。
+
+上传时同时逐页提取文本（page_texts），写入 PageText 供全文搜索。
+
+inspect_pair、inspect_pages、page_count_path、sha256_or_none 供批量导入和异步视图的进程池在子进程中调用，因此本模块不能依赖已加载的 Django 应用。
+"""
+import codecs
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+import fitz
+from django.core.files.storage import default_storage
+
+CHUNK_SIZE = 1024 * 1024
+BLOB_DIR = 'blobs'
+JSON_DIR = 'jsons'
+# 单页最多保留的文本长度；PostgreSQL 的 tsvector 不能超过 1MB
+PAGE_TEXT_LIMIT = 100000
+
+
+def blob_name(checksum):
+    """内容寻址的 PDF 存储路径：blobs/ab/abcdef....pdf"""
+    return f'{BLOB_DIR}/{checksum[:2]}/{checksum}.pdf'
+
+
+def json_blob_name(checksum):
+    """内容寻址的 JSON 存储路径：jsons/ab/abcdef....json"""
+    return f'{JSON_DIR}/{checksum[:2]}/{checksum}.json'
+
+
+def store_blob(uploaded_file, checksum, name=None):
+    """内容不存在时写入 blob 存储，返回存储路径；name 默认为 PDF 的 blob 路径"""
+    name = name or blob_name(checksum)
+    if default_storage.exists(name):
+        return name
+    uploaded_file.seek(0)
+    return default_storage.save(name, uploaded_file)
+
+
+def sha256_of(uploaded_file):
+    """按块计算 SHA-256，结束后把文件指针复位"""
+    digest = hashlib.sha256()
+    uploaded_file.seek(0)
+    for chunk in uploaded_file.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+@contextmanager
+def open_pdf(uploaded_file):
+    """打开上传的 PDF：临时文件按路径打开，内存中的小文件直接复用其缓冲区"""
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        pdf_doc = fitz.open(uploaded_file.temporary_file_path())
+    else:
+        uploaded_file.seek(0)
+        pdf_doc = fitz.open(stream=uploaded_file.file.getbuffer(), filetype='pdf')
+    try:
+        yield pdf_doc
+    finally:
+        pdf_doc.close()
+        uploaded_file.seek(0)
+
+
+def count_pages(uploaded_file):
+    with open_pdf(uploaded_file) as pdf_doc:
+        return len(pdf_doc)
+
+
+def page_texts(pdf_doc):
+    """逐页提取文本；去掉数据库不接受的 NUL 字符"""
+    return [page.get_text().replace('\x00', '')[:PAGE_TEXT_LIMIT] for page in pdf_doc]
+
+
+def extract_pages(uploaded_file):
+    """返回上传 PDF 每一页的文本，列表长度即页数"""
+    with open_pdf(uploaded_file) as pdf_doc:
+        return page_texts(pdf_doc)
+
+
+def inspect_pdf(uploaded_file):
+    """返回 (checksum, page_count, file_size)"""
+    checksum = sha256_of(uploaded_file)
+    return checksum, count_pages(uploaded_file), uploaded_file.size
+
+
+def load_json(uploaded_file):
+    """边按块解码边拼接文本后解析 JSON，不保留原始字节副本（兼容 UTF-8 BOM）"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    uploaded_file.seek(0)
+    parts = [decoder.decode(chunk) for chunk in uploaded_file.chunks(CHUNK_SIZE)]
+    parts.append(decoder.decode(b'', final=True))
+    uploaded_file.seek(0)
+    return json.loads(''.join(parts))
+
+
+def sha256_path(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sha256_or_none(path):
+    """文件无法读取时返回 None，错误留给 inspect_pair 报告"""
+    try:
+        return sha256_path(path)
+    except OSError:
+        return None
+
+
+def page_count_path(pdf_path):
+    with fitz.open(pdf_path) as pdf_doc:
+        return len(pdf_doc)
+
+
+def page_texts_path(pdf_path):
+    with fitz.open(pdf_path) as pdf_doc:
+        return page_texts(pdf_doc)
+
+
+def inspect_pages(pdf_path):
+    """提取 PDF 每页文本；失败时返回 {'error': ...}"""
+    try:
+        return {'pages': page_texts_path(pdf_path)}
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+
+
+def inspect_pair(pdf_path, json_path, checksum=None, parse_pdf=True):
+    """计算 PDF 的校验和、页数、大小，提取每页文本并解析 JSON；失败时返回 {'error': ...}。
+    已知校验和时直接使用；parse_pdf 为 False（相同内容已导入过）时不打开 PDF，不返回页数和文本"""
+    try:
+        info = {}
+        if parse_pdf:
+            pages = page_texts_path(pdf_path)
+            info.update(page_count=len(pages), pages=pages)
+        with open(json_path, 'rb') as fh:
+            raw = fh.read()
+        json_content = json.loads(raw.decode('utf-8-sig'))
+        if not isinstance(json_content, dict):
+            raise ValueError('JSON 顶层必须是对象')
+        info.update(
+            checksum=checksum or sha256_path(pdf_path),
+            file_size=os.path.getsize(pdf_path),
+            json_content=json_content,
+            json_checksum=hashlib.sha256(raw).hexdigest()
+        )
+        return info
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
@@ -0,0 +1,55 @@
+"""
+后台任务
+
+请求线程把任务写入 BatchJob 后提交到这里的线程池，状态依次为
+pending -> running -> completed / failed，结果写回 BatchJob.results。
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import BatchJob
+
+logger = logging.getLogger(__name__)
+
+
+class JobRunner:
+    """进程内的后台线程池；每个进程内一个实例"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, job_id, func, *args):
+        """在后台执行 func(*args)，其返回值保存为任务结果"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, settings.BATCH_JOB_WORKERS),
+                    thread_name_prefix='batch-job'
+                )
+        return self._executor.submit(self._run, job_id, func, args)
+
+    def _run(self, job_id, func, args):
+        close_old_connections()
+        try:
+            BatchJob.objects.filter(pk=job_id).update(status='running')
+            results = func(*args)
+            BatchJob.objects.filter(pk=job_id).update(
+                status='completed', results=results, finished_at=timezone.now()
+            )
+        except Exception as e:
+            logger.exception('后台任务 %s 失败', job_id)
+            BatchJob.objects.filter(pk=job_id).update(
+                status='failed', error=str(e), finished_at=timezone.now()
+            )
+        finally:
+            # 线程池中的线程不经过请求周期，需要自己关闭连接
+            connection.close()
+
+
+job_runner = JobRunner()
@@ -0,0 +1,262 @@
+"""
+JSON Patch (RFC 6902) 与 JSON Merge Patch (RFC 7396)
+
+补丁直接作用在传入的文档上，同时按顶层字段累计进度计数的变化量
+{字段: [总数变化, 已验证数变化]}，使写入的代价只与修改的大小有关。
+替换整个文档（path 为空）时返回的变化量为 None，表示需要全量重新统计。
+"""
+import copy
+
+from .progress import entry_counts, item_counts
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+def parse_pointer(pointer):
+    """把 JSON Pointer 解析为路径片段列表"""
+    if pointer == '':
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise JsonPatchError(f'无效的路径: {pointer}')
+    return [part.replace('~1', '/').replace('~0', '~') for part in pointer[1:].split('/')]
+
+
+def _list_index(container, token, allow_end=False):
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith('0')):
+        raise JsonPatchError(f'无效的数组下标: {token}')
+    index = int(token)
+    limit = len(container) + 1 if allow_end else len(container)
+    if index >= limit:
+        raise JsonPatchError(f'数组下标越界: {token}')
+    return index
+
+
+def _resolve(doc, tokens):
+    node = doc
+    for token in tokens:
+        if isinstance(node, dict):
+            if token not in node:
+                raise JsonPatchError(f'路径不存在: /{"/".join(tokens)}')
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_list_index(node, token)]
+        else:
+            raise JsonPatchError(f'路径不存在: /{"/".join(tokens)}')
+    return node
+
+
+def _no_counts(*args):
+    return 0, 0
+
+
+class _Patcher:
+    def __init__(self, doc, track=True):
+        self.doc = doc
+        self.deltas = {}
+        self.full_recount = not isinstance(doc, dict)
+        # 回放历史补丁时不需要统计进度
+        self._entry = entry_counts if track else _no_counts
+        self._item = item_counts if track else _no_counts
+
+    def _track(self, tokens, old, new):
+        if self.full_recount or not tokens:
+            self.full_recount = True
+            return
+        delta = self.deltas.setdefault(tokens[0], [0, 0])
+        delta[0] += new[0] - old[0]
+        delta[1] += new[1] - old[1]
+
+    def add(self, tokens, value):
+        if not tokens:
+            self.doc = value
+            self.full_recount = True
+            return
+        parent = _resolve(self.doc, tokens[:-1])
+        key = tokens[-1]
+        if isinstance(parent, dict):
+            old = self._entry(key, parent[key]) if key in parent else (0, 0)
+            parent[key] = value
+            self._track(tokens, old, self._entry(key, value))
+        elif isinstance(parent, list):
+            parent.insert(_list_index(parent, key, allow_end=True), value)
+            self._track(tokens, (0, 0), self._item(value))
+        else:
+            raise JsonPatchError(f'无法在非容器上添加: /{"/".join(tokens)}')
+
+    def remove(self, tokens):
+        if not tokens:
+            raise JsonPatchError('不能删除整个文档')
+        parent = _resolve(self.doc, tokens[:-1])
+        key = tokens[-1]
+        if isinstance(parent, dict):
+            if key not in parent:
+                raise JsonPatchError(f'路径不存在: /{"/".join(tokens)}')
+            value = parent.pop(key)
+            self._track(tokens, self._entry(key, value), (0, 0))
+        elif isinstance(parent, list):
+            value = parent.pop(_list_index(parent, key))
+            self._track(tokens, self._item(value), (0, 0))
+        else:
+            raise JsonPatchError(f'路径不存在: /{"/".join(tokens)}')
+        return value
+
+    def replace(self, tokens, value):
+        if not tokens:
+            self.doc = value
+            self.full_recount = True
+            return
+        parent = _resolve(self.doc, tokens[:-1])
+        key = tokens[-1]
+        if isinstance(parent, dict):
+            if key not in parent:
+                raise JsonPatchError(f'路径不存在: /{"/".join(tokens)}')
+            old = self._entry(key, parent[key])
+            parent[key] = value
+            self._track(tokens, old, self._entry(key, value))
+        elif isinstance(parent, list):
+            index = _list_index(parent, key)
+            old = self._item(parent[index])
+            parent[index] = value
+            self._track(tokens, old, self._item(value))
+        else:
+            raise JsonPatchError(f'路径不存在: /{"/".join(tokens)}')
+
+    def apply(self, op):
+        if not isinstance(op, dict) or 'op' not in op or 'path' not in op:
+            raise JsonPatchError(f'无效的补丁操作: {op}')
+        name = op['op']
+        tokens = parse_pointer(op['path'])
+        if name in ('add', 'replace', 'test') and 'value' not in op:
+            raise JsonPatchError(f'{name} 操作缺少 value')
+        if name in ('move', 'copy') and 'from' not in op:
+            raise JsonPatchError(f'{name} 操作缺少 from')
+
+        # add / replace 插入值的副本：文档与补丁不共享可变对象，之后的操作不会改写补丁本身
+        if name == 'add':
+            self.add(tokens, copy.deepcopy(op['value']))
+        elif name == 'remove':
+            self.remove(tokens)
+        elif name == 'replace':
+            self.replace(tokens, copy.deepcopy(op['value']))
+        elif name == 'move':
+            source = parse_pointer(op['from'])
+            if tokens[:len(source)] == source and tokens != source:
+                raise JsonPatchError('不能把节点移动到它自己的子节点中')
+            if tokens != source:
+                self.add(tokens, self.remove(source))
+        elif name == 'copy':
+            self.add(tokens, copy.deepcopy(_resolve(self.doc, parse_pointer(op['from']))))
+        elif name == 'test':
+            if not _equal(_resolve(self.doc, tokens), op['value']):
+                raise JsonPatchError(f'test 操作失败: {op["path"]}')
+        else:
+            raise JsonPatchError(f'不支持的补丁操作: {name}')
+
+
+def _strip_nulls(value):
+    """merge patch 中新增的对象不保留值为 null 的成员"""
+    if isinstance(value, dict):
+        return {k: _strip_nulls(v) for k, v in value.items() if v is not None}
+    return value
+
+
+def apply_patch(doc, operations, track=True):
+    """应用 RFC 6902 补丁，返回 (新文档, 分段计数变化量或 None)"""
+    if not isinstance(operations, list):
+        raise JsonPatchError('JSON Patch 必须是操作数组')
+    patcher = _Patcher(doc, track)
+    for op in operations:
+        patcher.apply(op)
+    return patcher.doc, None if patcher.full_recount else patcher.deltas
+
+
+def merge_patch_ops(doc, patch):
+    """把 RFC 7396 merge patch 转换为作用在 doc 上的等价 RFC 6902 操作，只遍历补丁本身"""
+    if not isinstance(patch, dict) or not isinstance(doc, dict):
+        return [{'op': 'replace', 'path': '', 'value': _strip_nulls(patch)}]
+    ops = []
+    _merge_ops(doc, patch, '', ops)
+    return ops
+
+
+def _merge_ops(target, patch, path, ops):
+    for key, value in patch.items():
+        child = f'{path}/{_escape(key)}'
+        if value is None:
+            if key in target:
+                ops.append({'op': 'remove', 'path': child})
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge_ops(target[key], value, child, ops)
+        else:
+            ops.append({'op': 'add', 'path': child, 'value': _strip_nulls(value)})
+
+
+def apply_merge_patch(doc, patch):
+    """应用 RFC 7396 merge patch，返回 (新文档, 分段计数变化量或 None)"""
+    return apply_patch(doc, merge_patch_ops(doc, patch))
+
+def _escape(token):
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def to_pointer(tokens):
+    """把路径片段列表转换为 JSON Pointer"""
+    return ''.join(f'/{_escape(token)}' for token in tokens)
+
+
+def _equal(a, b):
+    """严格相等：区分 1、1.0 与 True"""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_equal(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _diff(old, new, path, ops):
+    if old is new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': f'{path}/{_escape(key)}'})
+        for key, value in new.items():
+            child = f'{path}/{_escape(key)}'
+            if key not in old:
+                ops.append({'op': 'add', 'path': child, 'value': value})
+            else:
+                _diff(old[key], value, child, ops)
+    elif isinstance(old, list) and isinstance(new, list):
+        # 去掉公共前缀和后缀，中间部分等长时逐项比较，否则删除后重新插入
+        start = 0
+        limit = min(len(old), len(new))
+        while start < limit and _equal(old[start], new[start]):
+            start += 1
+        end = 0
+        while end < limit - start and _equal(old[-1 - end], new[-1 - end]):
+            end += 1
+        old_mid = old[start:len(old) - end]
+        new_mid = new[start:len(new) - end]
+        if len(old_mid) == len(new_mid):
+            for offset, (a, b) in enumerate(zip(old_mid, new_mid)):
+                _diff(a, b, f'{path}/{start + offset}', ops)
+        else:
+            for _ in old_mid:
+                ops.append({'op': 'remove', 'path': f'{path}/{start}'})
+            for offset, value in enumerate(new_mid):
+                ops.append({'op': 'add', 'path': f'{path}/{start + offset}', 'value': value})
+    elif not _equal(old, new):
+        ops.append({'op': 'replace', 'path': path, 'value': new})
+
+
+def make_patch(old, new):
+    """生成把 old 变为 new 的 RFC 6902 补丁"""
+    ops = []
+    _diff(old, new, '', ops)
+    return ops
@@ -0,0 +1,90 @@
+import gzip
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from annotation_system import codec
+from annotation_system.middleware import brotli
+from annotation_system.models import Annotation
+from annotation_system.parsers import FastJSONParser
+from annotation_system.renderers import FastJSONRenderer
+
+from .bench_history import synthetic_cv
+
+
+def timed(func, repeat):
+    """返回最短一次的耗时（毫秒）和结果"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+class Command(BaseCommand):
+    help = '在合成的大简历上比较标准库与 orjson 的解析、渲染、数据库编解码耗时，以及压缩率'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--publications', type=int, default=45000, help='论文条数，默认约 5 MB')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        content = synthetic_cv(options['publications'])
+        # 与接口响应的结构相同：标注字段 + data
+        data = {'id': 1, 'version': 7, 'verification_status': 'pending', 'data': content}
+        body = json.dumps(content, ensure_ascii=False).encode()
+        field = Annotation._meta.get_field('json_content')
+        self.stdout.write(f'请求体 {len(body) / 1024 ** 2:.2f} MB')
+
+        stages = {
+            '解析请求体': lambda: FastJSONParser().parse(io.BytesIO(body)),
+            '渲染响应': lambda: FastJSONRenderer().render(data),
+            '写入编码': lambda: field.get_db_prep_value(content, connection),
+            '读取解码': lambda: field.from_db_value(stored, None, connection),
+        }
+        stored = field.get_db_prep_value(content, connection)
+        results = {}
+        for fast in (False, True):
+            with override_settings(JSON_FAST_CODEC=fast):
+                if fast and not codec.enabled():
+                    self.stdout.write(self.style.WARNING('未安装 orjson，只测标准库'))
+                    break
+                for name, func in stages.items():
+                    results.setdefault(name, []).append(timed(func, repeat))
+
+        self.stdout.write(f'{"阶段":<8}{"标准库":>10}{"orjson":>10}{"加速":>8}')
+        for name, runs in results.items():
+            line = f'{name:<8}{runs[0][0]:>9.1f}ms'
+            if len(runs) == 2:
+                # 两条路径的结果必须语义相同
+                before, after = runs[0][1], runs[1][1]
+                if name in ('渲染响应', '写入编码'):
+                    before, after = json.loads(before), json.loads(after)
+                if before != after:
+                    self.stderr.write(f'{name}：两种编解码的结果不同')
+                line += f'{runs[1][0]:>9.1f}ms{runs[0][0] / runs[1][0]:>7.1f}x'
+            self.stdout.write(line)
+
+        rendered = FastJSONRenderer().render(data)
+        self.stdout.write(f'\n响应压缩（{len(rendered) / 1024 ** 2:.2f} MB）')
+        codecs = {f'gzip {level}': (lambda level=level: gzip.compress(rendered, level, mtime=0)) for level in (1, 6)}
+        if brotli is not None:
+            codecs.update({
+                f'brotli {quality}': (lambda quality=quality: brotli.compress(rendered, quality=quality))
+                for quality in (4, 6)
+            })
+        else:
+            self.stdout.write(self.style.WARNING('未安装 brotli，只测 gzip'))
+        for name, func in codecs.items():
+            elapsed, compressed = timed(func, repeat)
+            self.stdout.write(
+                f'{name:<10}{elapsed:>8.1f}ms  {len(compressed) / 1024:>8.0f} KB'
+                f'  ({len(compressed) / len(rendered):.1%})'
+            )
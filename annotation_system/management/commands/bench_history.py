@@ -0,0 +1,105 @@
+import copy
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from annotation_system.history import replay
+from annotation_system.jsonpatch import make_patch
+from annotation_system.progress import VERIFIED_SUFFIX
+
+
+def synthetic_cv(publications):
+    return {
+        'personal_info': {
+            'name': 'Sean Wu', 'title': 'Professor', 'address': '300 Pasteur Dr',
+            'contact_info': {'email': 'sean@example.org', 'phone': '650-000-0000'}
+        },
+        'education': {f'degree_{i}': f'University {i}, 19{70 + i}' for i in range(5)},
+        'appointments': {f'appointment_{i}': f'Department {i}, 20{10 + i}' for i in range(20)},
+        'honors': [f'Honor number {i}' for i in range(50)],
+        'grants': {f'grant_{i}': {'title': f'Grant {i}', 'amount': f'${i * 1000}'} for i in range(40)},
+        'publications': {
+            'peer_reviewed_articles': [
+                {'title': f'Article {i} on cardiac regeneration',
+                 'authors': 'Wu S, Smith J, Doe A', 'journal': 'Nature', 'year': str(2000 + i % 24)}
+                for i in range(publications)
+            ]
+        }
+    }
+
+
+def random_edit(content, rng):
+    """模拟一次审阅操作：验证字段、修改值、增删论文"""
+    articles = content['publications']['peer_reviewed_articles']
+    choice = rng.random()
+    if choice < 0.5:
+        article = rng.choice(articles)
+        keys = [k for k in article if not k.endswith(VERIFIED_SUFFIX)]
+        if keys:
+            key = rng.choice(keys)
+            article[key + VERIFIED_SUFFIX] = article.pop(key)
+    elif choice < 0.8:
+        article = rng.choice(articles)
+        key = rng.choice(list(article))
+        article[key] = f'{article[key]} (corrected)'
+    elif choice < 0.9:
+        articles.insert(rng.randrange(len(articles)), {'title': 'New article', 'year': '2024'})
+    else:
+        articles.pop(rng.randrange(len(articles)))
+
+
+class Command(BaseCommand):
+    help = '比较完整内容与快照 + 差量两种历史格式的存储大小和还原耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--versions', type=int, default=500)
+        parser.add_argument('--publications', type=int, default=1500)
+        parser.add_argument('--interval', type=int, default=settings.HISTORY_SNAPSHOT_INTERVAL)
+        parser.add_argument('--samples', type=int, default=200)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        interval = options['interval']
+        content = synthetic_cv(options['publications'])
+
+        # 两种格式下每条历史记录在数据库中的序列化内容
+        full_rows = []
+        delta_rows = []
+        previous = None
+        for index in range(options['versions']):
+            if index:
+                random_edit(content, rng)
+            encoded = json.dumps(content)
+            full_rows.append((json.dumps(previous) if previous is not None else None, encoded))
+            if index % interval == 0:
+                delta_rows.append((encoded, None))
+            else:
+                delta_rows.append((None, json.dumps(make_patch(previous, content))))
+            previous = copy.deepcopy(content)
+
+        full_size = sum(len(old or '') + len(new) for old, new in full_rows)
+        delta_size = sum(len(value or '') for row in delta_rows for value in row)
+
+        targets = [rng.randrange(len(full_rows)) for _ in range(options['samples'])]
+
+        start = time.perf_counter()
+        for version in targets:
+            json.loads(full_rows[version][1])
+        full_ms = (time.perf_counter() - start) / len(targets) * 1000
+
+        start = time.perf_counter()
+        for version in targets:
+            base = version - version % interval
+            replay(
+                json.loads(delta_rows[base][0]),
+                [json.loads(delta_rows[i][1]) for i in range(base + 1, version + 1)]
+            )
+        delta_ms = (time.perf_counter() - start) / len(targets) * 1000
+
+        self.stdout.write(f'文档大小: {len(full_rows[-1][1]) / 1024:.0f} KB，版本数: {len(full_rows)}')
+        self.stdout.write(f'{"format":>12} {"storage MB":>12} {"restore ms":>12}')
+        self.stdout.write(f'{"full":>12} {full_size / 1024 ** 2:>12.2f} {full_ms:>12.2f}')
+        self.stdout.write(f'{"delta":>12} {delta_size / 1024 ** 2:>12.2f} {delta_ms:>12.2f}')
@@ -0,0 +1,113 @@
+import random
+import time
+
+import fitz
+from django.core.management.base import BaseCommand
+
+from annotation_system.positions import WordIndex, resolve_content
+
+WORDS = (
+    'cardiac regeneration stem cell progenitor heart failure signaling pathway development '
+    'embryonic myocardial lineage tracing differentiation therapy clinical translational '
+    'genomics screening zebrafish mouse model injury repair vascular endothelial'
+).split()
+CHINESE = '心脏再生干细胞研究中心医学院教授国家自然科学基金重点项目'
+LINES_PER_PAGE = 50
+
+
+def synthetic_fields(count, rng):
+    """生成字段值；约十分之一为中文"""
+    fields = {}
+    for i in range(count):
+        if i % 10 == 9:
+            value = ''.join(rng.choice(CHINESE) for _ in range(rng.randint(6, 12))) + str(i)
+        else:
+            value = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 7))) + f' {i}'
+        fields[f'field_{i}'] = value
+    return fields
+
+
+def make_pdf(fields):
+    """每个字段值单独一行，返回 (文档, {字段: (页码, 行矩形)})"""
+    pdf_doc = fitz.open()
+    truth = {}
+    page = None
+    for n, (key, value) in enumerate(fields.items()):
+        line = n % LINES_PER_PAGE
+        if line == 0:
+            page = pdf_doc.new_page()
+        y = 40 + line * 15
+        # 英文用 Helvetica，避免等宽的中文字体把长行挤出页面
+        page.insert_text((40, y), value, fontsize=9, fontname='china-s' if value[0] in CHINESE else 'helv')
+        truth[key] = (page.number + 1, fitz.Rect(30, y - 12, 580, y + 4))
+    return fitz.open('pdf', pdf_doc.tobytes()), truth
+
+
+def perturb(value, rng):
+    """模拟 OCR / 录入误差：随机改掉一个长词中的一个字母"""
+    words = value.split(' ')
+    long_words = [i for i, word in enumerate(words) if len(word) >= 6]
+    if not long_words:
+        return value
+    i = rng.choice(long_words)
+    word = words[i]
+    k = rng.randrange(1, len(word))
+    words[i] = word[:k] + rng.choice('abcdefghijklmnopqrstuvwxyz') + word[k + 1:]
+    return ' '.join(words)
+
+
+def is_correct(candidates, expected):
+    if not candidates:
+        return False
+    page, rect = expected
+    best = candidates[0]
+    return best['page'] == page and rect.intersects(fitz.Rect(best['x1'], best['y1'], best['x2'], best['y2']))
+
+
+class Command(BaseCommand):
+    help = '比较词索引定位与逐字段 page.search_for 定位的耗时和准确率'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fields', type=int, default=10000)
+        parser.add_argument('--perturbed', type=float, default=0.1, help='值被改动一个字母的字段比例')
+        parser.add_argument('--naive-sample', type=int, default=200, help='逐字段搜索只测这么多字段后按比例推算')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        fields = synthetic_fields(options['fields'], rng)
+        pdf_doc, truth = make_pdf(fields)
+        content = {
+            key: perturb(value, rng) if rng.random() < options['perturbed'] else value
+            for key, value in fields.items()
+        }
+        self.stdout.write(f'{len(fields)} 个字段，{len(pdf_doc)} 页')
+
+        started = time.perf_counter()
+        index = WordIndex.from_document(pdf_doc)
+        built = time.perf_counter() - started
+        started = time.perf_counter()
+        positions = resolve_content(index, content)
+        resolved = time.perf_counter() - started
+        correct = sum(is_correct(positions.get(key), truth[key]) for key in fields)
+        self.stdout.write(
+            f'词索引：建索引 {built:.2f}s（{len(index.tokens)} 个词），定位 {resolved:.2f}s，'
+            f'共 {built + resolved:.2f}s；正确 {correct / len(fields):.1%}'
+        )
+
+        # 逐字段在每一页上 search_for，耗时与 字段数 × 页数 成正比
+        sample = rng.sample(sorted(fields), min(options['naive_sample'], len(fields)))
+        correct = 0
+        started = time.perf_counter()
+        for key in sample:
+            candidates = []
+            for page in pdf_doc:
+                for rect in page.search_for(content[key]):
+                    candidates.append({
+                        'page': page.number + 1, 'x1': rect.x0, 'y1': rect.y0, 'x2': rect.x1, 'y2': rect.y1
+                    })
+            correct += is_correct(candidates, truth[key])
+        naive = (time.perf_counter() - started) * len(fields) / len(sample)
+        self.stdout.write(
+            f'逐字段 search_for（{len(sample)} 个样本推算）：{naive:.2f}s；正确 {correct / len(sample):.1%}'
+        )
+        self.stdout.write(self.style.SUCCESS(f'加速 {naive / (built + resolved):.1f} 倍'))
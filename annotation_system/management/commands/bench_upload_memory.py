@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import fitz
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.management.base import BaseCommand
+
+from annotation_system.ingest import inspect_pdf
+
+
+def buffered_ingest(uploaded_file):
+    """旧实现：整个 PDF 读入内存后计算校验和并从内存打开"""
+    import hashlib
+    uploaded_file.seek(0)
+    pdf_content = uploaded_file.read()
+    checksum = hashlib.sha256(pdf_content).hexdigest()
+    pdf_doc = fitz.open(stream=pdf_content, filetype='pdf')
+    page_count = len(pdf_doc)
+    return checksum, page_count, len(pdf_content)
+
+
+def make_pdf(path, size_mb):
+    """生成指定大小的 PDF：几页文本 + 一个不可压缩的附件"""
+    pdf_doc = fitz.open()
+    for i in range(5):
+        pdf_doc.new_page().insert_text((72, 72), f'Benchmark page {i + 1}')
+    pdf_doc.embfile_add('payload.bin', os.urandom(size_mb * 1024 * 1024))
+    pdf_doc.save(path)
+    pdf_doc.close()
+
+
+def measure(ingest, path, conn):
+    """在独立子进程中运行，返回峰值 RSS 的增量（KB）和耗时"""
+    uploaded = TemporaryUploadedFile('bench.pdf', 'application/pdf', os.path.getsize(path), None)
+    uploaded.close()
+    uploaded.file = open(path, 'rb')
+    uploaded.temporary_file_path = lambda: path
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    ingest(uploaded)
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    uploaded.file.close()
+    conn.send((after - before, elapsed))
+
+
+class Command(BaseCommand):
+    help = '比较缓冲式与流式上传处理的峰值内存占用'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,50,200', help='PDF 大小（MB），逗号分隔')
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',')]
+        ctx = multiprocessing.get_context('fork')
+        self.stdout.write(f'{"size":>8} {"mode":>10} {"peak RSS +MB":>14} {"seconds":>9}')
+        with tempfile.TemporaryDirectory() as tmp:
+            for size_mb in sizes:
+                path = os.path.join(tmp, f'bench_{size_mb}.pdf')
+                make_pdf(path, size_mb)
+                for mode, ingest in (('buffered', buffered_ingest), ('streaming', inspect_pdf)):
+                    parent, child = ctx.Pipe()
+                    proc = ctx.Process(target=measure, args=(ingest, path, child))
+                    proc.start()
+                    delta_kb, elapsed = parent.recv()
+                    proc.join()
+                    self.stdout.write(
+                        f'{size_mb:>6}MB {mode:>10} {delta_kb / 1024:>14.1f} {elapsed:>9.3f}'
+                    )
+                os.remove(path)
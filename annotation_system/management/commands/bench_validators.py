@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from annotation_system.progress import count_fields
+from annotation_system.validators import SCHEMAS, TYPES, _compile, _strip, format_path, validate_content
+
+from .bench_history import synthetic_cv
+
+
+def interpret(schema, value, path, errors):
+    """不编译、每次读取 schema 的等价实现，作为对照"""
+    names = schema.get('type')
+    if names:
+        names = [names] if isinstance(names, str) else names
+        if not any(
+            isinstance(value, TYPES[name][0]) and not (name in ('number', 'integer') and isinstance(value, bool))
+            for name in names
+        ):
+            errors.append({'path': format_path(path), 'message': '类型不符'})
+            return
+    if isinstance(value, dict):
+        properties = schema.get('properties', {})
+        additional = schema.get('additionalProperties', True)
+        for key, item in value.items():
+            sub = properties.get(_strip(key), additional if isinstance(additional, dict) else None)
+            if sub is None and additional is False:
+                errors.append({'path': format_path((path, key)), 'message': '不允许的字段'})
+            elif sub:
+                interpret(sub, item, (path, key), errors)
+        for name in schema.get('required', ()):
+            if name not in value and _strip(name) not in map(_strip, value):
+                errors.append({'path': format_path(path), 'message': f'缺少必要字段 {name}'})
+    elif isinstance(value, list) and 'items' in schema:
+        for index, item in enumerate(value):
+            interpret(schema['items'], item, (path, index), errors)
+
+
+def timed(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+class Command(BaseCommand):
+    help = '测量编译后的 schema 校验在大简历上的耗时，并与逐次解释 schema 的实现比较'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--publications', type=int, default=2500, help='论文条数，每篇 4 个字段')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        content = synthetic_cv(options['publications'])
+        total, _ = count_fields(content)
+        schema = SCHEMAS['cv']
+        self.stdout.write(f'{total} 个字段')
+
+        compile_ms, _ = timed(lambda: _compile(schema), 1)
+        compiled_ms, errors = timed(lambda: validate_content('cv', content), repeat)
+        interpreted_ms, baseline = timed(lambda: interpret(schema, content, None, []) or [], repeat)
+        if errors or baseline:
+            self.stderr.write(f'合成数据应当没有错误：{errors[:3]}')
+
+        # 每篇论文一个错误时，收集全部错误的耗时
+        broken = synthetic_cv(options['publications'])
+        for article in broken['publications']['peer_reviewed_articles']:
+            article['year'] = True
+        broken_ms, broken_errors = timed(lambda: validate_content('cv', broken), repeat)
+
+        self.stdout.write(f'编译 schema          {compile_ms:8.2f}ms（只在第一次使用时）')
+        self.stdout.write(f'编译后校验           {compiled_ms:8.2f}ms')
+        self.stdout.write(f'逐次解释 schema      {interpreted_ms:8.2f}ms')
+        self.stdout.write(f'{len(broken_errors)} 处错误时校验     {broken_ms:8.2f}ms')
+        self.stdout.write(self.style.SUCCESS(f'编译后快 {interpreted_ms / compiled_ms:.1f} 倍'))
@@ -0,0 +1,125 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from annotation_system.models import Annotation, File, FileProgress
+from annotation_system.progress import VERIFIED_SUFFIX, count_total_fields, count_verified_fields
+
+
+def reference_sections(json_content):
+    """用原始的递归统计函数从头计算分段计数"""
+    if not isinstance(json_content, dict):
+        return {'': [count_total_fields(json_content), count_verified_fields(json_content)]}
+    return {
+        key: [
+            1 + count_total_fields(value),
+            int(key.endswith(VERIFIED_SUFFIX)) + count_verified_fields(value)
+        ]
+        for key, value in json_content.items()
+    }
+
+
+class Command(BaseCommand):
+    help = '从头重新统计每个标注的进度，检查增量维护的计数和文件进度汇总表是否漂移'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='修正发现漂移的计数')
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        checked = 0
+        drifted = 0
+        pending = []
+
+        annotations = Annotation.objects.only(
+            'id', 'json_content', 'section_progress', 'total_fields', 'verified_fields'
+        ).order_by('id')
+        for annotation in annotations.iterator(chunk_size=chunk_size):
+            checked += 1
+            sections = reference_sections(annotation.json_content)
+            total = sum(c[0] for c in sections.values())
+            verified = sum(c[1] for c in sections.values())
+            if (annotation.section_progress == sections
+                    and annotation.total_fields == total
+                    and annotation.verified_fields == verified):
+                continue
+
+            drifted += 1
+            self.stdout.write(self.style.WARNING(
+                f'标注 {annotation.id}: 记录 {annotation.total_fields}/{annotation.verified_fields}，'
+                f'实际 {total}/{verified}'
+            ))
+            if options['fix']:
+                annotation.section_progress = sections
+                annotation.total_fields = total
+                annotation.verified_fields = verified
+                pending.append(annotation)
+                if len(pending) >= chunk_size:
+                    self._save(pending)
+                    pending = []
+
+        if pending:
+            self._save(pending)
+
+        self.report(checked, drifted, '条标注', options['fix'])
+        self.check_rollup(options)
+
+    def report(self, checked, drifted, unit, fix):
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f'检查 {checked} {unit}，计数一致'))
+        elif fix:
+            self.stdout.write(self.style.SUCCESS(f'检查 {checked} {unit}，修正 {drifted} 条'))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f'检查 {checked} {unit}，{drifted} 条计数漂移（使用 --fix 修正）'
+            ))
+
+    def check_rollup(self, options):
+        """按文件当前的属性和最新版本标注重新生成汇总行，与 FileProgress 比较；缺失的行视为漂移"""
+        latest = Annotation.objects.filter(file=OuterRef('pk'), is_deleted=False).order_by('-version')
+        files = File.objects.annotate(
+            **{
+                f'latest_{name}': Subquery(latest.values(name)[:1])
+                for name in ('id', 'version', 'updated_at', 'total_fields', 'verified_fields')
+            }
+        ).order_by('id')
+        rows = FileProgress.objects.in_bulk()
+        attributes = ['file_type', 'status', 'uploaded_by_id', 'uploaded_on', 'is_deleted']
+        fields = attributes + ['annotation_id', 'version', 'updated_at', 'total_fields', 'verified_fields']
+        checked = drifted = 0
+        missing, changed = [], []
+        for file in files.iterator(chunk_size=options['chunk_size']):
+            checked += 1
+            expected = FileProgress.for_file(file)
+            if file.latest_id is not None:
+                expected.annotation_id = file.latest_id
+                expected.version = file.latest_version
+                expected.updated_at = file.latest_updated_at
+                expected.total_fields = file.latest_total_fields
+                expected.verified_fields = file.latest_verified_fields
+            row = rows.get(file.id)
+            # 已删除文件的标注也被软删除，看板不统计它们，只检查文件属性
+            compared = attributes if file.is_deleted else fields
+            if row is not None and all(getattr(row, f) == getattr(expected, f) for f in compared):
+                continue
+            drifted += 1
+            self.stdout.write(self.style.WARNING(
+                f'文件 {file.id}: 汇总行' + ('缺失' if row is None else
+                f'记录 {row.total_fields}/{row.verified_fields}，实际 {expected.total_fields}/{expected.verified_fields}')
+            ))
+            if row is None:
+                missing.append(expected)
+            else:
+                for name in compared:
+                    setattr(row, name, getattr(expected, name))
+                changed.append(row)
+
+        if options['fix']:
+            FileProgress.objects.bulk_create(missing, batch_size=options['chunk_size'])
+            FileProgress.objects.bulk_update(changed, fields, batch_size=options['chunk_size'])
+        self.report(checked, drifted, '个文件的进度汇总行', options['fix'])
+
+    def _save(self, annotations):
+        Annotation.objects.bulk_update(
+            annotations, ['section_progress', 'total_fields', 'verified_fields']
+        )
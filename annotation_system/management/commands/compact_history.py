@@ -0,0 +1,75 @@
+import copy
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from annotation_system.history import replay
+from annotation_system.jsonpatch import make_patch
+from annotation_system.models import Annotation, AnnotationHistory
+
+
+def _size(*values):
+    return sum(len(json.dumps(v, ensure_ascii=False)) for v in values if v is not None)
+
+
+class Command(BaseCommand):
+    help = '把完整内容格式的历史记录转换为快照 + 差量格式'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计节省的空间，不写入')
+        parser.add_argument('--annotation-id', type=int, help='只处理指定标注')
+        parser.add_argument('--interval', type=int, default=settings.HISTORY_SNAPSHOT_INTERVAL,
+                            help='快照间隔')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        histories = AnnotationHistory.objects.all()
+        if options['annotation_id']:
+            histories = histories.filter(annotation_id=options['annotation_id'])
+        annotation_ids = histories.order_by('annotation_id').values_list(
+            'annotation_id', flat=True
+        ).distinct()
+
+        before_total = after_total = converted = 0
+        for annotation_id in annotation_ids.iterator():
+            rows = list(
+                AnnotationHistory.objects.filter(annotation_id=annotation_id)
+                .order_by('version', 'id')
+                .only('id', 'version', 'old_value', 'new_value', 'patch')
+            )
+            changed = []
+            previous = None
+            for index, row in enumerate(rows):
+                before_total += _size(row.old_value, row.new_value, row.patch)
+                # 先按现有格式还原本条内容
+                if row.patch is None:
+                    content = row.new_value
+                else:
+                    content = replay(copy.deepcopy(previous), [row.patch])
+
+                if index % interval == 0:
+                    new_value, patch = content, None
+                else:
+                    new_value, patch = None, make_patch(previous, content)
+                if (row.old_value, row.new_value, row.patch) != (None, new_value, patch):
+                    row.old_value, row.new_value, row.patch = None, new_value, patch
+                    changed.append(row)
+                after_total += _size(new_value, patch)
+                previous = content
+
+            if changed and not options['dry_run']:
+                with transaction.atomic():
+                    AnnotationHistory.objects.bulk_update(
+                        changed, ['old_value', 'new_value', 'patch'], batch_size=200
+                    )
+                    # 快照位置变了，下一次写入历史时重新保存快照
+                    Annotation.objects.filter(pk=annotation_id).update(history_chain=None)
+            converted += len(changed)
+
+        action = '可转换' if options['dry_run'] else '已转换'
+        saved = (1 - after_total / before_total) * 100 if before_total else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {converted} 条历史记录：{before_total} -> {after_total} 字节（节省 {saved:.1f}%）'
+        ))
@@ -1,31 +1,138 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from annotation_system.history import build_history
 from annotation_system.models import Annotation, AnnotationHistory
 
+
+def without_history():
+    """没有任何历史记录的标注：一条 NOT EXISTS 反连接查询"""
+    return Annotation.objects.filter(
+        ~Exists(AnnotationHistory.objects.filter(annotation_id=OuterRef('pk')))
+    )
+
+
+def create_chunk(ids):
+    """为一块标注批量写入初始历史记录，返回写入的条数"""
+    # 再次按反连接过滤：中断重跑或与其他进程同时运行时跳过已经有历史的标注
+    annotations = without_history().filter(pk__in=ids).select_related('annotator')
+    entries = []
+    for annotation in annotations:
+        entry = build_history(
+            annotation, annotation.annotator,
+            change_type='create',
+            description='创建初始历史记录',
+            field_path=annotation.field_path
+        )
+        entry.version = 1
+        entries.append(entry)
+    with transaction.atomic():
+        AnnotationHistory.objects.bulk_create(entries, ignore_conflicts=True)
+    return len(entries)
+
+
+def _create_in_thread(ids):
+    try:
+        return create_chunk(ids)
+    finally:
+        # 工作线程各自持有数据库连接，用完即关闭
+        connection.close()
+
+
+def _chunks(iterator, size):
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Checkpoint:
+    """检查点文件：记录已处理完的最大标注 ID，重新运行时从其后继续"""
+
+    def __init__(self, path):
+        self.path = path
+        self.last_id = 0
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as fh:
+                self.last_id = json.load(fh)['last_id']
+
+    def save(self, last_id):
+        self.last_id = last_id
+        if self.path:
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump({'last_id': last_id}, fh)
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
 class Command(BaseCommand):
-    help = '为所有没有历史记录的标注创建初始历史记录'
+    help = '为所有没有历史记录的标注创建初始历史记录；分块批量写入，中断后可从检查点继续'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=settings.INITIAL_HISTORY_CHUNK_SIZE,
+                            help='每个事务写入的历史记录数')
+        parser.add_argument('--workers', type=int, default=1, help='并行写入的线程数')
+        parser.add_argument('--checkpoint', default='create_initial_history.checkpoint',
+                            help='检查点文件，全部完成后删除')
+        parser.add_argument('--dry-run', action='store_true', help='只统计需要创建的历史记录数')
 
     def handle(self, *args, **options):
-        annotations = Annotation.objects.all()
-        count = 0
-        
-        for annotation in annotations:
-            # 检查是否已有历史记录
-            if not annotation.history.exists():
-                AnnotationHistory.objects.create(
-                    annotation=annotation,
-                    field_path=annotation.field_path,
-                    old_value=None,
-                    new_value=annotation.json_content,
-                    pdf_content=annotation.pdf_content,
-                    position=annotation.position,
-                    verification_status=annotation.verification_status,
-                    change_type='create',
-                    change_description='创建初始历史记录',
-                    modified_by=annotation.annotator,
-                    version=1
-                )
-                count += 1
-        
-        self.stdout.write(
-            self.style.SUCCESS(f'成功创建 {count} 条初始历史记录')
-        ) 
\ No newline at end of file
+        chunk_size = options['chunk_size']
+        workers = max(1, options['workers'])
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stderr.write('SQLite 同一时间只允许一个写入者，改为单线程运行')
+            workers = 1
+
+        checkpoint = Checkpoint(options['checkpoint'])
+        if checkpoint.last_id:
+            self.stdout.write(f'从检查点继续：标注 ID > {checkpoint.last_id}')
+        pending = without_history().filter(pk__gt=checkpoint.last_id)
+        total = pending.count()
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'需要创建 {total} 条初始历史记录'))
+            return
+
+        started = time.perf_counter()
+        created = 0
+
+        def done(count, last_id):
+            nonlocal created
+            created += count
+            checkpoint.save(last_id)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'已创建 {created} / {total}，{created / elapsed if elapsed else 0:.0f} 条/秒')
+
+        ids = pending.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+        if workers == 1:
+            for chunk in _chunks(ids, chunk_size):
+                done(create_chunk(chunk), chunk[-1])
+        else:
+            # 按提交顺序等待结果，检查点只推进到连续完成的最后一块
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                in_flight = deque()
+                for chunk in _chunks(ids, chunk_size):
+                    in_flight.append((executor.submit(_create_in_thread, chunk), chunk[-1]))
+                    if len(in_flight) >= workers * 2:
+                        future, last_id = in_flight.popleft()
+                        done(future.result(), last_id)
+                while in_flight:
+                    future, last_id = in_flight.popleft()
+                    done(future.result(), last_id)
+        checkpoint.clear()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'成功创建 {created} 条初始历史记录，用时 {elapsed:.1f} 秒'
+            f'（{created / elapsed if elapsed else 0:.0f} 条/秒）'
+        ))
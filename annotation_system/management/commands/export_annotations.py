@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from annotation_system.export import export_queryset, iter_rows, stream_csv, write_xlsx
+from annotation_system.filters import filter_export
+
+
+class Command(BaseCommand):
+    help = '把标注展开为字段行导出为 CSV 或 XLSX（按输出文件扩展名判断）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='输出文件，.csv 或 .xlsx')
+        parser.add_argument('--file-id', help='逗号分隔的文件 ID')
+        parser.add_argument('--file-type', help='逗号分隔的文件类型')
+        parser.add_argument('--status', help='逗号分隔的文件状态')
+        parser.add_argument('--verification-status', help='逗号分隔的标注验证状态')
+        parser.add_argument('--since', help='上传时间下限（ISO 8601）')
+        parser.add_argument('--until', help='上传时间上限（ISO 8601，不含）')
+        parser.add_argument('--chunk-size', type=int, help='每次读取的标注数')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output.endswith(('.csv', '.xlsx')):
+            raise CommandError('输出文件必须以 .csv 或 .xlsx 结尾')
+        try:
+            annotations = filter_export(export_queryset(), options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        count = 0
+
+        def rows():
+            nonlocal count
+            for row in iter_rows(annotations, options['chunk_size']):
+                count += 1
+                yield row
+
+        if output.endswith('.csv'):
+            with open(output, 'w', encoding='utf-8', newline='') as fh:
+                fh.writelines(stream_csv(rows()))
+        else:
+            try:
+                with open(output, 'wb') as fh:
+                    write_xlsx(rows(), fh)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'已导出 {count} 行到 {output}'))
@@ -0,0 +1,66 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from annotation_system.importer import FileImporter
+from annotation_system.models import File
+from annotation_system.prerender import prerenderer
+
+
+class Command(BaseCommand):
+    help = '从目录或 zip 批量导入 PDF + JSON 文件对；使用检查点文件可在中断后继续'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='包含 PDF/JSON 文件对的目录或 zip')
+        parser.add_argument('--user', required=True, help='记为上传者的用户名')
+        parser.add_argument('--file-type', default='cv', choices=[t for t, _ in File.FILE_TYPES])
+        parser.add_argument('--batch-size', type=int, help='每个事务提交的文件数')
+        parser.add_argument('--workers', type=int, help='解析进程数')
+        parser.add_argument('--checkpoint', help='检查点文件，默认为 <source>.import-checkpoint')
+        parser.add_argument('--prerender', action='store_true', help='导入后预渲染页面预览')
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options['source'])
+        if not os.path.exists(source):
+            raise CommandError(f'路径不存在: {source}')
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'用户不存在: {options["user"]}')
+
+        checkpoint = options['checkpoint'] or f'{source.rstrip(os.sep)}.import-checkpoint'
+        importer = FileImporter(
+            user,
+            file_type=options['file_type'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            checkpoint_path=checkpoint,
+            prerender=options['prerender'],
+            progress=lambda stats: self.stdout.write(
+                f'已导入 {stats["imported"]} / {stats["pairs"] - stats["skipped"]}，'
+                f'{stats["files_per_second"]:.1f} 个/秒'
+            )
+        )
+        stats = importer.run(source)
+        if importer.prerender:
+            # 进程退出时进程池随之关闭，必须等已安排的预渲染全部完成
+            self.stdout.write('等待预渲染完成…')
+            prerenderer.wait()
+            render_failed = File.objects.filter(
+                metadata__import_run=importer.checkpoint.run_id, status='error'
+            ).values_list('name', flat=True)
+            for name in render_failed:
+                self.stderr.write(f'预渲染失败: {name}')
+
+        if stats['recovered']:
+            self.stdout.write(f'从数据库恢复检查点 {stats["recovered"]} 条')
+        for item in stats['failed']:
+            self.stderr.write(f'导入失败 {item["source"]}: {item["error"]}')
+        for key in stats['unpaired']:
+            self.stderr.write(f'缺少配对文件: {key}')
+        self.stdout.write(self.style.SUCCESS(
+            f'导入 {stats["imported"]} 个文件（{stats["reused"]} 个复用已有 PDF），跳过已导入 {stats["skipped"]} 个，'
+            f'失败 {len(stats["failed"])} 个，用时 {stats["seconds"]:.1f} 秒'
+            f'（{stats["files_per_second"]:.1f} 个/秒）；检查点: {checkpoint}'
+        ))
@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from annotation_system.ingest import inspect_pages
+from annotation_system.models import File, PageText
+from annotation_system.preview_cache import lower_priority
+
+
+class Command(BaseCommand):
+    help = '为还没有页面文本的文件提取 PDF 文本，加入全文搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='解析进程数，默认为 CPU 核数')
+        parser.add_argument('--batch-size', type=int, default=100, help='每个事务写入的文件数')
+
+    def handle(self, *args, **options):
+        files = list(
+            File.objects.filter(is_deleted=False, pages__isnull=True)
+            .exclude(pdf_file='')
+            .only('id', 'pdf_file')
+            .order_by('id')
+        )
+        if not files:
+            self.stdout.write('所有文件都已建立页面文本索引')
+            return
+
+        workers = options['workers'] or os.cpu_count() or 1
+        indexed = failed = 0
+        batch = []
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=lower_priority,
+            initargs=(settings.PRERENDER_NICE,),
+        ) as executor:
+            for file, info in zip(files, executor.map(inspect_pages, [file.pdf_file.path for file in files])):
+                if 'error' in info:
+                    failed += 1
+                    self.stderr.write(f'文件 {file.id} 提取失败: {info["error"]}')
+                    continue
+                batch.extend(PageText.for_file(file, info['pages']))
+                indexed += 1
+                if indexed % options['batch_size'] == 0:
+                    self._write(batch)
+                    batch = []
+                    self.stdout.write(f'已索引 {indexed} / {len(files)}')
+        self._write(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'索引了 {indexed} 个文件，失败 {failed} 个'))
+
+    def _write(self, pages):
+        with transaction.atomic():
+            PageText.objects.bulk_create(pages, batch_size=settings.BATCH_CREATE_SIZE, ignore_conflicts=True)
@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from annotation_system.purge import purge, reclaimed_bytes, sweep_orphans
+
+
+def _mb(size):
+    return f'{size / 1024 / 1024:.1f} MB'
+
+
+class Command(BaseCommand):
+    help = '硬删除保留期已过的软删除文件，以及它们的标注、历史记录、存储文件和预览图片'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-days', type=float, default=settings.PURGE_GRACE_DAYS,
+                            help='保留期（天），删除时间早于此的文件会被清理')
+        parser.add_argument('--batch-size', type=int, default=settings.PURGE_BATCH_SIZE,
+                            help='每批处理的文件数')
+        parser.add_argument('--chunk-size', type=int, default=settings.PURGE_DELETE_CHUNK,
+                            help='每个删除事务的行数')
+        parser.add_argument('--dry-run', action='store_true', help='只统计将删除的行数和回收的空间')
+        parser.add_argument('--orphans', action='store_true',
+                            help='同时删除没有任何文件引用的存储文件和预览图片')
+        parser.add_argument('--interval', type=int, nargs='?', const=settings.PURGE_INTERVAL_SECONDS,
+                            default=0, help='作为后台任务运行，每隔若干秒清理一次（不带值时使用 PURGE_INTERVAL_SECONDS）')
+
+    def handle(self, *args, **options):
+        while True:
+            self.run_once(options)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+            close_old_connections()
+
+    def run_once(self, options):
+        started = time.monotonic()
+        stats = purge(
+            grace_days=options['grace_days'],
+            batch_size=options['batch_size'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+            progress=lambda s: self.stdout.write(f'  已处理 {s["files"]} 个文件', ending='\r'),
+        )
+        if options['orphans']:
+            sweep_orphans(options['grace_days'], options['dry_run'], stats)
+
+        action = '将删除' if options['dry_run'] else '已删除'
+        self.stdout.write(
+            f'{action} {stats["files"]} 个文件：标注 {stats["annotations"]} 条，'
+            f'历史记录 {stats["history"]} 条，页面文本 {stats["pages"]} 条，'
+            f'进度汇总 {stats["rollups"]} 条，批量任务 {stats["batch_jobs"]} 条'
+        )
+        if options['orphans']:
+            self.stdout.write(f'孤立的存储文件 {stats["orphan_files"]} 个（{_mb(stats["orphan_bytes"])}）')
+        action = '可回收' if options['dry_run'] else '已回收'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {_mb(reclaimed_bytes(stats))}：PDF {_mb(stats["pdf_bytes"])}，'
+            f'JSON {_mb(stats["json_bytes"])}，预览图片 {_mb(stats["preview_bytes"])}'
+            f'（{time.monotonic() - started:.1f}s）'
+        ))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from annotation_system.prerender import prerenderer, recover_stuck
+
+
+class Command(BaseCommand):
+    help = '处理预渲染中途中断、停留在 processing 的文件：重新渲染，或直接标记为 ready'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-seconds', type=int, default=settings.PRERENDER_STALE_SECONDS,
+                            help='上传超过多少秒仍在 processing 才处理')
+        parser.add_argument('--reset', action='store_true',
+                            help='只把状态改为 ready，不渲染（预览按需渲染）；适合在启动时运行')
+
+    def handle(self, *args, **options):
+        file_ids = recover_stuck(options['stale_seconds'], reset=options['reset'])
+        if not file_ids:
+            self.stdout.write(self.style.SUCCESS('没有中断的预渲染'))
+            return
+        if options['reset']:
+            self.stdout.write(self.style.SUCCESS(f'已将 {len(file_ids)} 个文件标记为 ready'))
+            return
+        self.stdout.write(f'重新渲染 {len(file_ids)} 个文件…')
+        prerenderer.wait()
+        self.stdout.write(self.style.SUCCESS(f'已重新渲染 {len(file_ids)} 个文件'))
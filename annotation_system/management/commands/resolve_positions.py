@@ -0,0 +1,58 @@
+import time
+
+import fitz
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from annotation_system.models import Annotation, VersionConflict
+from annotation_system.positions import WordIndex, annotation_prefix, resolve_content
+
+
+class Command(BaseCommand):
+    help = '为标注 JSON 的字段值在 PDF 中定位，把候选位置保存到 field_positions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file-id', type=int, help='只处理指定文件')
+        parser.add_argument('--force', action='store_true', help='重新定位已有位置信息的标注')
+
+    def handle(self, *args, **options):
+        annotations = (
+            Annotation.objects.filter(is_deleted=False, file__is_deleted=False)
+            .select_related('file')
+            .order_by('file_id', 'id')
+        )
+        if options['file_id']:
+            annotations = annotations.filter(file_id=options['file_id'])
+        if not options['force']:
+            annotations = annotations.filter(Q(field_positions__isnull=True) | Q(field_positions={}))
+
+        resolved = conflicts = failed = 0
+        started = time.perf_counter()
+        index = file_id = None
+        for annotation in annotations.iterator(chunk_size=100):
+            # 同一文件的标注共用一个词索引
+            if annotation.file_id != file_id:
+                file_id = annotation.file_id
+                try:
+                    with fitz.open(annotation.file.pdf_file.path) as pdf_doc:
+                        index = WordIndex.from_document(pdf_doc)
+                except Exception as e:
+                    index = None
+                    self.stderr.write(f'文件 {file_id} 无法读取: {e}')
+            if index is None:
+                failed += 1
+                continue
+
+            annotation.field_positions = resolve_content(index, annotation.json_content, annotation_prefix(annotation))
+            try:
+                annotation.save_version(annotation.version, annotation.updated_at, bump=False, fields=('field_positions',))
+            except VersionConflict:
+                # 定位期间标注被修改，跳过，下次运行时重新定位
+                conflicts += 1
+                continue
+            resolved += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'定位了 {resolved} 条标注，冲突跳过 {conflicts} 条，失败 {failed} 条，'
+            f'耗时 {time.perf_counter() - started:.2f}s'
+        ))
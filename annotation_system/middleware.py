@@ -0,0 +1,77 @@
+"""
+响应压缩
+
+大的标注 JSON 有数 MB，压缩后通常只剩十分之一以下。客户端接受时优先用 brotli
+（可选依赖），否则用 gzip；级别由 COMPRESS_GZIP_LEVEL / COMPRESS_BROTLI_QUALITY 控制，
+Django 自带的 GZipMiddleware 固定使用较慢的级别 6。
+只压缩 JSON 和 CSV：PDF、图片和 XLSX 本身已经压缩过，HTML（可浏览 API）带有 CSRF 令牌，
+与用户输入一起压缩有 BREACH 风险。流式响应（CSV 导出）交给 GZipMiddleware 逐块压缩。
+"""
+import gzip
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/csv')
+
+
+def accepted_encodings(header):
+    """Accept-Encoding 中 q 值大于 0 的编码"""
+    encodings = set()
+    for item in header.split(','):
+        name, *params = [part.strip() for part in item.split(';')]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            encodings.add(name.lower())
+    return encodings
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=settings.COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=settings.COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in COMPRESSIBLE_TYPES or response.has_header('Content-Encoding'):
+            return response
+        if response.streaming:
+            return super().process_response(request, response)
+        if len(response.content) < settings.COMPRESS_MIN_BYTES:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # 与 GZipMiddleware 相同：编码后的表示不再逐字节相同，强 ETag 改为弱 ETag
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
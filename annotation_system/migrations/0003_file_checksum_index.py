@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0002_annotation_deleted_at_annotation_is_deleted_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='annotation',
+            name='position',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='checksum',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:31
+
+from django.db import migrations, models
+
+from annotation_system.progress import section_counts
+
+
+def backfill_progress(apps, schema_editor):
+    """为已有标注计算进度计数"""
+    Annotation = apps.get_model('annotation_system', 'Annotation')
+    batch = []
+    for annotation in Annotation.objects.only('id', 'json_content').iterator(chunk_size=500):
+        annotation.section_progress = section_counts(annotation.json_content)
+        annotation.total_fields = sum(c[0] for c in annotation.section_progress.values())
+        annotation.verified_fields = sum(c[1] for c in annotation.section_progress.values())
+        batch.append(annotation)
+        if len(batch) >= 500:
+            Annotation.objects.bulk_update(batch, ['section_progress', 'total_fields', 'verified_fields'])
+            batch = []
+    if batch:
+        Annotation.objects.bulk_update(batch, ['section_progress', 'total_fields', 'verified_fields'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0003_file_checksum_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='annotation',
+            name='section_progress',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='annotation',
+            name='total_fields',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='annotation',
+            name='verified_fields',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0004_annotation_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='annotationhistory',
+            name='patch',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='annotationhistory',
+            name='new_value',
+            field=models.JSONField(null=True),
+        ),
+    ]
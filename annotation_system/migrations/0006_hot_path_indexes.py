@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0005_history_patch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='annotation',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['file', '-version'], name='annotation_live_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='annotationhistory',
+            index=models.Index(fields=['annotation', 'version'], name='history_annotation_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-uploaded_at', '-id'], name='file_live_uploaded_idx'),
+        ),
+    ]
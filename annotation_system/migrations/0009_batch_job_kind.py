@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0008_batch_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batchjob',
+            name='kind',
+            field=models.CharField(choices=[('batch_verify', '批量验证'), ('import', '批量导入')], default='batch_verify', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='batchjob',
+            name='file',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='batch_jobs', to='annotation_system.file'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+from django.db import migrations
+from django.db.models import Count
+
+from annotation_system.jsonpatch import apply_patch
+
+
+def merge_duplicate_versions(apps, schema_editor):
+    """同一标注同一版本的多条历史记录合并为最后一条：
+    组内有快照时从最后一个快照回放其后的补丁得到新快照，否则把组内补丁按顺序拼接，
+    合并后的内容与原来最后一条记录一致，后续版本的差量链不受影响"""
+    AnnotationHistory = apps.get_model('annotation_system', 'AnnotationHistory')
+    duplicates = (
+        AnnotationHistory.objects.values('annotation_id', 'version')
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates.iterator():
+        rows = list(
+            AnnotationHistory.objects.filter(
+                annotation_id=group['annotation_id'], version=group['version']
+            ).order_by('id')
+        )
+        keep = rows[-1]
+        snapshots = [index for index, row in enumerate(rows) if row.patch is None]
+        if snapshots:
+            content = rows[snapshots[-1]].new_value
+            for row in rows[snapshots[-1] + 1:]:
+                content, _ = apply_patch(content, row.patch, track=False)
+            keep.new_value, keep.patch = content, None
+        else:
+            keep.patch = [op for row in rows for op in row.patch]
+        keep.save(update_fields=['new_value', 'patch'])
+        AnnotationHistory.objects.filter(id__in=[row.id for row in rows[:-1]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0009_batch_job_kind'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0010_history_merge_duplicate_versions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='annotationhistory',
+            name='history_annotation_version_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='annotationhistory',
+            constraint=models.UniqueConstraint(fields=('annotation', 'version'), name='history_annotation_version_uniq'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from annotation_system.search import POSTGRES_INSTALL, POSTGRES_UNINSTALL, install_sqlite, uninstall_sqlite
+
+
+def install_search_index(apps, schema_editor):
+    """PostgreSQL 使用生成的 tsvector 列和 GIN 索引，SQLite 使用 FTS5 虚拟表和触发器"""
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for sql in POSTGRES_INSTALL:
+            schema_editor.execute(sql)
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            install_sqlite(cursor)
+
+
+def uninstall_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for sql in POSTGRES_UNINSTALL:
+            schema_editor.execute(sql)
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            uninstall_sqlite(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0011_history_version_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.IntegerField()),
+                ('text', models.TextField(blank=True)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='annotation_system.file')),
+            ],
+            options={
+                'ordering': ['file', 'page'],
+                'constraints': [models.UniqueConstraint(fields=('file', 'page'), name='pagetext_file_page_uniq')],
+            },
+        ),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
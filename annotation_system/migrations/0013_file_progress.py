@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+
+def backfill_rollup(apps, schema_editor):
+    """为已有文件生成进度汇总行，计数取自版本最高的未删除标注"""
+    File = apps.get_model('annotation_system', 'File')
+    Annotation = apps.get_model('annotation_system', 'Annotation')
+    FileProgress = apps.get_model('annotation_system', 'FileProgress')
+    latest = Annotation.objects.filter(file=OuterRef('pk'), is_deleted=False).order_by('-version')
+    files = File.objects.annotate(
+        **{
+            f'latest_{name}': Subquery(latest.values(name)[:1])
+            for name in ('id', 'version', 'updated_at', 'total_fields', 'verified_fields')
+        }
+    ).values(
+        'id', 'file_type', 'status', 'uploaded_by_id', 'uploaded_at', 'is_deleted',
+        'latest_id', 'latest_version', 'latest_updated_at', 'latest_total_fields', 'latest_verified_fields'
+    ).order_by('id')
+    batch = []
+    for file in files.iterator(chunk_size=1000):
+        batch.append(FileProgress(
+            file_id=file['id'], file_type=file['file_type'], status=file['status'],
+            uploaded_by_id=file['uploaded_by_id'], uploaded_on=timezone.localdate(file['uploaded_at']),
+            is_deleted=file['is_deleted'], annotation_id=file['latest_id'],
+            version=file['latest_version'] or 0, updated_at=file['latest_updated_at'],
+            total_fields=file['latest_total_fields'] or 0, verified_fields=file['latest_verified_fields'] or 0
+        ))
+        if len(batch) >= 1000:
+            FileProgress.objects.bulk_create(batch)
+            batch = []
+    FileProgress.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0012_page_text'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileProgress',
+            fields=[
+                ('file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress_rollup', serialize=False, to='annotation_system.file')),
+                ('file_type', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('uploaded_on', models.DateField()),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('annotation_id', models.IntegerField(null=True)),
+                ('version', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('total_fields', models.IntegerField(default=0)),
+                ('verified_fields', models.IntegerField(default=0)),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('is_deleted', False)), fields=['file_type', 'status', 'uploaded_on', 'uploaded_by', 'total_fields', 'verified_fields'], name='fileprogress_live_group_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
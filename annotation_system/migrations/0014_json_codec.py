@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:19
+
+import annotation_system.codec
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0013_file_progress'),
+    ]
+
+    # 编码器和解码器只在 Python 侧生效，不改变表结构；
+    # 直接 AlterField 在 SQLite 上会重建表，丢掉全文搜索的触发器
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='annotation',
+                    name='json_content',
+                    field=models.JSONField(decoder=annotation_system.codec.FastJSONDecoder, encoder=annotation_system.codec.FastJSONEncoder),
+                ),
+                migrations.AlterField(
+                    model_name='annotationhistory',
+                    name='new_value',
+                    field=models.JSONField(decoder=annotation_system.codec.FastJSONDecoder, encoder=annotation_system.codec.FastJSONEncoder, null=True),
+                ),
+            ],
+        ),
+    ]
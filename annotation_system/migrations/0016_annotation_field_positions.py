@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def _is_candidates(position):
+    """resolve_positions 曾写入 position 的候选位置表：{字段路径: [候选位置, ...]}"""
+    return (
+        isinstance(position, dict) and position and 'page' not in position
+        and all(isinstance(value, list) for value in position.values())
+    )
+
+
+def move_candidates(apps, schema_editor):
+    """把 position 中的候选位置表移到 field_positions，position 恢复为单个位置"""
+    Annotation = apps.get_model('annotation_system', 'Annotation')
+    rows = Annotation.objects.filter(position__isnull=False).values_list('id', 'position')
+    for pk, position in rows.iterator(chunk_size=500):
+        if _is_candidates(position):
+            # 返回的 position 变了：update 不会自动修改 updated_at，需要手动更新，
+            # 让旧的 ETag 和按 (ID, 版本, 更新时间) 缓存的响应失效
+            Annotation.objects.filter(pk=pk).update(
+                field_positions=position, position={}, updated_at=timezone.now()
+            )
+
+
+def restore_candidates(apps, schema_editor):
+    Annotation = apps.get_model('annotation_system', 'Annotation')
+    rows = Annotation.objects.filter(field_positions__isnull=False).values_list('id', 'field_positions')
+    for pk, field_positions in rows.iterator(chunk_size=500):
+        if field_positions:
+            Annotation.objects.filter(pk=pk).update(position=field_positions, updated_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0015_file_deleted_idx'),
+    ]
+
+    operations = [
+        # 可为空且没有默认值：SQLite 上是 ADD COLUMN，不会重建表（重建会丢失全文搜索的触发器）
+        migrations.AddField(
+            model_name='annotation',
+            name='field_positions',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(move_candidates, restore_candidates),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0016_annotation_field_positions'),
+    ]
+
+    operations = [
+        # 可为空且没有默认值：SQLite 上是 ADD COLUMN，不会重建表；已有标注为空，下一次写入历史时保存快照
+        migrations.AddField(
+            model_name='annotation',
+            name='history_chain',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:20
+
+from django.db import migrations
+
+from annotation_system.search import POSTGRES_ANNOTATION_INDEX, SEARCH_CONFIG, install_sqlite
+
+
+def bound_search_text(apps, schema_editor):
+    """按截断后的字符串值重建标注的 tsvector 列；SQLite 重新安装触发器并重建 FTS5 索引"""
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE annotation_system_annotation DROP COLUMN search_vector')
+        for sql in POSTGRES_ANNOTATION_INDEX:
+            schema_editor.execute(sql)
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            install_sqlite(cursor)
+
+
+def unbound_search_text(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE annotation_system_annotation DROP COLUMN search_vector')
+        schema_editor.execute('DROP FUNCTION IF EXISTS annotation_search_text(jsonb)')
+        schema_editor.execute(f"""ALTER TABLE annotation_system_annotation ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (jsonb_to_tsvector('{SEARCH_CONFIG}', json_content, '["string"]')) STORED""")
+        schema_editor.execute(
+            'CREATE INDEX annotation_search_idx ON annotation_system_annotation USING gin (search_vector)'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation_system', '0017_annotation_history_chain'),
+    ]
+
+    operations = [
+        migrations.RunPython(bound_search_text, unbound_search_text),
+    ]
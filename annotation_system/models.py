@@ -1,7 +1,27 @@
-from django.db import models
+import copy
+
+from django.conf import settings
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from .codec import FastJSONDecoder, FastJSONEncoder
+from .jsonpatch import apply_patch, make_patch, merge_patch_ops
+from .progress import section_counts
+from .response_cache import annotation_cache
+
+
+class VersionConflict(Exception):
+    """条件更新时数据库中的版本已不是期望的版本"""
+
+    def __init__(self, annotation_id, expected_version, current_version):
+        self.annotation_id = annotation_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+        super().__init__(
+            f'标注 {annotation_id} 已被其他请求修改（期望版本 {expected_version}，当前版本 {current_version}）'
+        )
+
 class File(models.Model):
     STATUS_CHOICES = [
         ('pending', '待处理'),
@@ -27,23 +47,68 @@ class File(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     page_count = models.IntegerField(default=0)
     file_size = models.IntegerField(default=0)  # 以字节为单位
-    checksum = models.CharField(max_length=64, null=True, blank=True)  # 设为可选
+    checksum = models.CharField(max_length=64, null=True, blank=True, db_index=True)  # 设为可选
     metadata = models.JSONField(null=True, blank=True)  # 存储额外元数据
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # 文件列表：未删除的文件按上传时间倒序分页
+            models.Index(
+                fields=['-uploaded_at', '-id'],
+                condition=models.Q(is_deleted=False),
+                name='file_live_uploaded_idx'
+            ),
+            # 清理任务：按删除时间查找保留期已过的文件
+            models.Index(
+                fields=['deleted_at', 'id'],
+                condition=models.Q(is_deleted=True),
+                name='file_deleted_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def find_blob(cls, checksum):
+        """查找已存储相同内容 PDF 的文件，用于上传去重"""
+        if not checksum:
+            return None
+        return (
+            cls.objects.filter(checksum=checksum, page_count__gt=0)
+            .exclude(pdf_file='')
+            .order_by('-id')
+            .first()
+        )
+
+    @classmethod
+    def find_blobs(cls, checksums):
+        """find_blob 的批量版本，用于批量导入去重：{checksum: 最新的文件}"""
+        found = {}
+        rows = (
+            cls.objects.filter(checksum__in=[c for c in checksums if c], page_count__gt=0)
+            .exclude(pdf_file='')
+            .order_by('checksum', '-id')
+            .only('id', 'checksum', 'pdf_file', 'page_count')
+        )
+        for file in rows:
+            found.setdefault(file.checksum, file)
+        return found
+
     def soft_delete(self, user):
+        """标记文件及其标注为已删除；只写入删除标记，存储中的文件和相关数据在保留期过后
+        由 purge_deleted 清理"""
+        now = timezone.now()
+        with transaction.atomic():
+            File.objects.filter(pk=self.pk).update(is_deleted=True, deleted_at=now)
+            # 同时软删除相关的标注
+            self.annotations.update(is_deleted=True, deleted_at=now)
+            FileProgress.objects.filter(file=self).update(is_deleted=True)
         self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
-        # 同时软删除相关的标注
-        self.annotations.update(is_deleted=True, deleted_at=timezone.now())
+        self.deleted_at = now
 
 class Annotation(models.Model):
     FIELD_ORDER = [
@@ -89,8 +154,9 @@ class Annotation(models.Model):
     field_type = models.CharField(max_length=50, choices=FIELD_TYPES)
     field_path = models.CharField(max_length=255)  # 例如: "personal_info.name"
     pdf_content = models.TextField()  # PDF中实际内容
-    json_content = models.JSONField()  # JSON中的内容
+    json_content = models.JSONField(encoder=FastJSONEncoder, decoder=FastJSONDecoder)  # JSON中的内容
     position = models.JSONField(null=True, blank=True)  # PDF中的位置信息 {page: 1, x1: 100, y1: 100, x2: 200, y2: 120}
+    field_positions = models.JSONField(null=True, blank=True)  # resolve_positions 的候选位置 {字段路径: [{page, x1, y1, x2, y2, score}, ...]}
     verification_status = models.CharField(max_length=20, choices=VERIFICATION_STATUS, default='pending')
     is_correct = models.BooleanField(default=False)
     confidence_score = models.FloatField(default=0.0)
@@ -101,13 +167,41 @@ class Annotation(models.Model):
     version = models.IntegerField(default=1)
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
+    # 进度计数：按顶层字段分段 {字段: [总数, 已验证数]}，以及汇总值
+    section_progress = models.JSONField(default=dict, blank=True)
+    total_fields = models.IntegerField(default=0)
+    verified_fields = models.IntegerField(default=0)
+    # 最新快照之后的差量历史条数；为空表示当前内容与最新历史记录不一致，下一条历史记录保存快照
+    history_chain = models.IntegerField(null=True, blank=True)
+
+    # 自上次保存以来应用到 json_content 上的 RFC 6902 操作（None 表示未知，下一条历史记录保存快照），
+    # 以及进度计数和这些操作所对应的内容对象；json_content 被直接赋值时据此发现修改
+    _json_ops = None
+    _ops_content = None
+    # save_version 创建新版本后，对应的历史记录应保存的差量；为 None 时保存快照
+    history_patch = None
 
     class Meta:
         ordering = ['-version']
+        indexes = [
+            # 取文件最新版本的未删除标注
+            models.Index(
+                fields=['file', '-version'],
+                condition=models.Q(is_deleted=False),
+                name='annotation_live_version_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Annotation for {self.file.name} by {self.annotator.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._json_ops = []
+        instance._ops_content = instance.__dict__.get('json_content')
+        return instance
+
     def order_json_content(self):
         """按照预定义的顺序重排 JSON 内容"""
         if not isinstance(self.json_content, dict):
@@ -126,11 +220,124 @@ class Annotation(models.Model):
             
         return ordered_content
 
-    def save(self, *args, **kwargs):
-        # 保存前对 JSON 内容进行排序
+    def prepare_bulk(self):
+        """bulk_create 不调用 save()，写入前补上内容排序和进度统计；
+        批量写入时同时写入内容相同的初始快照"""
+        self.json_content = self.order_json_content()
+        self.recount_fields()
+        self.history_chain = 0
+        return self
+
+    def recount_fields(self):
+        """遍历整个内容重新统计进度计数"""
+        self.section_progress = section_counts(self.json_content)
+        self._sum_sections()
+
+    def _sum_sections(self):
+        self.total_fields = sum(c[0] for c in self.section_progress.values())
+        self.verified_fields = sum(c[1] for c in self.section_progress.values())
+
+    def _sync_content(self):
+        """json_content 被直接赋值时，按与原内容的差异补上进度计数和待记录的操作"""
+        content = self.json_content
+        if content is self._ops_content:
+            return
+        if self._ops_content is None or not self.section_progress:
+            # 新建的标注或没有可用的计数：全量统计
+            self.recount_fields()
+            self._json_ops, self._ops_content = None, content
+            return
+        self.json_content = self._ops_content
+        self.set_json_content(content)
+
+    def set_json_content(self, new_content):
+        """替换 JSON 内容：把与原内容的差异作为补丁应用，只统计变化的路径"""
+        self._sync_content()
+        self.apply_json_patch(make_patch(self.json_content, new_content))
+
+    def apply_json_patch(self, operations):
+        """就地应用 RFC 6902 补丁，并按补丁的变化量更新进度计数"""
+        self._sync_content()
+        content, deltas = apply_patch(self.json_content, operations)
+        if self._json_ops is not None:
+            # 记录副本：历史差量不与文档或调用方的补丁共享可变对象
+            self._json_ops.extend(copy.deepcopy(operations))
+        self._ops_content = content
+        self._apply_deltas(content, deltas)
+
+    def apply_merge_patch(self, patch):
+        """就地应用 RFC 7396 merge patch（转换为等价的 RFC 6902 操作），并按变化量更新进度计数"""
+        self.apply_json_patch(merge_patch_ops(self.json_content, patch))
+
+    def _apply_deltas(self, content, deltas):
+        self.json_content = content
+        if deltas is None or not self.section_progress:
+            self.recount_fields()
+            return
+        counts = dict(self.section_progress)
+        for key, (total, verified) in deltas.items():
+            if key in content:
+                old_total, old_verified = counts.get(key, [0, 0])
+                counts[key] = [old_total + total, old_verified + verified]
+            else:
+                counts.pop(key, None)
+        self.section_progress = counts
+        self._sum_sections()
+
+    def save_version(self, expected_version, expected_updated_at=None, bump=True, fields=()):
+        """乐观并发写入：用一条 UPDATE ... WHERE version = 期望版本 保存内容和进度计数，
+        不加行锁；bump 为 True 时版本号加一。没有更新到任何行时抛出 VersionConflict。
+        expected_updated_at 不为空时同时比较更新时间，用于检测不改版本号的就地修改。
+        bump 时同时决定随后写入的历史记录保存差量还是快照，不需要从数据库还原上一版本"""
+        ops = self._prepare_content()
+        history_chain, history_patch = self.history_chain, None
+        if bump:
+            if (ops is None or history_chain is None
+                    or history_chain + 1 >= settings.HISTORY_SNAPSHOT_INTERVAL):
+                history_chain = 0
+            else:
+                history_chain, history_patch = history_chain + 1, ops
+        elif ops != []:
+            # 不创建新版本地修改了内容，最新历史记录不再等于当前内容
+            history_chain = None
+        rows = Annotation.objects.filter(pk=self.pk, version=expected_version, is_deleted=False)
+        if expected_updated_at is not None:
+            rows = rows.filter(updated_at=expected_updated_at)
+        new_version = expected_version + 1 if bump else expected_version
+        now = timezone.now()
+        values = {
+            name: getattr(self, name)
+            for name in ('json_content', 'section_progress', 'total_fields', 'verified_fields', *fields)
+        }
+        if not rows.update(version=new_version, updated_at=now, history_chain=history_chain, **values):
+            current = Annotation.objects.filter(pk=self.pk).values_list('version', flat=True).first()
+            raise VersionConflict(self.pk, expected_version, current)
+        annotation_cache.discard(self.pk, self.version, self.updated_at)
+        self.version = new_version
+        self.updated_at = now
+        self.history_chain, self.history_patch = history_chain, history_patch
+        self._json_ops, self._ops_content = [], self.json_content
+        FileProgress.track(self)
+
+    def _prepare_content(self):
+        """保存前同步进度计数并对 JSON 内容进行排序，返回自上次保存以来的操作"""
+        self._sync_content()
+        ops = self._json_ops
         if self.json_content:
-            self.json_content = self.order_json_content()
+            self.json_content = self._ops_content = self.order_json_content()
+            if not self.section_progress:
+                self.recount_fields()
+        return ops
+
+    def save(self, *args, **kwargs):
+        ops = self._prepare_content()
+        if self._state.adding:
+            # 新建标注后都会写入一条内容相同的初始快照
+            self.history_chain = 0
+        elif ops != []:
+            self.history_chain = None
         super().save(*args, **kwargs)
+        self._json_ops, self._ops_content = [], self.json_content
 
 class AnnotationHistory(models.Model):
     CHANGE_TYPES = [
@@ -143,8 +350,9 @@ class AnnotationHistory(models.Model):
 
     annotation = models.ForeignKey(Annotation, related_name='history', on_delete=models.CASCADE)
     field_path = models.CharField(max_length=255)  # 记录修改的字段路径
-    old_value = models.JSONField(null=True)  # 修改前的值
-    new_value = models.JSONField()  # 修改后的值
+    old_value = models.JSONField(null=True)  # 修改前的值（差量存储后不再写入）
+    new_value = models.JSONField(null=True, encoder=FastJSONEncoder, decoder=FastJSONDecoder)  # 快照行保存完整内容，差量行为空
+    patch = models.JSONField(null=True, blank=True)  # 相对上一条历史记录的 JSON Patch，为空表示快照
     pdf_content = models.TextField()  # PDF中的实际内容
     position = models.JSONField()  # 位置信息
     verification_status = models.CharField(max_length=20)  # 当时的验证状态
@@ -155,4 +363,124 @@ class AnnotationHistory(models.Model):
     version = models.IntegerField()
 
     class Meta:
-        ordering = ['-version'] 
\ No newline at end of file
+        ordering = ['-version']
+        indexes = [
+            models.Index(fields=['annotation', '-modified_at', '-id'], name='history_annotation_time_idx'),
+        ]
+        constraints = [
+            # 每个版本只有一条历史记录；唯一约束同时承担 (annotation, version) 上的查询
+            models.UniqueConstraint(fields=['annotation', 'version'], name='history_annotation_version_uniq'),
+        ]
+
+class PageText(models.Model):
+    """PDF 每一页提取出的文本，与标注 JSON 一起建立全文索引（见 search.py）"""
+    file = models.ForeignKey(File, related_name='pages', on_delete=models.CASCADE)
+    page = models.IntegerField()  # 页码，从 1 开始
+    text = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['file', 'page']
+        constraints = [
+            models.UniqueConstraint(fields=['file', 'page'], name='pagetext_file_page_uniq'),
+        ]
+
+    @classmethod
+    def for_file(cls, file, texts):
+        """构造（不保存）文件各页的文本行"""
+        return [cls(file=file, page=number, text=text) for number, text in enumerate(texts, start=1)]
+
+class FileProgress(models.Model):
+    """文件进度汇总表：每个文件一行，冗余保存看板的分组维度和最新版本标注的计数。
+    写入标注时由 track 同步更新，看板只聚合这张窄表（见 dashboard.py）"""
+    file = models.OneToOneField(File, primary_key=True, related_name='progress_rollup', on_delete=models.CASCADE)
+    file_type = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    uploaded_by = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    uploaded_on = models.DateField()  # 上传日期（当前时区）
+    is_deleted = models.BooleanField(default=False)
+    # 计数来自文件中版本最高的未删除标注；标注硬删除后由 refresh 重新选择
+    annotation_id = models.IntegerField(null=True)
+    version = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(null=True)
+    total_fields = models.IntegerField(default=0)
+    verified_fields = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # 看板按类型、状态、日期分组聚合；上传人和计数列也放进索引，聚合时只扫描索引
+            models.Index(
+                fields=['file_type', 'status', 'uploaded_on', 'uploaded_by', 'total_fields', 'verified_fields'],
+                condition=models.Q(is_deleted=False),
+                name='fileprogress_live_group_idx'
+            ),
+        ]
+
+    @classmethod
+    def for_file(cls, file, annotation=None):
+        """构造（不保存）文件的汇总行"""
+        row = cls(
+            file=file, file_type=file.file_type, status=file.status, uploaded_by_id=file.uploaded_by_id,
+            uploaded_on=timezone.localdate(file.uploaded_at), is_deleted=file.is_deleted
+        )
+        if annotation is not None:
+            row.annotation_id = annotation.pk
+            row.version = annotation.version
+            row.updated_at = annotation.updated_at
+            row.total_fields = annotation.total_fields
+            row.verified_fields = annotation.verified_fields
+        return row
+
+    @classmethod
+    def track(cls, annotation):
+        """标注写入后用一条条件 UPDATE 同步汇总行：只有该标注的版本不低于汇总行当前的来源时才覆盖，
+        并发写入的同步顺序颠倒时不会用旧计数覆盖新计数"""
+        version, updated_at = annotation.version, annotation.updated_at
+        cls.objects.filter(file_id=annotation.file_id).filter(
+            models.Q(annotation_id__isnull=True)
+            | models.Q(version__lt=version)
+            | models.Q(annotation_id=annotation.pk, version=version, updated_at__lte=updated_at)
+        ).update(
+            annotation_id=annotation.pk, version=version, updated_at=updated_at,
+            total_fields=annotation.total_fields, verified_fields=annotation.verified_fields
+        )
+
+    @classmethod
+    def refresh(cls, file_id):
+        """按文件当前版本最高的未删除标注重新计算汇总行"""
+        latest = (
+            Annotation.objects.filter(file_id=file_id, is_deleted=False).order_by('-version')
+            .values('id', 'version', 'updated_at', 'total_fields', 'verified_fields').first()
+        ) or {'id': None, 'version': 0, 'updated_at': None, 'total_fields': 0, 'verified_fields': 0}
+        cls.objects.filter(file_id=file_id).update(
+            annotation_id=latest['id'], version=latest['version'], updated_at=latest['updated_at'],
+            total_fields=latest['total_fields'], verified_fields=latest['verified_fields']
+        )
+
+class BatchJob(models.Model):
+    KINDS = [
+        ('batch_verify', '批量验证'),
+        ('import', '批量导入')
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', '排队中'),
+        ('running', '执行中'),
+        ('completed', '已完成'),
+        ('failed', '失败')
+    ]
+
+    kind = models.CharField(max_length=20, choices=KINDS, default='batch_verify')
+    file = models.ForeignKey(File, related_name='batch_jobs', on_delete=models.CASCADE, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total = models.IntegerField(default=0)  # 批次中的条目数
+    results = models.JSONField(null=True, blank=True)  # 完成后每个条目的结果
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"BatchJob {self.pk} for {self.file_id} ({self.status})"
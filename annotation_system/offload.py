@@ -0,0 +1,122 @@
+"""
+异步视图的 PyMuPDF 计算卸载
+
+async 视图把 fitz.open / get_pixmap 这类 CPU 密集的调用提交到这里的进程池，
+事件循环只等待结果，慢的预览渲染不会阻塞同一 worker 上的其他请求。
+在途任务数超过 ASYNC_PDF_MAX_QUEUE 时直接拒绝（视图返回 503），
+排队深度和执行耗时通过 metrics() 暴露。
+
+任务在子进程中执行，因此本模块不能依赖已加载的 Django 应用。
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .preview_cache import lower_priority
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+def _timed(func, args):
+    """在子进程中执行，同时返回开始时间和执行耗时"""
+    started = time.time()
+    result = func(*args)
+    return result, started, time.time() - started
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class PdfExecutor:
+    """有界的进程池；每个进程内一个实例，可同时服务多个事件循环"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._workers = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        # 最近若干次任务的排队耗时和执行耗时（秒）
+        self._wait_times = deque(maxlen=1000)
+        self._run_times = deque(maxlen=1000)
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._workers = settings.ASYNC_PDF_WORKERS or os.cpu_count() or 1
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=lower_priority,
+                initargs=(settings.PRERENDER_NICE,),
+            )
+
+    async def run(self, func, *args):
+        """在进程池中执行 func(*args) 并等待结果；队列已满时抛出 ExecutorBusy"""
+        with self._lock:
+            if self.in_flight >= settings.ASYNC_PDF_MAX_QUEUE:
+                self.rejected += 1
+                raise ExecutorBusy('PDF 处理队列已满，请稍后重试')
+            self._ensure_started()
+            self.in_flight += 1
+        submitted = time.time()
+        try:
+            future = self._executor.submit(_timed, func, args)
+        except Exception:
+            self._finished(submitted, None)
+            raise
+        # 在 concurrent future 完成时计数，请求被取消时任务仍然计入在途数
+        future.add_done_callback(lambda f: self._finished(submitted, f))
+        result, _, _ = await asyncio.wrap_future(future)
+        return result
+
+    def _finished(self, submitted, future):
+        with self._lock:
+            self.in_flight -= 1
+            if future is None or future.cancelled() or future.exception() is not None:
+                self.failed += 1
+                return
+            _, started, duration = future.result()
+            self.completed += 1
+            self._wait_times.append(max(0.0, started - submitted))
+            self._run_times.append(duration)
+
+    def metrics(self):
+        with self._lock:
+            wait_times = list(self._wait_times)
+            run_times = list(self._run_times)
+            return {
+                'workers': self._workers or settings.ASYNC_PDF_WORKERS or os.cpu_count() or 1,
+                'max_queue': settings.ASYNC_PDF_MAX_QUEUE,
+                'in_flight': self.in_flight,
+                # 超出进程数的在途任务都在排队
+                'queue_depth': max(0, self.in_flight - self._workers),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'wait_ms': {
+                    'avg': round(sum(wait_times) / len(wait_times) * 1000, 2) if wait_times else 0.0,
+                    'p95': round(_percentile(wait_times, 0.95) * 1000, 2),
+                },
+                'run_ms': {
+                    'avg': round(sum(run_times) / len(run_times) * 1000, 2) if run_times else 0.0,
+                    'p95': round(_percentile(run_times, 0.95) * 1000, 2),
+                    'max': round(max(run_times) * 1000, 2) if run_times else 0.0,
+                },
+            }
+
+
+pdf_executor = PdfExecutor()
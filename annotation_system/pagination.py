@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination
+
+
+class FileCursorPagination(CursorPagination):
+    """按上传时间倒序的游标分页，任意深度的翻页都只是一次索引范围扫描"""
+    ordering = ('-uploaded_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class HistoryCursorPagination(CursorPagination):
+    """按修改时间倒序的历史记录游标分页"""
+    ordering = ('-modified_at', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -0,0 +1,28 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from . import codec
+
+
+class FastJSONParser(JSONParser):
+    """JSON 请求体；可用时用 orjson 解析（见 codec）"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if not codec.enabled() or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return codec.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class JSONPatchParser(FastJSONParser):
+    """RFC 6902 JSON Patch 请求体"""
+    media_type = 'application/json-patch+json'
+
+
+class MergePatchParser(FastJSONParser):
+    """RFC 7396 JSON Merge Patch 请求体"""
+    media_type = 'application/merge-patch+json'
@@ -0,0 +1,185 @@
+"""
+JSON 字段值在 PDF 中的位置解析
+
+一次性用 PyMuPDF 的 get_text('words') 为整份文档建立词索引（词 -> 出现位置），
+然后把 json_content 的每个叶子值切成词，从索引中最少见的词出发，
+在同一页上向前后对齐其余的词，匹配到的词的外接矩形就是候选位置。
+词拼写不一致（OCR、大小写、连字符）时按首字母和长度分桶做模糊匹配。
+与逐字段调用 page.search_for 相比，文档只解析一次，每个字段的代价只与其词数和
+候选出现次数有关。
+
+中日韩文字没有空格分词，每个汉字单独作为一个词，矩形按字数在原词宽度内均分。
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from .export import flatten
+
+# 每个字段最多返回的候选数、候选的最低得分
+MAX_CANDIDATES = 3
+MIN_SCORE = 0.6
+# 每个锚点词最多检查的出现次数；对齐时两个匹配词之间最多跳过的词数
+MAX_ANCHOR_OCCURRENCES = 200
+MAX_GAP = 2
+# 超过这个词数的值只用前面的部分定位；短于 MIN_VALUE_LENGTH 个字符的值（如单个数字）不定位
+MAX_VALUE_TOKENS = 200
+MIN_VALUE_LENGTH = 2
+# 参与模糊匹配的最短词长和相似度阈值
+FUZZY_MIN_LENGTH = 4
+FUZZY_CUTOFF = 0.8
+
+_CJK = '㐀-䶿一-鿿豈-﫿'
+_TOKEN_RE = re.compile(f'[{_CJK}]|[^\\W{_CJK}]+')
+
+
+def tokenize(text):
+    """归一化后切词：大小写无关、全角半角统一，汉字逐字切分"""
+    return _TOKEN_RE.findall(unicodedata.normalize('NFKC', str(text)).casefold())
+
+
+class WordIndex:
+    """一份文档的词索引。词按阅读顺序编号，同一页的词编号连续"""
+
+    def __init__(self):
+        self.tokens = []      # 编号 -> 词
+        self.pages = []       # 编号 -> 页码（从 1 开始）
+        self.rects = []       # 编号 -> (x0, y0, x1, y1)
+        self.page_end = {}    # 页码 -> 该页最后一个词的编号 + 1
+        self.page_start = {}  # 页码 -> 该页第一个词的编号
+        self.postings = defaultdict(list)
+        self._buckets = None
+
+    @classmethod
+    def from_document(cls, pdf_doc):
+        index = cls()
+        for page in pdf_doc:
+            index.add_page(page.number + 1, page.get_text('words', sort=True))
+        return index
+
+    def add_page(self, number, words):
+        """words 为 get_text('words') 的结果 (x0, y0, x1, y1, 文本, ...)"""
+        self.page_start[number] = len(self.tokens)
+        for word in words:
+            x0, y0, x1, y1, text = word[:5]
+            parts = tokenize(text)
+            width = (x1 - x0) / len(parts) if parts else 0
+            for offset, part in enumerate(parts):
+                # 一个词被切成多段（汉字、连字符）时按段数均分宽度
+                rect = (x0 + width * offset, y0, x0 + width * (offset + 1), y1) if len(parts) > 1 else (x0, y0, x1, y1)
+                self.postings[part].append(len(self.tokens))
+                self.tokens.append(part)
+                self.pages.append(number)
+                self.rects.append(rect)
+        self.page_end[number] = len(self.tokens)
+        self._buckets = None
+
+    def similar(self, token):
+        """索引中与 token 拼写相近的词（不含完全相同的词）"""
+        if len(token) < FUZZY_MIN_LENGTH:
+            return ()
+        if self._buckets is None:
+            self._buckets = defaultdict(list)
+            for word in self.postings:
+                if len(word) >= FUZZY_MIN_LENGTH:
+                    self._buckets[(word[0], len(word))].append(word)
+            self._similar = lru_cache(maxsize=None)(self._find_similar)
+        return self._similar(token)
+
+    def _find_similar(self, token):
+        matches = []
+        for length in range(len(token) - 1, len(token) + 2):
+            for word in self._buckets.get((token[0], length), ()):
+                if word != token and SequenceMatcher(None, token, word).ratio() >= FUZZY_CUTOFF:
+                    matches.append(word)
+        return tuple(matches)
+
+    def _accepted(self, token):
+        return {token, *self.similar(token)} if token not in self.postings else {token}
+
+    def resolve(self, value):
+        """返回值在文档中的候选位置列表，按得分从高到低"""
+        terms = tokenize(value)[:MAX_VALUE_TOKENS]
+        if sum(len(term) for term in terms) < MIN_VALUE_LENGTH:
+            return []
+        accepted = [self._accepted(term) for term in terms]
+        counts = [sum(len(self.postings.get(word, ())) for word in words) for words in accepted]
+        anchors = sorted((count, j) for j, count in enumerate(counts) if count)[:2]
+
+        candidates = {}
+        for _, j in anchors:
+            # 第一个锚点已经找到完整匹配时不再尝试第二个（第二个锚点用于锚点词本身拼错的情况）
+            if any(c['score'] == 1 for c in candidates.values()):
+                break
+            occurrences = sorted(g for word in accepted[j] for g in self.postings.get(word, ()))
+            for g in occurrences[:MAX_ANCHOR_OCCURRENCES]:
+                matched = self._align(accepted, j, g)
+                key = (self.pages[g], matched[0])
+                if key not in candidates:
+                    candidates[key] = self._candidate(matched, len(terms))
+
+        ranked = sorted(
+            (c for c in candidates.values() if c['score'] >= MIN_SCORE),
+            key=lambda c: (-c['score'], c['page'], c['y1'], c['x1'])
+        )
+        return ranked[:MAX_CANDIDATES]
+
+    def _align(self, accepted, j, g):
+        """以第 j 个词出现在编号 g 为锚点，在同一页内向后、向前依次匹配其余的词"""
+        page = self.pages[g]
+        start, end = self.page_start[page], self.page_end[page]
+        matched = [g]
+        position = g
+        for words in accepted[j + 1:]:
+            for candidate in range(position + 1, min(end, position + MAX_GAP + 2)):
+                if self.tokens[candidate] in words:
+                    matched.append(candidate)
+                    position = candidate
+                    break
+        position = g
+        for words in reversed(accepted[:j]):
+            for candidate in range(position - 1, max(start, position - MAX_GAP - 2) - 1, -1):
+                if self.tokens[candidate] in words:
+                    matched.insert(0, candidate)
+                    position = candidate
+                    break
+        return matched
+
+    def _candidate(self, matched, term_count):
+        # 得分：匹配的词数 / (值的词数 + 区间内多出来的词数)
+        span = matched[-1] - matched[0] + 1
+        score = len(matched) / (term_count + span - len(matched))
+        rects = [self.rects[g] for g in matched]
+        return {
+            'page': self.pages[matched[0]],
+            'x1': round(min(r[0] for r in rects), 2),
+            'y1': round(min(r[1] for r in rects), 2),
+            'x2': round(max(r[2] for r in rects), 2),
+            'y2': round(max(r[3] for r in rects), 2),
+            'score': round(score, 3),
+        }
+
+
+def iter_values(content, prefix=()):
+    """JSON 的叶子值 (字段路径, 值)；路径中去掉验证后缀，与导出一致"""
+    for path, value, _ in flatten(content, prefix):
+        if isinstance(value, bool) or value is None or value == '':
+            continue
+        yield '.'.join(path), value
+
+
+def resolve_content(index, content, prefix=()):
+    """为 JSON 中每个叶子值解析候选位置，返回 {字段路径: [候选, ...]}（只含找到位置的字段）"""
+    positions = {}
+    for path, value in iter_values(content, prefix):
+        candidates = index.resolve(value)
+        if candidates:
+            positions[path] = candidates
+    return positions
+
+
+def annotation_prefix(annotation):
+    """按字段保存的标注，内容挂在 field_path 之下"""
+    return () if annotation.field_path in ('', 'root') else tuple(annotation.field_path.split('.'))
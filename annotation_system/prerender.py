@@ -0,0 +1,186 @@
+"""
+上传后的页面预渲染
+
+perform_create 提交事务后把文件交给这里，由一个调度线程把所有页面
+（缩略图 + 原尺寸）切成小批次投递到多进程池中渲染，结果直接写进预览缓存。
+调度按文件轮转并限制同时在途的批次数，大文件不会独占进程池；
+全部批次完成后 File.status 从 processing 变为 ready（失败则为 error）。
+
+每个 Web 进程各有一个进程池，PRERENDER_WORKERS 是整台主机的总进程数，
+按 WEB_CONCURRENCY 平分到各 Web 进程。进程在渲染中途退出时文件会停留在
+processing，由 recover_stuck()（recover_prerender 命令）重新安排或直接标记为 ready。
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import File, FileProgress
+from .preview_cache import (
+    cache_relpath, lower_priority, normalize_zoom, preview_cache, render_pages, source_key
+)
+
+logger = logging.getLogger(__name__)
+
+
+def set_status(file_id, status, only_if=None):
+    """更新文件状态，同步到进度汇总表；only_if 不为空时只在当前状态为该值时更新"""
+    for model in (File, FileProgress):
+        rows = model.objects.filter(pk=file_id)
+        if only_if is not None:
+            rows = rows.filter(status=only_if)
+        rows.update(status=status)
+
+
+def pool_size():
+    """本进程的渲染进程数：主机总数按 Web 进程数平分，至少 1 个"""
+    total = settings.PRERENDER_WORKERS or os.cpu_count() or 1
+    return max(1, total // max(1, settings.WEB_CONCURRENCY))
+
+
+class _Job:
+    def __init__(self, file_id, pdf_path, tasks):
+        self.file_id = file_id
+        self.pdf_path = pdf_path
+        self.pending = deque(tasks)
+        self.outstanding = 0
+        self.failed = False
+
+
+class Prerenderer:
+    """进程池 + 单个调度线程；每个进程内一个实例"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._dispatcher = None
+        self._slots = None
+        # 已安排但还没有全部完成的文件数，wait() 等待它归零
+        self._unfinished = 0
+        self._idle = threading.Condition(self._lock)
+
+    def enqueue(self, file):
+        """为文件安排预渲染；所有页面都已缓存时直接标记为 ready"""
+        tasks = self.missing_tasks(file)
+        if not tasks:
+            set_status(file.pk, 'ready')
+            return
+        set_status(file.pk, 'processing')
+        self._ensure_started()
+        with self._lock:
+            self._unfinished += 1
+        self._queue.put(_Job(file.pk, file.pdf_file.path, tasks))
+
+    def wait(self, timeout=None):
+        """等待已安排的文件全部渲染完成，超时返回 False"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def missing_tasks(self, file):
+        zooms = {normalize_zoom(settings.PREVIEW_THUMBNAIL_ZOOM), normalize_zoom(1.0)}
+        key = source_key(file)
+        tasks = []
+        for page in range(1, file.page_count + 1):
+            for zoom in sorted(zooms):
+                dest_path = preview_cache.abspath(cache_relpath(key, page, zoom))
+                if not os.path.exists(dest_path):
+                    tasks.append((page, zoom, dest_path))
+        return tasks
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._dispatcher is not None:
+                return
+            workers = pool_size()
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=lower_priority,
+                initargs=(settings.PRERENDER_NICE,),
+            )
+            self._slots = threading.BoundedSemaphore(workers * 2)
+            self._dispatcher = threading.Thread(
+                target=self._dispatch, name='prerender-dispatcher', daemon=True
+            )
+            self._dispatcher.start()
+
+    def _dispatch(self):
+        active = deque()
+        while True:
+            # 没有活动任务时阻塞等待，有活动任务时只收取已到达的新任务
+            try:
+                while True:
+                    active.append(self._queue.get(block=not active))
+            except queue.Empty:
+                pass
+
+            job = active.popleft()
+            self._slots.acquire()
+            with self._lock:
+                size = min(settings.PRERENDER_CHUNK_PAGES, len(job.pending))
+                chunk = [job.pending.popleft() for _ in range(size)]
+                job.outstanding += 1
+            try:
+                future = self._executor.submit(render_pages, job.pdf_path, chunk)
+            except Exception:
+                logger.exception('预渲染任务提交失败: file=%s', job.file_id)
+                self._slots.release()
+                with self._lock:
+                    job.pending.clear()
+                self._chunk_done(job, failed=True)
+                continue
+            future.add_done_callback(lambda f, job=job: self._on_chunk_done(job, f))
+            if job.pending:
+                active.append(job)
+
+    def _on_chunk_done(self, job, future):
+        self._slots.release()
+        failed = future.exception() is not None
+        if failed:
+            logger.error('预渲染失败: file=%s', job.file_id, exc_info=future.exception())
+        else:
+            preview_cache.store(future.result())
+        self._chunk_done(job, failed)
+
+    def _chunk_done(self, job, failed):
+        with self._lock:
+            job.outstanding -= 1
+            job.failed = job.failed or failed
+            finished = job.outstanding == 0 and not job.pending
+        if finished:
+            close_old_connections()
+            set_status(job.file_id, 'error' if job.failed else 'ready', only_if='processing')
+            with self._idle:
+                self._unfinished -= 1
+                self._idle.notify_all()
+
+
+prerenderer = Prerenderer()
+
+
+def recover_stuck(stale_seconds=None, reset=False):
+    """处理上传超过 stale_seconds 仍处于 processing 的文件（渲染进程中途退出留下的）。
+    默认重新安排预渲染（已存在的页面会跳过）；reset 时直接标记为 ready，预览改为按需渲染。
+    返回处理的文件 ID 列表"""
+    if stale_seconds is None:
+        stale_seconds = settings.PRERENDER_STALE_SECONDS
+    cutoff = timezone.now() - timedelta(seconds=stale_seconds)
+    files = list(
+        File.objects.filter(status='processing', is_deleted=False, uploaded_at__lt=cutoff)
+        .only('id', 'pdf_file', 'checksum', 'page_count')
+    )
+    for file in files:
+        if reset:
+            set_status(file.pk, 'ready', only_if='processing')
+        else:
+            prerenderer.enqueue(file)
+    return [file.pk for file in files]
@@ -0,0 +1,212 @@
+"""
+页面预览缓存
+
+渲染好的 PNG 按 File.checksum + 页码 + 渲染参数做内容寻址存放在
+MEDIA_ROOT/previews/cache 下，命中时直接返回已有图片而不再打开 PDF；
+磁盘占用超过 PREVIEW_CACHE_MAX_BYTES 时按最近访问时间 (mtime) 做 LRU 淘汰。
+"""
+import os
+import threading
+import uuid
+
+import fitz
+from django.conf import settings
+
+from .docpool import doc_pool
+
+CACHE_DIR = os.path.join('previews', 'cache')
+
+
+def source_key(file):
+    """缓存键的内容部分：优先使用 checksum，老数据没有 checksum 时退回文件 ID"""
+    return file.checksum or f'file-{file.pk}'
+
+
+def normalize_zoom(zoom):
+    """把缩放比例限制在允许范围内并统一精度，避免同一参数产生多个缓存项"""
+    zoom = float(zoom)
+    zoom = max(settings.PREVIEW_MIN_ZOOM, min(settings.PREVIEW_MAX_ZOOM, zoom))
+    return round(zoom, 2)
+
+
+def cache_relpath(key, page, zoom):
+    """返回相对 MEDIA_ROOT 的缓存路径，按 key 前两位分目录"""
+    return os.path.join(CACHE_DIR, key[:2], f'{key}_p{page}_z{zoom:.2f}.png')
+
+
+def write_page_png(pdf_doc, page, zoom, dest_path):
+    """把已打开文档的某一页渲染为 PNG 并原子地写入 dest_path，返回写入的字节数"""
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f'{dest_path}.{uuid.uuid4().hex}.tmp'
+    pix = pdf_doc[page - 1].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    pix.save(tmp_path, output='png')
+    os.replace(tmp_path, dest_path)
+    return os.path.getsize(dest_path)
+
+
+def render_page_png(pdf_path, page, zoom, dest_path):
+    """打开 PDF 渲染单页，返回写入的字节数"""
+    with fitz.open(pdf_path) as pdf_doc:
+        return write_page_png(pdf_doc, page, zoom, dest_path)
+
+
+def render_pages(pdf_path, tasks):
+    """打开一次 PDF，渲染一批 (页码, 缩放, 目标路径)，跳过已存在的，返回写入字节数；
+    预渲染进程池在子进程中调用，因此本模块不能依赖已加载的 Django 应用"""
+    written = 0
+    with fitz.open(pdf_path) as pdf_doc:
+        for page, zoom, dest_path in tasks:
+            if os.path.exists(dest_path):
+                continue
+            written += write_page_png(pdf_doc, page, zoom, dest_path)
+    return written
+
+
+def lower_priority(niceness):
+    """进程池初始化：降低渲染进程的调度优先级，让出 CPU 给请求处理"""
+    try:
+        os.nice(niceness)
+    except (AttributeError, OSError):
+        pass
+
+
+class PreviewCache:
+    """进程内的预览缓存索引；磁盘上的文件是唯一的数据来源，多进程共享"""
+
+    def __init__(self, root=None, max_bytes=None):
+        self._root = root
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def root(self):
+        return self._root or settings.MEDIA_ROOT
+
+    @property
+    def max_bytes(self):
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return settings.PREVIEW_CACHE_MAX_BYTES
+
+    def abspath(self, relpath):
+        return os.path.join(self.root, relpath)
+
+    def lookup(self, relpath):
+        """命中时刷新访问时间并返回 True"""
+        path = self.abspath(relpath)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, size):
+        """登记新写入的缓存文件，超出预算时触发淘汰"""
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def get_or_render(self, file, page, zoom=1.0):
+        """返回 (相对路径, 是否命中)；未命中时同步渲染"""
+        zoom = normalize_zoom(zoom)
+        relpath = cache_relpath(source_key(file), page, zoom)
+        if self.lookup(relpath):
+            return relpath, True
+        with doc_pool.document(file) as pdf_doc:
+            size = write_page_png(pdf_doc, page, zoom, self.abspath(relpath))
+        self.store(size)
+        return relpath, False
+
+    def evict(self):
+        """按 mtime 从旧到新删除，直到占用降到预算的 90%"""
+        with self._lock:
+            entries = []
+            total = 0
+            for path, stat in self._iter_entries():
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            target = int(self.max_bytes * 0.9)
+            entries.sort()
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+            self._size = total
+
+    def keys(self):
+        """缓存中出现的全部 source_key"""
+        return {os.path.basename(path).rsplit('_p', 1)[0] for path, _ in self._iter_entries()}
+
+    def remove_key(self, key, dry_run=False):
+        """删除某个内容（source_key）的全部预览图片，返回释放的字节数"""
+        prefix = f'{key}_p'
+        freed = 0
+        try:
+            entries = list(os.scandir(os.path.join(self.root, CACHE_DIR, key[:2])))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if not (entry.name.startswith(prefix) and entry.name.endswith('.png')):
+                continue
+            try:
+                size = entry.stat().st_size
+                if not dry_run:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            freed += size
+        if freed and not dry_run:
+            with self._lock:
+                if self._size is not None:
+                    self._size = max(0, self._size - freed)
+        return freed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _iter_entries(self):
+        base = os.path.join(self.root, CACHE_DIR)
+        if not os.path.isdir(base):
+            return
+        for shard in os.scandir(base):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.png'):
+                    try:
+                        yield entry.path, entry.stat()
+                    except FileNotFoundError:
+                        continue
+
+    def _scan_size(self):
+        return sum(stat.st_size for _, stat in self._iter_entries())
+
+
+preview_cache = PreviewCache()
@@ -0,0 +1,111 @@
+"""
+标注进度统计
+
+字段被验证后键名（或列表中的字符串值）会带上 -comlhj 后缀。
+Annotation 按顶层字段分段保存 [总数, 已验证数]，写入时按修改的路径累计变化量
+（整体替换内容时先与原内容求差异），读取进度时不需要遍历 json_content。
+"""
+
+VERIFIED_SUFFIX = '-comlhj'
+
+
+def count_fields(obj):
+    """一次遍历同时返回 (总字段数, 已验证字段数)，口径与 count_total_fields / count_verified_fields 一致"""
+    total = verified = 0
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                total += 1
+                if key.endswith(VERIFIED_SUFFIX):
+                    verified += 1
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+        elif isinstance(node, list):
+            for item in node:
+                if isinstance(item, str):
+                    total += 1
+                    if item.endswith(VERIFIED_SUFFIX):
+                        verified += 1
+                elif isinstance(item, (dict, list)):
+                    stack.append(item)
+    return total, verified
+
+
+def entry_counts(key, value):
+    """对象中一个键值对贡献的 (总数, 已验证数)"""
+    total, verified = count_fields(value)
+    return 1 + total, int(key.endswith(VERIFIED_SUFFIX)) + verified
+
+
+def item_counts(value):
+    """列表中一个元素贡献的 (总数, 已验证数)"""
+    if isinstance(value, str):
+        return 1, int(value.endswith(VERIFIED_SUFFIX))
+    return count_fields(value)
+
+
+def section_counts(json_content):
+    """按顶层字段统计 {字段: [总数, 已验证数]}；非对象内容记在空键下"""
+    if not isinstance(json_content, dict):
+        return {'': list(count_fields(json_content))}
+    return {key: list(entry_counts(key, value)) for key, value in json_content.items()}
+
+
+def progress_payload(total_fields, verified_fields):
+    progress = (verified_fields / total_fields * 100) if total_fields > 0 else 0
+    return {
+        'total_fields': total_fields,
+        'verified_fields': verified_fields,
+        'progress': round(progress, 2)
+    }
+
+
+def count_verified_fields(json_obj):
+    """计算已验证的字段数（带有 -comlhj 后缀的字段或值）"""
+    count = 0
+    if isinstance(json_obj, dict):
+        for key, value in json_obj.items():
+            if key.endswith('-comlhj'):
+                count += 1
+            if isinstance(value, (dict, list)):
+                count += count_verified_fields(value)
+    elif isinstance(json_obj, list):
+        for item in json_obj:
+            if isinstance(item, str) and item.endswith('-comlhj'):
+                count += 1
+            elif isinstance(item, (dict, list)):
+                count += count_verified_fields(item)
+    return count
+
+
+def count_total_fields(json_obj):
+    """计算总字段数"""
+    count = 0
+    if isinstance(json_obj, dict):
+        for key, value in json_obj.items():
+            # 去掉后缀计算总数
+            key = key.replace('-comlhj', '')
+            count += 1
+            if isinstance(value, (dict, list)):
+                count += count_total_fields(value)
+    elif isinstance(json_obj, list):
+        for item in json_obj:
+            if isinstance(item, str):
+                # 去掉后缀计算总数
+                count += 1
+            elif isinstance(item, (dict, list)):
+                count += count_total_fields(item)
+    return count
+
+
+def file_progress(counts, field_order):
+    """由标注上的计数生成进度响应；分段按 field_order 排列，其余字段排在后面"""
+    sections = counts['section_progress'] or {}
+    order = {key: i for i, key in enumerate(field_order)}
+    keys = sorted(sections, key=lambda k: order.get(k, len(order)))
+    return {
+        **progress_payload(counts['total_fields'], counts['verified_fields']),
+        'sections': {key: progress_payload(*sections[key]) for key in keys}
+    }
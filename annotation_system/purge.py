@@ -0,0 +1,195 @@
+"""
+软删除文件的清理
+
+删除接口只写入删除标记。保留期（PURGE_GRACE_DAYS）过后，purge() 分批硬删除这些文件：
+- 历史记录、标注、页面文本、进度汇总行、批量任务和文件行按主键分块删除，
+  每块一个短事务，不会长时间锁住大表；
+- 行删除提交后，再删除不再被任何文件行引用的 PDF blob、JSON 和预览图片
+  （PDF 和预览按内容共享，仍被其他文件引用时保留）。
+sweep_orphans() 删除存储中没有任何文件行引用、且早于保留期的文件（如上传失败留下的 blob），
+以及没有对应文件的预览图片。两者都返回删除的行数和回收的字节数；dry_run 时只统计。
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .ingest import BLOB_DIR
+from .models import Annotation, AnnotationHistory, BatchJob, File, FileProgress, PageText
+from .preview_cache import preview_cache
+
+# 按依赖顺序删除的相关数据：(统计项, 文件 ID 列表 -> 查询集)
+DEPENDENTS = [
+    ('history', lambda ids: AnnotationHistory.objects.filter(annotation__file_id__in=ids)),
+    ('annotations', lambda ids: Annotation.objects.filter(file_id__in=ids)),
+    ('pages', lambda ids: PageText.objects.filter(file_id__in=ids)),
+    ('rollups', lambda ids: FileProgress.objects.filter(file_id__in=ids)),
+    ('batch_jobs', lambda ids: BatchJob.objects.filter(file_id__in=ids)),
+]
+# 存储中由文件行引用的目录：blob 存储和 FileField 的 upload_to
+STORAGE_DIRS = (BLOB_DIR, 'pdfs', 'jsons')
+# 孤立文件检查时每次查询的文件名数
+SWEEP_CHUNK = 500
+
+
+def new_stats():
+    return {
+        'files': 0,
+        **{name: 0 for name, _ in DEPENDENTS},
+        'pdf_bytes': 0,
+        'json_bytes': 0,
+        'preview_bytes': 0,
+        'orphan_files': 0,
+        'orphan_bytes': 0,
+    }
+
+
+def reclaimed_bytes(stats):
+    return stats['pdf_bytes'] + stats['json_bytes'] + stats['preview_bytes'] + stats['orphan_bytes']
+
+
+def delete_chunked(queryset, chunk_size):
+    """按主键分块删除，每块一个短事务，返回删除的行数"""
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            _, counts = model.objects.filter(pk__in=ids).only('pk').delete()
+        deleted += counts.get(model._meta.label, 0)
+
+
+def remove_stored(name, dry_run=False):
+    """删除存储中的文件，返回其大小；文件已不存在时返回 0"""
+    try:
+        size = default_storage.size(name)
+    except OSError:
+        return 0
+    if not dry_run:
+        default_storage.delete(name)
+    return size
+
+
+def expired_files(cutoff, batch_size, after=None):
+    """删除时间早于 cutoff 的一批文件，按 (deleted_at, id) 排序；after 为上一批最后一行的位置"""
+    rows = File.objects.filter(is_deleted=True, deleted_at__lt=cutoff)
+    if after is not None:
+        deleted_at, pk = after
+        rows = rows.filter(Q(deleted_at__gt=deleted_at) | Q(deleted_at=deleted_at, pk__gt=pk))
+    return list(
+        rows.order_by('deleted_at', 'id')
+        .values('id', 'deleted_at', 'pdf_file', 'json_file', 'checksum')[:batch_size]
+    )
+
+
+def purge_files(files, stats, chunk_size, dry_run=False):
+    """硬删除一批文件的数据库行，再删除不再被引用的存储文件和预览图片"""
+    ids = [f['id'] for f in files]
+    for name, rows in DEPENDENTS:
+        stats[name] += rows(ids).count() if dry_run else delete_chunked(rows(ids), chunk_size)
+    if dry_run:
+        stats['files'] += len(ids)
+    else:
+        stats['files'] += delete_chunked(File.objects.filter(pk__in=ids, is_deleted=True), chunk_size)
+
+    # 其余文件行（包括尚在保留期内的软删除文件）仍引用的内容保留
+    others = File.objects.exclude(pk__in=ids)
+    pdfs = {f['pdf_file'] for f in files if f['pdf_file']}
+    kept = set(others.filter(pdf_file__in=pdfs).values_list('pdf_file', flat=True))
+    for name in pdfs - kept:
+        stats['pdf_bytes'] += remove_stored(name, dry_run)
+
+    jsons = {f['json_file'] for f in files if f['json_file']}
+    kept = set(others.filter(json_file__in=jsons).values_list('json_file', flat=True))
+    for name in jsons - kept:
+        stats['json_bytes'] += remove_stored(name, dry_run)
+
+    checksums = {f['checksum'] for f in files if f['checksum']}
+    kept = set(others.filter(checksum__in=checksums).values_list('checksum', flat=True))
+    keys = sorted(checksums - kept) + [f'file-{f["id"]}' for f in files if not f['checksum']]
+    for key in keys:
+        stats['preview_bytes'] += preview_cache.remove_key(key, dry_run)
+
+
+def purge(grace_days=None, batch_size=None, chunk_size=None, dry_run=False, progress=None):
+    """硬删除保留期已过的软删除文件，返回统计信息；每批完成后回调 progress(统计信息)"""
+    if grace_days is None:
+        grace_days = settings.PURGE_GRACE_DAYS
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    chunk_size = chunk_size or settings.PURGE_DELETE_CHUNK
+    cutoff = timezone.now() - timedelta(days=grace_days)
+
+    stats = new_stats()
+    after = None
+    while True:
+        files = expired_files(cutoff, batch_size, after)
+        if not files:
+            return stats
+        purge_files(files, stats, chunk_size, dry_run)
+        after = (files[-1]['deleted_at'], files[-1]['id'])
+        if progress:
+            progress(stats)
+
+
+def _walk(directory):
+    try:
+        directories, names = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        yield f'{directory}/{name}'
+    for sub in directories:
+        yield from _walk(f'{directory}/{sub}')
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def sweep_orphans(grace_days=None, dry_run=False, stats=None):
+    """删除没有任何文件行引用的存储文件和预览图片，结果累加到 stats"""
+    if grace_days is None:
+        grace_days = settings.PURGE_GRACE_DAYS
+    # 刚写入、所属的文件行还未提交的上传不能删除
+    cutoff = timezone.now() - timedelta(days=grace_days)
+    stats = stats if stats is not None else new_stats()
+
+    for directory in STORAGE_DIRS:
+        for names in _chunks(_walk(directory), SWEEP_CHUNK):
+            referenced = set()
+            for pdf_name, json_name in File.objects.filter(
+                Q(pdf_file__in=names) | Q(json_file__in=names)
+            ).values_list('pdf_file', 'json_file'):
+                referenced.update((pdf_name, json_name))
+            for name in names:
+                if name in referenced:
+                    continue
+                try:
+                    if default_storage.get_modified_time(name) >= cutoff:
+                        continue
+                except OSError:
+                    continue
+                stats['orphan_files'] += 1
+                stats['orphan_bytes'] += remove_stored(name, dry_run)
+
+    # 预览图片只在文件行存在后才会生成，没有对应文件行的都可以删除
+    for keys in _chunks(sorted(preview_cache.keys()), SWEEP_CHUNK):
+        file_ids = {int(key[5:]) for key in keys if key.startswith('file-') and key[5:].isdigit()}
+        live = set(File.objects.filter(checksum__in=keys).values_list('checksum', flat=True))
+        live.update(f'file-{pk}' for pk in File.objects.filter(pk__in=file_ids).values_list('pk', flat=True))
+        for key in keys:
+            if key not in live:
+                stats['preview_bytes'] += preview_cache.remove_key(key, dry_run)
+    return stats
@@ -0,0 +1,83 @@
+"""
+标注响应缓存
+
+标注详情和 ?file_id= 列表读取远多于写入。序列化后的 JSON 按
+(标注 ID, 版本, 更新时间) 缓存在 ANNOTATION_CACHE_ALIAS 对应的 Django 缓存中
+（进程内存、文件或 Redis，见 settings）。任何写入都会改变版本或更新时间，
+旧键不再被读取，因此缓存不会返回过期内容；save_version 成功后顺便删除旧键，
+不占用缓存空间。命中时不加载 json_content，也不重新排序和编码。
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from .renderers import FastJSONRenderer
+
+_renderer = FastJSONRenderer()
+
+
+def render_json(data):
+    """与接口的 JSON 渲染器输出相同的字节"""
+    return _renderer.render(data)
+
+
+def cache_key(annotation_id, version, updated_at):
+    return f'annotation:{annotation_id}:{version}:{updated_at.timestamp():.6f}'
+
+
+class AnnotationResponseCache:
+    """每个进程内一个实例；命中统计只计本进程"""
+
+    def __init__(self, alias=None):
+        self._alias = alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @property
+    def cache(self):
+        return caches[self._alias or settings.ANNOTATION_CACHE_ALIAS]
+
+    def get_or_render(self, values, load, serialize):
+        """values 为标注的 id / version / updated_at。未命中时 load() 读取标注，
+        serialize(标注) 返回序列化后的数据；读到的标注与 values 版本一致时才写入缓存。
+        返回 (JSON 字节, 是否命中)"""
+        key = cache_key(values['id'], values['version'], values['updated_at'])
+        body = self.cache.get(key)
+        if body is not None:
+            with self._lock:
+                self.hits += 1
+            return body, True
+
+        annotation = load()
+        body = render_json(serialize(annotation))
+        # 两次读取之间标注被修改时，读到的内容不属于这个键
+        stored = (annotation.pk, annotation.version, annotation.updated_at) == (
+            values['id'], values['version'], values['updated_at']
+        )
+        if stored:
+            self.cache.set(key, body, settings.ANNOTATION_CACHE_TIMEOUT)
+        with self._lock:
+            self.misses += 1
+            self.stores += stored
+        return body, False
+
+    def discard(self, annotation_id, version, updated_at):
+        """删除被新版本取代的缓存项"""
+        if updated_at is not None:
+            self.cache.delete(cache_key(annotation_id, version, updated_at))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': settings.ANNOTATION_CACHE_BACKEND,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'stores': self.stores,
+            }
+
+
+annotation_cache = AnnotationResponseCache()
@@ -0,0 +1,321 @@
+"""
+全文搜索
+
+PDF 每页提取的文本（PageText）和标注 json_content 中的字符串值一起建立全文索引：
+- PostgreSQL：两张表各有一个 STORED 生成的 tsvector 列（search_vector）和 GIN 索引，
+  websearch_to_tsquery 解析查询，ts_rank_cd 排序，只为最终返回的命中调用 ts_headline；
+- SQLite（本地开发）：FTS5 虚拟表，由触发器与原表同步，bm25 排序，snippet 生成摘要。
+两种后端都只取得分最高的 SEARCH_MAX_HITS 条命中再按文件分组，
+生成摘要和读取文件信息的开销与索引的总页数无关。
+"""
+import html
+import json
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from .ingest import PAGE_TEXT_LIMIT
+from .models import File
+from .progress import VERIFIED_SUFFIX
+
+# PostgreSQL 文本搜索配置；简历中英文混排，不做词干化
+SEARCH_CONFIG = 'simple'
+
+# 标注中参与索引的字符串拼接后最多保留的长度；与页面文本相同，保证 tsvector 不超过 1MB，
+# 超出部分不参与搜索，但内容照常保存
+ANNOTATION_TEXT_LIMIT = PAGE_TEXT_LIMIT
+
+# 摘要中的高亮标记：先用私有区字符占位，HTML 转义后再替换为 <mark>
+_START, _STOP = '\ue000', '\ue001'
+
+# 标注的 tsvector 由截断后的字符串值生成，否则过大的 json_content 会让写入失败
+POSTGRES_ANNOTATION_INDEX = [
+    f"""CREATE OR REPLACE FUNCTION annotation_search_text(content jsonb) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT left(coalesce(string_agg(value #>> '{{}}', ' '), ''), {ANNOTATION_TEXT_LIMIT})
+              FROM jsonb_path_query(content, 'strict $.** ? (@.type() == "string")') AS value $$""",
+    f"""ALTER TABLE annotation_system_annotation ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', annotation_search_text(json_content))) STORED""",
+    'CREATE INDEX annotation_search_idx ON annotation_system_annotation USING gin (search_vector)',
+]
+
+POSTGRES_INSTALL = [
+    f"""ALTER TABLE annotation_system_pagetext ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', text)) STORED""",
+    'CREATE INDEX pagetext_search_idx ON annotation_system_pagetext USING gin (search_vector)',
+    *POSTGRES_ANNOTATION_INDEX,
+]
+
+POSTGRES_UNINSTALL = [
+    'ALTER TABLE annotation_system_annotation DROP COLUMN search_vector',
+    'DROP FUNCTION IF EXISTS annotation_search_text(jsonb)',
+    'ALTER TABLE annotation_system_pagetext DROP COLUMN search_vector',
+]
+
+# 标注 JSON 中所有字符串值拼接成的文本，与 PostgreSQL 相同地截断
+_SQLITE_JSON_TEXT = (
+    "SELECT substr(coalesce(group_concat(value, ' '), ''), 1, %d) "
+    "FROM json_tree({}.json_content) WHERE type = 'text'" % ANNOTATION_TEXT_LIMIT
+)
+
+SQLITE_TABLES = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_pagetext_fts USING fts5(
+        text, content='annotation_system_pagetext', content_rowid='id')""",
+    'CREATE VIRTUAL TABLE IF NOT EXISTS search_annotation_fts USING fts5(text)',
+]
+
+SQLITE_TRIGGERS = {
+    'search_pagetext_ai': """CREATE TRIGGER search_pagetext_ai AFTER INSERT ON annotation_system_pagetext BEGIN
+        INSERT INTO search_pagetext_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    'search_pagetext_ad': """CREATE TRIGGER search_pagetext_ad AFTER DELETE ON annotation_system_pagetext BEGIN
+        INSERT INTO search_pagetext_fts(search_pagetext_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    'search_pagetext_au': """CREATE TRIGGER search_pagetext_au AFTER UPDATE ON annotation_system_pagetext BEGIN
+        INSERT INTO search_pagetext_fts(search_pagetext_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO search_pagetext_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    'search_annotation_ai': f"""CREATE TRIGGER search_annotation_ai AFTER INSERT ON annotation_system_annotation BEGIN
+        INSERT INTO search_annotation_fts(rowid, text) {_SQLITE_JSON_TEXT.format('new').replace('SELECT', 'SELECT new.id,', 1)};
+    END""",
+    'search_annotation_au': f"""CREATE TRIGGER search_annotation_au AFTER UPDATE OF json_content ON annotation_system_annotation BEGIN
+        DELETE FROM search_annotation_fts WHERE rowid = old.id;
+        INSERT INTO search_annotation_fts(rowid, text) {_SQLITE_JSON_TEXT.format('new').replace('SELECT', 'SELECT new.id,', 1)};
+    END""",
+    'search_annotation_ad': """CREATE TRIGGER search_annotation_ad AFTER DELETE ON annotation_system_annotation BEGIN
+        DELETE FROM search_annotation_fts WHERE rowid = old.id;
+    END""",
+}
+
+SQLITE_REBUILD = [
+    "INSERT INTO search_pagetext_fts(search_pagetext_fts) VALUES ('rebuild')",
+    'DELETE FROM search_annotation_fts',
+    f"""INSERT INTO search_annotation_fts(rowid, text)
+        SELECT a.id, ({_SQLITE_JSON_TEXT.format('a')}) FROM annotation_system_annotation a""",
+]
+
+
+def install_sqlite(cursor):
+    """创建 FTS5 表和同步触发器并重建索引。
+    SQLite 的迁移修改表结构时会重建表并丢掉触发器，因此可以重复执行"""
+    for sql in SQLITE_TABLES:
+        cursor.execute(sql)
+    for name, sql in SQLITE_TRIGGERS.items():
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(sql)
+    for sql in SQLITE_REBUILD:
+        cursor.execute(sql)
+
+
+def uninstall_sqlite(cursor):
+    for name in SQLITE_TRIGGERS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    cursor.execute('DROP TABLE IF EXISTS search_pagetext_fts')
+    cursor.execute('DROP TABLE IF EXISTS search_annotation_fts')
+
+
+def render_snippet(snippet):
+    """HTML 转义摘要，再把高亮占位符换成 <mark>"""
+    return html.escape(snippet).replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def _marked_strings(node):
+    """ts_headline 处理过的 JSON 中带高亮的字符串值"""
+    if isinstance(node, dict):
+        for value in node.values():
+            yield from _marked_strings(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _marked_strings(item)
+    elif isinstance(node, str) and _START in node:
+        yield node[:-len(VERIFIED_SUFFIX)] if node.endswith(VERIFIED_SUFFIX) else node
+
+
+class PostgresSearch:
+    HEADLINE_OPTIONS = f'StartSel={_START}, StopSel={_STOP}, MaxWords=30, MinWords=10, MaxFragments=2'
+
+    def _hits(self, cursor, sql, query, limit, file_type):
+        file_filter = 'AND f.file_type = %s' if file_type else ''
+        params = [SEARCH_CONFIG, query] + ([file_type] if file_type else []) + [limit]
+        cursor.execute(sql.format(file_filter=file_filter), params)
+        return cursor.fetchall()
+
+    def page_hits(self, query, limit, file_type=None):
+        with connection.cursor() as cursor:
+            rows = self._hits(cursor, """
+                SELECT p.id, p.file_id, p.page, ts_rank_cd(p.search_vector, q.query) AS score
+                FROM annotation_system_pagetext p
+                JOIN annotation_system_file f ON f.id = p.file_id,
+                     websearch_to_tsquery(%s::regconfig, %s) AS q(query)
+                WHERE p.search_vector @@ q.query AND NOT f.is_deleted {file_filter}
+                ORDER BY score DESC
+                LIMIT %s
+            """, query, limit, file_type)
+        return [
+            {'source': 'pdf', 'id': row[0], 'file_id': row[1], 'page': row[2], 'score': row[3], 'snippet': None}
+            for row in rows
+        ]
+
+    def annotation_hits(self, query, limit, file_type=None):
+        with connection.cursor() as cursor:
+            rows = self._hits(cursor, """
+                SELECT a.id, a.file_id, ts_rank_cd(a.search_vector, q.query) AS score
+                FROM annotation_system_annotation a
+                JOIN annotation_system_file f ON f.id = a.file_id,
+                     websearch_to_tsquery(%s::regconfig, %s) AS q(query)
+                WHERE a.search_vector @@ q.query AND NOT a.is_deleted AND NOT f.is_deleted {file_filter}
+                ORDER BY score DESC
+                LIMIT %s
+            """, query, limit, file_type)
+        return [
+            {'source': 'json', 'id': row[0], 'file_id': row[1], 'score': row[2], 'snippet': None}
+            for row in rows
+        ]
+
+    def add_snippets(self, query, hits):
+        """只为最终返回的命中生成摘要；ts_headline 需要重新解析原文，代价较高"""
+        by_source = defaultdict(dict)
+        for hit in hits:
+            by_source[hit['source']][hit['id']] = hit
+        with connection.cursor() as cursor:
+            if by_source['pdf']:
+                cursor.execute("""
+                    SELECT p.id, ts_headline(%s::regconfig, p.text, websearch_to_tsquery(%s::regconfig, %s), %s)
+                    FROM annotation_system_pagetext p WHERE p.id = ANY(%s)
+                """, [SEARCH_CONFIG, SEARCH_CONFIG, query, self.HEADLINE_OPTIONS, list(by_source['pdf'])])
+                for pk, snippet in cursor.fetchall():
+                    by_source['pdf'][pk]['snippet'] = snippet
+            if by_source['json']:
+                cursor.execute("""
+                    SELECT a.id, ts_headline(%s::regconfig, a.json_content, websearch_to_tsquery(%s::regconfig, %s), %s)
+                    FROM annotation_system_annotation a WHERE a.id = ANY(%s)
+                """, [SEARCH_CONFIG, SEARCH_CONFIG, query, self.HEADLINE_OPTIONS, list(by_source['json'])])
+                for pk, content in cursor.fetchall():
+                    # Django 让驱动把 jsonb 作为文本返回
+                    content = json.loads(content) if isinstance(content, str) else content
+                    strings = list(_marked_strings(content))[:3]
+                    by_source['json'][pk]['snippet'] = ' … '.join(strings)
+
+
+class SqliteSearch:
+    _installed = False
+
+    def _ensure_installed(self, cursor):
+        """每个进程检查一次触发器是否还在（表重建后需要重新安装）"""
+        if SqliteSearch._installed:
+            return
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s)"
+            % ', '.join(['%s'] * len(SQLITE_TRIGGERS)),
+            list(SQLITE_TRIGGERS)
+        )
+        if cursor.fetchone()[0] != len(SQLITE_TRIGGERS):
+            install_sqlite(cursor)
+        SqliteSearch._installed = True
+
+    @staticmethod
+    def match_expression(query):
+        """把用户输入转为 FTS5 查询：每个词加引号，词之间为 AND，避免输入被当作 FTS5 语法"""
+        terms = re.findall(r'\w+', query)
+        return ' '.join('"{}"'.format(term) for term in terms)
+
+    def _hits(self, sql, query, limit, file_type):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        file_filter = 'AND f.file_type = %s' if file_type else ''
+        params = [_START, _STOP, expression] + ([file_type] if file_type else []) + [limit]
+        with connection.cursor() as cursor:
+            self._ensure_installed(cursor)
+            cursor.execute(sql.format(file_filter=file_filter), params)
+            return cursor.fetchall()
+
+    def page_hits(self, query, limit, file_type=None):
+        rows = self._hits("""
+            SELECT p.id, p.file_id, p.page, -bm25(search_pagetext_fts) AS score,
+                   snippet(search_pagetext_fts, 0, %s, %s, '…', 24)
+            FROM search_pagetext_fts
+            JOIN annotation_system_pagetext p ON p.id = search_pagetext_fts.rowid
+            JOIN annotation_system_file f ON f.id = p.file_id
+            WHERE search_pagetext_fts MATCH %s AND NOT f.is_deleted {file_filter}
+            ORDER BY bm25(search_pagetext_fts)
+            LIMIT %s
+        """, query, limit, file_type)
+        return [
+            {'source': 'pdf', 'id': row[0], 'file_id': row[1], 'page': row[2], 'score': row[3], 'snippet': row[4]}
+            for row in rows
+        ]
+
+    def annotation_hits(self, query, limit, file_type=None):
+        rows = self._hits("""
+            SELECT a.id, a.file_id, -bm25(search_annotation_fts) AS score,
+                   snippet(search_annotation_fts, 0, %s, %s, '…', 24)
+            FROM search_annotation_fts
+            JOIN annotation_system_annotation a ON a.id = search_annotation_fts.rowid
+            JOIN annotation_system_file f ON f.id = a.file_id
+            WHERE search_annotation_fts MATCH %s AND NOT a.is_deleted AND NOT f.is_deleted {file_filter}
+            ORDER BY bm25(search_annotation_fts)
+            LIMIT %s
+        """, query, limit, file_type)
+        return [
+            {'source': 'json', 'id': row[0], 'file_id': row[1], 'score': row[2], 'snippet': row[3]}
+            for row in rows
+        ]
+
+    def add_snippets(self, query, hits):
+        # snippet() 已在排序查询中生成
+        pass
+
+
+def get_backend():
+    return PostgresSearch() if connection.vendor == 'postgresql' else SqliteSearch()
+
+
+def search(query, limit=20, file_type=None):
+    """按相关度返回文件，每个文件附带得分最高的若干条页面 / 标注命中"""
+    backend = get_backend()
+    max_hits = settings.SEARCH_MAX_HITS
+    hits = backend.page_hits(query, max_hits, file_type) + backend.annotation_hits(query, max_hits, file_type)
+
+    # 文件得分为其所有候选命中的得分之和，命中的页面越多越靠前
+    by_file = defaultdict(list)
+    scores = defaultdict(float)
+    for hit in hits:
+        by_file[hit['file_id']].append(hit)
+        scores[hit['file_id']] += hit['score']
+    ranked = sorted(by_file.items(), key=lambda item: -scores[item[0]])[:limit]
+
+    kept = []
+    for _, file_hits in ranked:
+        file_hits.sort(key=lambda hit: -hit['score'])
+        del file_hits[settings.SEARCH_HITS_PER_FILE:]
+        kept.extend(file_hits)
+    backend.add_snippets(query, kept)
+
+    files = File.objects.only(
+        'id', 'name', 'file_type', 'status', 'page_count', 'uploaded_at'
+    ).in_bulk([file_id for file_id, _ in ranked]) if ranked else {}
+    results = []
+    for file_id, file_hits in ranked:
+        file = files[file_id]
+        results.append({
+            'file_id': file.id,
+            'name': file.name,
+            'file_type': file.file_type,
+            'status': file.status,
+            'page_count': file.page_count,
+            'uploaded_at': file.uploaded_at,
+            'score': round(scores[file_id], 6),
+            'hits': [
+                {
+                    'source': hit['source'],
+                    **({'page': hit['page']} if hit['source'] == 'pdf' else {'annotation_id': hit['id']}),
+                    'score': round(hit['score'], 6),
+                    'snippet': render_snippet(hit['snippet'] or '')
+                }
+                for hit in file_hits
+            ]
+        })
+    return results
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import File, Annotation, AnnotationHistory
+from .models import File, Annotation, AnnotationHistory, BatchJob
 from django.contrib.auth.models import User
 
 class UserSerializer(serializers.ModelSerializer):
@@ -44,6 +44,8 @@ class AnnotationSerializer(serializers.ModelSerializer):
             'updated_at': instance.updated_at.isoformat(),
             'verification_status': instance.verification_status,
             'comment': instance.comment or '',
+            'position': instance.position or {},
+            'field_positions': instance.field_positions or {},  # {字段路径: [候选位置, ...]}
             'data': instance.order_json_content()  # JSON 内容放在 data 字段中
         }
         return data
@@ -55,6 +57,7 @@ class AnnotationHistorySerializer(serializers.ModelSerializer):
         model = AnnotationHistory
         fields = [
             'id',
+            'annotation',
             'version',
             'change_type',
             'change_description',
@@ -67,4 +70,20 @@ class AnnotationHistorySerializer(serializers.ModelSerializer):
         data = super().to_representation(instance)
         # 格式化时间
         data['modified_at'] = instance.modified_at.isoformat()
-        return data 
\ No newline at end of file
+        return data
+
+
+class BatchVerifyItemSerializer(serializers.Serializer):
+    """batch_verify 中的单个条目"""
+    field_path = serializers.CharField(max_length=255)
+    pdf_content = serializers.CharField(allow_blank=True, default='')
+    json_content = serializers.JSONField()
+    position = serializers.JSONField(required=False, allow_null=True, default=None)
+    is_correct = serializers.BooleanField(default=False)
+    confidence_score = serializers.FloatField(default=0.0, min_value=0.0, max_value=1.0)
+    comment = serializers.CharField(allow_blank=True, default='')
+
+class BatchJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BatchJob
+        fields = ['id', 'kind', 'file', 'status', 'total', 'results', 'error', 'created_at', 'finished_at']
@@ -33,6 +33,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'annotation_system.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,6 +61,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'annotation_system.wsgi.application'
+ASGI_APPLICATION = 'annotation_system.asgi.application'
 
 # 使用 PostgreSQL
 DATABASES = {
@@ -81,6 +83,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'annotation_system.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'annotation_system.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 from datetime import timedelta
@@ -108,6 +119,93 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# 页面预览缓存：磁盘预算（字节）与允许的缩放范围
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get('PREVIEW_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+PREVIEW_MIN_ZOOM = 0.1
+PREVIEW_MAX_ZOOM = 4.0
+PREVIEW_THUMBNAIL_ZOOM = 0.25
+
+# 标注响应缓存：序列化后的标注按 (ID, 版本, 更新时间) 缓存。后端为 locmem（进程内，默认）、
+# file（多进程共享，ANNOTATION_CACHE_LOCATION 为目录）或 redis（LOCATION 为 redis:// 地址，需要 redis 包）
+ANNOTATION_CACHE_ALIAS = 'annotations'
+ANNOTATION_CACHE_BACKEND = os.environ.get('ANNOTATION_CACHE_BACKEND', 'locmem')
+ANNOTATION_CACHE_LOCATION = os.environ.get('ANNOTATION_CACHE_LOCATION', '')
+ANNOTATION_CACHE_TIMEOUT = int(os.environ.get('ANNOTATION_CACHE_TIMEOUT', 24 * 3600))
+ANNOTATION_CACHE_MAX_ENTRIES = int(os.environ.get('ANNOTATION_CACHE_MAX_ENTRIES', 2000))
+_ANNOTATION_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'annotations'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.path.join(BASE_DIR, 'cache', 'annotations')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://localhost:6379/1'),
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    ANNOTATION_CACHE_ALIAS: {
+        'BACKEND': _ANNOTATION_CACHE_BACKENDS[ANNOTATION_CACHE_BACKEND][0],
+        'LOCATION': ANNOTATION_CACHE_LOCATION or _ANNOTATION_CACHE_BACKENDS[ANNOTATION_CACHE_BACKEND][1],
+        'TIMEOUT': ANNOTATION_CACHE_TIMEOUT,
+        'OPTIONS': {} if ANNOTATION_CACHE_BACKEND == 'redis' else {'MAX_ENTRIES': ANNOTATION_CACHE_MAX_ENTRIES},
+    },
+}
+
+# JSON 编解码：安装了 orjson 时用它解析请求、渲染响应和读写 json_content（见 codec）
+JSON_FAST_CODEC = os.environ.get('JSON_FAST_CODEC', '1') == '1'
+
+# 响应压缩：不小于该字节数的文本响应按 Accept-Encoding 压缩；安装了 brotli 包时优先 br，
+# 否则 gzip。级别越高压缩越慢，大 JSON 上 gzip 1 与 6 的压缩率相差很小
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 1))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+
+# 历史记录差量存储：每隔多少条历史记录保存一次完整快照
+HISTORY_SNAPSHOT_INTERVAL = 20
+# create_initial_history 每个事务写入的历史记录数
+INITIAL_HISTORY_CHUNK_SIZE = 1000
+
+# 上传后预渲染：整台主机的渲染进程总数（0 表示 CPU 核数，按 WEB_CONCURRENCY 平分到各 Web 进程）、
+# 每批页数、渲染进程的 nice 值；上传超过 PRERENDER_STALE_SECONDS 仍在 processing 的文件视为中断
+PRERENDER_ENABLED = os.environ.get('PRERENDER_ENABLED', '1') == '1'
+PRERENDER_WORKERS = int(os.environ.get('PRERENDER_WORKERS', 0))
+PRERENDER_CHUNK_PAGES = 8
+PRERENDER_NICE = 10
+PRERENDER_STALE_SECONDS = int(os.environ.get('PRERENDER_STALE_SECONDS', 1800))
+# 每台主机的 Web 进程数（与 gunicorn / uvicorn 的 WEB_CONCURRENCY 一致）
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+# 批量验证：超过阈值的批次转为后台任务执行；后台线程数；bulk_create 每批行数
+BATCH_VERIFY_ASYNC_THRESHOLD = int(os.environ.get('BATCH_VERIFY_ASYNC_THRESHOLD', 500))
+BATCH_JOB_WORKERS = int(os.environ.get('BATCH_JOB_WORKERS', 2))
+BATCH_CREATE_SIZE = 500
+
+# 批量导入：解析进程数（0 表示 CPU 核数）、每个事务提交的文件数；
+# 接口只允许导入 IMPORT_ROOT 下的服务器目录（为空时只接受上传的 zip）
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', 0))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 200))
+IMPORT_ROOT = os.environ.get('IMPORT_ROOT', '')
+
+# 打开的 PDF 文档池：每个进程最多同时打开的文档数、空闲多少秒后关闭
+DOCPOOL_MAX_OPEN = int(os.environ.get('DOCPOOL_MAX_OPEN', 32))
+DOCPOOL_IDLE_SECONDS = int(os.environ.get('DOCPOOL_IDLE_SECONDS', 300))
+
+# 异步接口的 PDF 进程池：进程数（0 表示 CPU 核数）、最多在途任务数（超出返回 503）
+ASYNC_PDF_WORKERS = int(os.environ.get('ASYNC_PDF_WORKERS', 0))
+ASYNC_PDF_MAX_QUEUE = int(os.environ.get('ASYNC_PDF_MAX_QUEUE', 64))
+
+# 导出时每次从数据库读取的标注数
+EXPORT_CHUNK_SIZE = 500
+
+# 软删除文件的清理：删除多少天后硬删除、每批处理的文件数、每条 DELETE 删除的行数；
+# PURGE_INTERVAL_SECONDS 为 purge_deleted --interval 的默认间隔
+PURGE_GRACE_DAYS = int(os.environ.get('PURGE_GRACE_DAYS', 30))
+PURGE_BATCH_SIZE = 200
+PURGE_DELETE_CHUNK = 2000
+PURGE_INTERVAL_SECONDS = int(os.environ.get('PURGE_INTERVAL_SECONDS', 3600))
+
+# 全文搜索：每种来源（PDF 页面 / 标注 JSON）最多取的候选命中数，每个文件返回的命中数
+SEARCH_MAX_HITS = 200
+SEARCH_HITS_PER_FILE = 3
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -0,0 +1,156 @@
+"""乐观并发控制：并发写入同一条标注时没有丢失的更新，过期的写入得到 409 / 412"""
+import logging
+import threading
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TransactionTestCase, override_settings, skipUnlessDBFeature
+from rest_framework.test import APIClient
+
+from annotation_system.history import build_history, content_at
+from annotation_system.models import Annotation, AnnotationHistory, File, FileProgress, VersionConflict
+
+from .utils import MEDIA_ROOT
+
+CONTENT = {
+    'personal_info': {'name': 'Sean Wu', 'title': 'Professor'},
+    'honors': ['Award A', 'Award B'],
+    'stress': {},
+}
+
+# 依次使用的并发控制方式：If-Match、expected_version 参数、服务端读取到的版本
+MODES = ('if_match', 'expected_version', 'implicit')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PRERENDER_ENABLED=False)
+class ConcurrentWriteTests(TransactionTestCase):
+    """线程需要看到彼此提交的数据，不能在 TestCase 的外层事务中执行"""
+    threads = 4
+    writes = 6
+    max_retries = 200
+
+    def setUp(self):
+        self.user = User.objects.create_user('tester')
+        # 样例内容不是完整的简历，使用不限制结构的 other 类型
+        file = File.objects.create(
+            name='stress', file_type='other', pdf_file='stress/stress.pdf',
+            json_file='stress/stress.json', uploaded_by=self.user
+        )
+        annotation = Annotation.objects.create(
+            file=file, field_type='others', field_path='root', pdf_content='',
+            json_content=CONTENT, annotator=self.user
+        )
+        build_history(annotation, self.user, change_type='create', description='初始标注').save()
+        FileProgress.for_file(file, annotation).save(force_insert=True)
+        self.pk = annotation.pk
+        self.client = self.new_client()
+
+    def new_client(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client
+
+    def url(self, suffix=''):
+        return f'/api/annotations/{self.pk}/{suffix}'
+
+    def put(self, client, key, n, **headers):
+        return client.put(self.url('update_content/'), {'merge_patch': {'stress': {key: n}}},
+                          format='json', **headers)
+
+    def test_stale_if_match_is_rejected(self):
+        etag = self.client.get(self.url())['ETag']
+        self.assertEqual(self.put(self.client, 'a', 1, HTTP_IF_MATCH=etag).status_code, 200)
+        response = self.put(self.new_client(), 'b', 1, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Annotation.objects.get(pk=self.pk).json_content['stress'], {'a': 1})
+
+    def test_stale_expected_version_conflicts(self):
+        url = self.url('update_content/?expected_version=1')
+        self.assertEqual(self.client.put(url, {'merge_patch': {'stress': {'a': 1}}}, format='json').status_code, 200)
+        response = self.new_client().put(url, {'merge_patch': {'stress': {'b': 1}}}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['current_version'], 2)
+
+    def test_write_between_read_and_update_conflicts(self):
+        # 两个请求读到同一版本；后写入的一方以读到的版本为条件更新，不会覆盖先写入的内容
+        first, second = Annotation.objects.get(pk=self.pk), Annotation.objects.get(pk=self.pk)
+        first.apply_merge_patch({'stress': {'a': 1}})
+        first.save_version(first.version, first.updated_at)
+        second.apply_merge_patch({'stress': {'b': 1}})
+        with self.assertRaises(VersionConflict) as cm:
+            second.save_version(second.version, second.updated_at)
+        self.assertEqual(cm.exception.current_version, 2)
+        self.assertEqual(Annotation.objects.get(pk=self.pk).json_content['stress'], {'a': 1})
+
+    # SQLite 测试库不支持多个连接并发写入；在 PostgreSQL 上运行
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_concurrent_writes_lose_no_updates(self):
+        successes, conflicts, errors = Counter(), Counter(), []
+        lock = threading.Lock()
+        barrier = threading.Barrier(self.threads)
+
+        def write(client, key, n, mode):
+            """读取最新版本后写入一次，遇到 409 / 412 时重新读取并重试"""
+            for _ in range(self.max_retries):
+                response = client.get(self.url())
+                url = self.url('update_content/')
+                headers = {}
+                if mode == 'if_match':
+                    headers['HTTP_IF_MATCH'] = response['ETag']
+                elif mode == 'expected_version':
+                    url += f'?expected_version={response.json()["version"]}'
+                response = client.put(url, {'merge_patch': {'stress': {key: n}}}, format='json', **headers)
+                if response.status_code in (409, 412):
+                    with lock:
+                        conflicts[response.status_code] += 1
+                    continue
+                if response.status_code != 200:
+                    raise AssertionError(f'HTTP {response.status_code} {getattr(response, "data", "")}')
+                with lock:
+                    successes[mode] += 1
+                return
+            raise AssertionError(f'{key} 第 {n} 次写入重试 {self.max_retries} 次仍然冲突')
+
+        def worker(index):
+            try:
+                client = self.new_client()
+                barrier.wait()
+                for n in range(self.writes):
+                    write(client, f't{index}', n, MODES[(index + n) % len(MODES)])
+            except Exception as e:
+                with lock:
+                    errors.append(f't{index}: {e!r}')
+            finally:
+                connection.close()
+
+        # 冲突是预期的结果，不输出每个 409 / 412 的警告日志
+        logger = logging.getLogger('django.request')
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.ERROR)
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+        writes = self.threads * self.writes
+        self.assertEqual(sum(successes.values()), writes)
+        annotation = Annotation.objects.get(pk=self.pk)
+        self.assertEqual(annotation.version, writes + 1)
+        versions = list(
+            AnnotationHistory.objects.filter(annotation_id=self.pk).order_by('version')
+            .values_list('version', flat=True)
+        )
+        self.assertEqual(versions, list(range(1, writes + 2)))
+        # 每个线程的最后一次写入都保留在最终内容中
+        self.assertEqual(annotation.json_content['stress'],
+                         {f't{i}': self.writes - 1 for i in range(self.threads)})
+        self.assertEqual(content_at(self.pk, annotation.version), annotation.json_content)
+        # 并发写入同步汇总行的顺序可能颠倒，汇总行仍应停在最终版本
+        rollup = FileProgress.objects.get(file_id=annotation.file_id)
+        self.assertEqual(
+            (rollup.version, rollup.total_fields, rollup.verified_fields),
+            (annotation.version, annotation.total_fields, annotation.verified_fields)
+        )
@@ -0,0 +1,73 @@
+"""差量历史的回放：多操作补丁经 content_at、history 接口和回滚还原出每个版本"""
+import copy
+import json
+
+from django.test import override_settings
+
+from annotation_system.history import content_at
+from annotation_system.models import Annotation, AnnotationHistory
+
+from .utils import SAMPLE_JSON, SeededTestCase
+
+
+@override_settings(HISTORY_SNAPSHOT_INTERVAL=3)
+class HistoryReplayTests(SeededTestCase):
+    def patch(self, body, content_type='application/json-patch+json'):
+        response = self.client.patch(self.detail_url(), json.dumps(body), content_type=content_type)
+        self.assertEqual(response.status_code, 200, response.data)
+        return Annotation.objects.get(pk=self.annotation_id)
+
+    def write_versions(self):
+        """依次写入若干多操作补丁，返回 {版本: 写入后的内容}"""
+        contents = {1: copy.deepcopy(SAMPLE_JSON)}
+        for body, content_type in (
+            # 后一个操作修改前一个操作插入的值
+            ([{'op': 'add', 'path': '/honors2', 'value': {'x': '1'}},
+              {'op': 'remove', 'path': '/honors2/x'}], 'application/json-patch+json'),
+            ([{'op': 'replace', 'path': '/honors2', 'value': {'list': ['a']}},
+              {'op': 'add', 'path': '/honors2/list/-', 'value': 'b'},
+              {'op': 'copy', 'from': '/honors2/list', 'path': '/honors2/copy'},
+              {'op': 'add', 'path': '/honors2/copy/0', 'value': 'z'}], 'application/json-patch+json'),
+            ({'honors2': {'y': {'deep': ['1']}}, 'honors': ['Award C']}, 'application/merge-patch+json'),
+            ([{'op': 'add', 'path': '/honors2/y/deep/-', 'value': '2'},
+              {'op': 'move', 'from': '/honors2/y', 'path': '/honors2/z'},
+              {'op': 'test', 'path': '/honors2/z/deep', 'value': ['1', '2']}], 'application/json-patch+json'),
+        ):
+            annotation = self.patch(body, content_type)
+            contents[annotation.version] = copy.deepcopy(annotation.json_content)
+        return contents
+
+    def test_multi_op_patches_round_trip(self):
+        contents = self.write_versions()
+        self.assertEqual(len(contents), 5)
+        # 间隔为 3 时历史链中既有快照也有差量
+        rows = AnnotationHistory.objects.filter(annotation_id=self.annotation_id)
+        self.assertTrue(rows.filter(patch__isnull=True).count() > 1)
+        self.assertTrue(rows.filter(patch__isnull=False).exists())
+        self.assertEqual(contents[2]['honors2'], {})
+        for version, content in contents.items():
+            with self.subTest(version=version):
+                self.assertEqual(content_at(self.annotation_id, version), content)
+                response = self.client.get(self.detail_url('history/'), {'version': version})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['data'], content)
+
+    def test_rollback_to_a_patched_version(self):
+        contents = self.write_versions()
+        response = self.request('post', f'/api/annotations/{self.file_id}/rollback/', {'version': 3})
+        self.assertEqual(response.status_code, 200)
+        annotation = Annotation.objects.get(pk=self.annotation_id)
+        self.assertEqual(annotation.json_content, contents[3])
+        self.assertEqual(content_at(self.annotation_id, annotation.version), contents[3])
+
+    def test_unreplayable_history_conflicts(self):
+        self.write_versions()
+        AnnotationHistory.objects.filter(annotation_id=self.annotation_id, version=2).update(
+            patch=[{'op': 'remove', 'path': '/missing'}]
+        )
+        with self.assertLogs('annotation_system.views', 'ERROR'):
+            response = self.client.get(self.detail_url('history/'), {'version': 2})
+            self.assertEqual(response.status_code, 409)
+            response = self.request('post', f'/api/annotations/{self.file_id}/rollback/', {'version': 2})
+            self.assertEqual(response.status_code, 409)
+        self.assertEqual(Annotation.objects.get(pk=self.annotation_id).version, 5)
@@ -0,0 +1,170 @@
+"""JSON Patch / merge patch 的语义，以及接受补丁请求体的标注接口"""
+import copy
+import json
+
+from django.test import SimpleTestCase
+
+from annotation_system.jsonpatch import (
+    JsonPatchError, apply_merge_patch, apply_patch, make_patch, merge_patch_ops
+)
+from annotation_system.models import Annotation
+from annotation_system.progress import section_counts
+
+from .utils import SeededTestCase
+
+
+class JsonPatchTests(SimpleTestCase):
+    def test_add_inserts_a_copy_of_the_value(self):
+        ops = [
+            {'op': 'add', 'path': '/honors2', 'value': {'x': '1'}},
+            {'op': 'remove', 'path': '/honors2/x'},
+        ]
+        sent = copy.deepcopy(ops)
+        doc, _ = apply_patch({'honors': []}, ops)
+        self.assertEqual(doc, {'honors': [], 'honors2': {}})
+        # 之后的操作修改的是文档中的副本，补丁本身保持原样
+        self.assertEqual(ops, sent)
+
+    def test_replace_inserts_a_copy_of_the_value(self):
+        ops = [
+            {'op': 'replace', 'path': '/a', 'value': ['x']},
+            {'op': 'add', 'path': '/a/-', 'value': 'y'},
+        ]
+        doc, _ = apply_patch({'a': []}, ops)
+        self.assertEqual(doc, {'a': ['x', 'y']})
+        self.assertEqual(ops[0]['value'], ['x'])
+
+    def test_test_op_is_type_strict(self):
+        for actual, expected in ((1, True), (1, 1.0), (0, False), ({'a': 1}, {'a': True})):
+            with self.subTest(actual=actual, expected=expected):
+                with self.assertRaises(JsonPatchError):
+                    apply_patch({'v': actual}, [{'op': 'test', 'path': '/v', 'value': expected}])
+        doc, _ = apply_patch({'v': [1, 'a']}, [{'op': 'test', 'path': '/v', 'value': [1, 'a']}])
+        self.assertEqual(doc, {'v': [1, 'a']})
+
+    def test_move_and_copy(self):
+        doc, _ = apply_patch({'a': {'b': 1}, 'c': []}, [
+            {'op': 'copy', 'from': '/a', 'path': '/c/-'},
+            {'op': 'move', 'from': '/a/b', 'path': '/d'},
+        ])
+        self.assertEqual(doc, {'a': {}, 'c': [{'b': 1}], 'd': 1})
+        with self.assertRaises(JsonPatchError):
+            apply_patch({'a': {'b': 1}}, [{'op': 'move', 'from': '/a', 'path': '/a/b/c'}])
+
+    def test_invalid_paths(self):
+        for op in (
+            {'op': 'remove', 'path': '/missing'},
+            {'op': 'replace', 'path': '/missing', 'value': 1},
+            {'op': 'add', 'path': '/list/5', 'value': 1},
+            {'op': 'add', 'path': '/list/01', 'value': 1},
+            {'op': 'add', 'path': 'no-slash', 'value': 1},
+            {'op': 'frobnicate', 'path': '/list'},
+        ):
+            with self.subTest(op=op), self.assertRaises(JsonPatchError):
+                apply_patch({'list': [1]}, [op])
+
+    def test_merge_patch(self):
+        doc = {'a': {'b': 1, 'c': 2}, 'd': 'x'}
+        patch = {'a': {'b': None, 'e': {'f': None, 'g': 3}}, 'd': None, 'h': [1]}
+        ops = merge_patch_ops(doc, patch)
+        self.assertEqual(ops, [
+            {'op': 'remove', 'path': '/a/b'},
+            {'op': 'add', 'path': '/a/e', 'value': {'g': 3}},
+            {'op': 'remove', 'path': '/d'},
+            {'op': 'add', 'path': '/h', 'value': [1]},
+        ])
+        merged, _ = apply_merge_patch(doc, patch)
+        self.assertEqual(merged, {'a': {'c': 2, 'e': {'g': 3}}, 'h': [1]})
+
+    def test_make_patch_round_trip(self):
+        old = {'a': [1, 2, 3, 4], 'b': {'c': 1, 'd': 'x'}, 'e': 1}
+        new = {'a': [1, 5, 4], 'b': {'c': 1.0, 'f': None}, 'g': True}
+        patched, _ = apply_patch(copy.deepcopy(old), make_patch(old, new))
+        self.assertEqual(json.dumps(patched, sort_keys=True), json.dumps(new, sort_keys=True))
+
+    def test_counts_follow_the_patch(self):
+        doc = {'honors': ['a', 'b-comlhj'], 'grants': {'g': '1'}}
+        counts = section_counts(doc)
+        patched, deltas = apply_patch(doc, [
+            {'op': 'add', 'path': '/honors/-', 'value': 'c-comlhj'},
+            {'op': 'remove', 'path': '/grants/g'},
+            {'op': 'add', 'path': '/grants/h-comlhj', 'value': {'x': 'y'}},
+        ])
+        for key, (total, verified) in deltas.items():
+            counts[key] = [counts[key][0] + total, counts[key][1] + verified]
+        self.assertEqual(counts, section_counts(patched))
+
+
+class PatchEndpointTests(SeededTestCase):
+    def patch(self, url, body, content_type):
+        return self.client.patch(url, json.dumps(body), content_type=content_type)
+
+    def assertCountsMatch(self):
+        annotation = Annotation.objects.get(pk=self.annotation_id)
+        counts = section_counts(annotation.json_content)
+        self.assertEqual(annotation.section_progress, counts)
+        self.assertEqual(annotation.total_fields, sum(c[0] for c in counts.values()))
+        self.assertEqual(annotation.verified_fields, sum(c[1] for c in counts.values()))
+        return annotation
+
+    def test_json_patch_media_type(self):
+        response = self.patch(self.detail_url(), [
+            {'op': 'add', 'path': '/honors/-', 'value': 'Award C-comlhj'},
+            {'op': 'replace', 'path': '/grants/r01', 'value': 'NIH R01 (renewed)'},
+        ], 'application/json-patch+json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], 2)
+        annotation = self.assertCountsMatch()
+        self.assertEqual(annotation.json_content['honors'][-1], 'Award C-comlhj')
+        self.assertEqual(response.data['progress']['verified_fields'], annotation.verified_fields)
+
+    def test_merge_patch_media_type(self):
+        response = self.patch(self.detail_url(), {'education': {'phd': None, 'md': 'Harvard'}},
+                              'application/merge-patch+json')
+        self.assertEqual(response.status_code, 200)
+        annotation = self.assertCountsMatch()
+        self.assertEqual(annotation.json_content['education'], {'md': 'Harvard'})
+
+    def test_patch_in_json_body(self):
+        response = self.request('put', self.detail_url('update_content/'), {
+            'patch': [{'op': 'remove', 'path': '/honors/0'}]
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.assertCountsMatch().json_content['honors'], ['Award B'])
+
+    def test_merge_patch_in_json_body_keeps_version(self):
+        response = self.request('put', self.detail_url('edit_field/'), {
+            'merge_patch': {'grants': {'k99': 'NIH K99'}}
+        })
+        self.assertEqual(response.status_code, 200)
+        annotation = self.assertCountsMatch()
+        self.assertEqual(annotation.version, 1)
+        self.assertEqual(annotation.json_content['grants']['k99'], 'NIH K99')
+
+    def test_invalid_patch_is_rejected(self):
+        for body in (
+            [{'op': 'remove', 'path': '/missing'}],
+            [{'op': 'test', 'path': '/grants/r01', 'value': 'other'}],
+            {'op': 'add'},
+        ):
+            with self.subTest(body=body):
+                response = self.patch(self.detail_url(), body, 'application/json-patch+json')
+                self.assertEqual(response.status_code, 400)
+        annotation = Annotation.objects.get(pk=self.annotation_id)
+        self.assertEqual(annotation.version, 1)
+        self.assertEqual(annotation.history.count(), 1)
+
+    def test_patch_that_breaks_the_schema_is_rejected(self):
+        response = self.patch(self.detail_url(), [{'op': 'remove', 'path': '/education'}],
+                              'application/json-patch+json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('education', Annotation.objects.get(pk=self.annotation_id).json_content)
+
+    def test_stale_expected_version_conflicts(self):
+        response = self.client.patch(
+            self.detail_url() + '?expected_version=7',
+            json.dumps([{'op': 'remove', 'path': '/honors/0'}]),
+            content_type='application/json-patch+json'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['current_version'], 1)
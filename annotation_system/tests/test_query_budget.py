@@ -0,0 +1,302 @@
+"""
+各接口的 SQL 查询数预算
+
+在测试数据库上用 assertNumQueries 固定 FileViewSet / AnnotationViewSet 每个接口的查询数，
+预算旁边列出每条查询的来源；新增的查询（例如序列化时的 N+1）会让测试失败。
+种子数据有多个文件，列表类接口的预算不随文件数变化。
+
+- 客户端使用 force_authenticate，不包含 JWT 认证读取用户的 1 条查询
+- 视图中的 transaction.atomic 在 TestCase 中是保存点，SAVEPOINT 和 RELEASE SAVEPOINT 各计 1 条
+"""
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from annotation_system.models import Annotation, AnnotationHistory, File, FileProgress
+from annotation_system.search import search
+
+from .utils import SAMPLE_JSON, SeededTestCase, upload
+
+
+class QueryBudgetTestCase(SeededTestCase):
+    # 列表类接口在多个文件上检查预算
+    seed_files = 3
+
+
+class FileQueryBudgetTests(QueryBudgetTestCase):
+    def test_create(self):
+        # 按校验和查找已存储的相同 PDF，写入文件、各页文本、初始标注、初始历史和进度汇总行
+        with self.assertNumQueries(6):
+            response = upload(self.client, 'probe')
+        self.assertEqual(response.status_code, 201)
+
+    def test_list(self):
+        # 一条游标分页查询；序列化只使用文件本身的字段
+        with self.assertNumQueries(1):
+            response = self.request('get', '/api/files/')
+        self.assertEqual(len(response.data['results']), self.seed_files)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(1):
+            response = self.request('get', f'/api/files/{self.file_id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_preview(self):
+        # 只读取文件；页数来自 File.page_count，渲染和缓存都不访问数据库
+        with self.assertNumQueries(1):
+            response = self.request('get', f'/api/files/{self.file_id}/preview/?page=1')
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_stats(self):
+        # 进程内的统计，不访问数据库
+        with self.assertNumQueries(0):
+            response = self.request('get', '/api/files/cache_stats/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_pdf_info(self):
+        with self.assertNumQueries(1):
+            response = self.request('get', f'/api/files/{self.file_id}/pdf_info/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard(self):
+        # 在进度汇总表上的一条 GROUP BY 聚合
+        with self.assertNumQueries(1):
+            response = self.request('get', '/api/files/dashboard/?group_by=file_type,status,day')
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_ids(self):
+        # 按上传者聚合、批量读取上传者的用户名、读取指定文件的进度行
+        with self.assertNumQueries(3):
+            response = self.request(
+                'get', f'/api/files/dashboard/?group_by=uploaded_by&ids={self.file_id},{self.file_id - 1}'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_progress(self):
+        # 读取文件，再读取最新标注的版本和计数（不读取 json_content）
+        with self.assertNumQueries(2):
+            response = self.request('get', f'/api/files/{self.file_id}/progress/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_progress_not_modified(self):
+        etag = self.request('get', f'/api/files/{self.file_id}/progress/')['ETag']
+        # ETag 由同样的两条查询得出，命中时不再序列化
+        with self.assertNumQueries(2):
+            response = self.request('get', f'/api/files/{self.file_id}/progress/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_history(self):
+        # 读取文件，再用一条 select_related(modified_by) 查询读取一页历史
+        with self.assertNumQueries(2):
+            response = self.request('get', f'/api/files/{self.file_id}/history/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_history_filtered(self):
+        # 过滤条件都落在同一条历史查询中
+        with self.assertNumQueries(2):
+            response = self.request(
+                'get', f'/api/files/{self.file_id}/history/'
+                       f'?change_type=update,verify&version_min=2&since=2000-01-01&page_size=10'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_destroy(self):
+        # 读取文件；事务中软删除文件、它的标注和进度汇总行各一条 UPDATE，外加保存点
+        with self.assertNumQueries(6):
+            response = self.request('delete', f'/api/files/{self.file_id}/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_search(self):
+        search('warm up')  # SQLite 每个进程第一次搜索时检查一次全文索引的触发器
+        # 页面和标注的两条排序查询，以及一条读取命中文件的查询；
+        # PostgreSQL 的摘要由 ts_headline 为最终命中的页面和标注各生成一次
+        budget = 5 if connection.vendor == 'postgresql' else 3
+        with self.assertNumQueries(budget):
+            response = self.request('get', '/api/search/?q=Professor&limit=10')
+        self.assertEqual(response.status_code, 200)
+
+
+class AnnotationQueryBudgetTests(QueryBudgetTestCase):
+    def test_list(self):
+        # 先读取版本和更新时间计算 ETag，未命中缓存时再读取标注
+        with self.assertNumQueries(2):
+            response = self.request('get', f'/api/annotations/?file_id={self.file_id}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_not_modified(self):
+        etag = self.request('get', f'/api/annotations/?file_id={self.file_id}')['ETag']
+        with self.assertNumQueries(1):
+            response = self.request('get', f'/api/annotations/?file_id={self.file_id}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_retrieve(self):
+        # 读取版本和更新时间；序列化结果按版本缓存，命中时不再读取 json_content
+        self.request('get', self.detail_url())
+        with self.assertNumQueries(1):
+            response = self.request('get', self.detail_url())
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve_uncached(self):
+        # 缓存未命中时多一条读取完整标注的查询
+        Annotation.objects.filter(pk=self.annotation_id).update(updated_at=timezone.now())
+        with self.assertNumQueries(2):
+            response = self.request('get', self.detail_url())
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve_not_modified(self):
+        etag = self.request('get', self.detail_url())['ETag']
+        with self.assertNumQueries(1):
+            response = self.request('get', self.detail_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_create(self):
+        # 校验 file 外键、写入标注和初始快照、同步进度汇总行
+        with self.assertNumQueries(4):
+            response = self.request('post', '/api/annotations/', {
+                'file': self.file_id, 'json_content': SAMPLE_JSON, 'verification_status': 'pending'
+            })
+        self.assertEqual(response.status_code, 201)
+
+    def test_edit_field(self):
+        # 读取标注；不创建新版本：条件 UPDATE 标注、同步进度汇总行、更新文件元数据中的进度
+        with self.assertNumQueries(4):
+            response = self.request('put', self.detail_url('edit_field/'), {
+                'patch': [{'op': 'move', 'from': '/honors/0', 'path': '/honors/-'}]
+            })
+        self.assertEqual(response.status_code, 200)
+
+    def test_verify(self):
+        with self.assertNumQueries(4):
+            response = self.request('put', self.detail_url('verify/'), {
+                'patch': [{'op': 'add', 'path': '/personal_info/title-comlhj', 'value': 'Professor'}]
+            })
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_content(self):
+        # 读取标注；创建新版本的事务中：条件 UPDATE 标注、同步进度汇总行、写入一条历史，外加保存点。
+        # 历史记录的差量来自请求本身，不读取已有的历史
+        with self.assertNumQueries(6):
+            response = self.request('put', self.detail_url('update_content/'), {
+                'merge_patch': {'education': {'md': 'Harvard'}}
+            })
+        self.assertEqual(response.status_code, 200)
+
+    def test_partial_update(self):
+        with self.assertNumQueries(6):
+            response = self.request('patch', self.detail_url(), {
+                'patch': [{'op': 'replace', 'path': '/grants/r01', 'value': 'NIH R01 (renewed)'}]
+            })
+        self.assertEqual(response.status_code, 200)
+
+    def test_verify_field(self):
+        with self.assertNumQueries(6):
+            response = self.request('post', self.detail_url('verify_field/'), {'field_path': 'personal_info.name'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_add_missing_field(self):
+        # 读取标注；不创建新版本：条件 UPDATE 标注、同步进度汇总行
+        with self.assertNumQueries(3):
+            response = self.request('post', self.detail_url('add_missing_field/'), {
+                'field_path': 'honors', 'pdf_content': 'Award C', 'position': {'page': 1}
+            })
+        self.assertEqual(response.status_code, 200)
+
+    def test_resolve_positions(self):
+        with self.assertNumQueries(3):
+            response = self.request('post', self.detail_url('resolve_positions/'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_history(self):
+        # 读取标注，再用一条 select_related(modified_by) 查询读取全部历史
+        with self.assertNumQueries(2):
+            response = self.request('get', self.detail_url('history/'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_history_version(self):
+        self.request('put', self.detail_url('update_content/'), {'merge_patch': {'education': {'md': 'Harvard'}}})
+        # 读取标注；还原版本：定位该版本的历史行、最近的快照、其后的差量
+        with self.assertNumQueries(4):
+            response = self.request('get', self.detail_url('history/?version=2'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_rollback(self):
+        self.request('put', self.detail_url('update_content/'), {'merge_patch': {'education': {'md': 'Harvard'}}})
+        # 读取最新标注、还原目标版本（3 条），再按 update_content 的方式创建新版本（3 条加保存点）
+        with self.assertNumQueries(9):
+            response = self.request('post', f'/api/annotations/{self.file_id}/rollback/', {'version': 1})
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_verify(self):
+        items = [
+            {'field_path': f'honors.{i}', 'pdf_content': f'Award {i}',
+             'json_content': {'honors': [f'Award {i}']}, 'is_correct': True}
+            for i in range(20)
+        ]
+        # 读取文件类型；事务中批量写入标注和历史（各一条 INSERT）、同步进度汇总行，外加保存点。
+        # 预算与条目数无关
+        with self.assertNumQueries(6):
+            response = self.request('post', '/api/annotations/batch_verify/', {
+                'file_id': self.file_id, 'annotations': items
+            })
+        self.assertEqual(response.status_code, 201)
+
+    def test_destroy(self):
+        # 读取标注、删除它的历史和它本身，再用剩余的最新标注同步进度汇总行（读取 + UPDATE）
+        with self.assertNumQueries(5):
+            response = self.request('delete', self.detail_url())
+        self.assertEqual(response.status_code, 204)
+
+
+class HotQueryIndexTests(TestCase):
+    """热点查询使用对应的复合 / 部分索引"""
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == 'postgresql':
+            # 测试数据很少，关闭顺序扫描以确认索引可用
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        # SQLite 为唯一约束创建的索引使用自动生成的名字
+        if index_name.endswith('_uniq') and connection.vendor == 'sqlite':
+            self.assertIn('sqlite_autoindex', plan)
+        else:
+            self.assertIn(index_name, plan)
+
+    def test_annotation_live_version(self):
+        self.assertUsesIndex(
+            Annotation.objects.filter(file_id=1, is_deleted=False).order_by('-version')[:1],
+            'annotation_live_version_idx'
+        )
+
+    def test_history_version(self):
+        self.assertUsesIndex(
+            AnnotationHistory.objects.filter(annotation_id=1, version=1),
+            'history_annotation_version_uniq'
+        )
+
+    def test_history_time(self):
+        self.assertUsesIndex(
+            AnnotationHistory.objects.filter(annotation_id=1).order_by('-modified_at', '-id')[:100],
+            'history_annotation_time_idx'
+        )
+
+    def test_file_live_uploaded(self):
+        self.assertUsesIndex(
+            File.objects.filter(is_deleted=False).order_by('-uploaded_at', '-id')[:50],
+            'file_live_uploaded_idx'
+        )
+
+    def test_fileprogress_live_group(self):
+        self.assertUsesIndex(
+            FileProgress.objects.filter(is_deleted=False, file_type='cv')
+            .values('file_type', 'status', 'uploaded_on').annotate(total=Sum('total_fields'))
+            .order_by('file_type', 'status', 'uploaded_on'),
+            'fileprogress_live_group_idx'
+        )
+
+    def test_file_deleted(self):
+        self.assertUsesIndex(
+            File.objects.filter(is_deleted=True, deleted_at__lt=timezone.now()).order_by('deleted_at', 'id')[:200],
+            'file_deleted_idx'
+        )
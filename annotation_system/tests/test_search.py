@@ -0,0 +1,31 @@
+"""全文搜索：标注中超出索引上限的文本照常保存，只是不参与搜索"""
+import copy
+
+from annotation_system.models import Annotation
+from annotation_system.search import ANNOTATION_TEXT_LIMIT
+
+from .utils import SAMPLE_JSON, SeededTestCase
+
+
+class OversizedAnnotationSearchTests(SeededTestCase):
+    def json_hits(self, query):
+        response = self.request('get', '/api/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [
+            hit for result in response.data['results'] for hit in result['hits']
+            if hit['source'] == 'json'
+        ]
+
+    def test_text_past_the_limit_is_saved_but_not_indexed(self):
+        # 互不相同的词，完整建立 tsvector 会超过 PostgreSQL 的 1MB 上限
+        words = [f'w{i}' for i in range(200000)]
+        text = ' '.join(words)
+        self.assertGreater(len(text), ANNOTATION_TEXT_LIMIT * 10)
+        content = copy.deepcopy(SAMPLE_JSON)
+        content['honors'] = [text]
+        response = self.request('put', self.detail_url('update_content/'), {'json_content': content})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Annotation.objects.get(pk=self.annotation_id).json_content['honors'], [text])
+
+        self.assertEqual([hit['annotation_id'] for hit in self.json_hits('w5')], [self.annotation_id])
+        self.assertEqual(self.json_hits(words[-1]), [])
@@ -0,0 +1,75 @@
+"""测试共用的样例数据和通过上传接口准备种子数据的基类"""
+import json
+import shutil
+import tempfile
+
+import fitz
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from annotation_system.models import Annotation
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='annotation-tests-')
+
+SAMPLE_JSON = {
+    'personal_info': {'name': 'Sean Wu', 'title': 'Professor', 'address': 'Stanford',
+                      'contact_info': {'email': 'sean@example.org'}},
+    'education': {'phd': 'Stanford University'},
+    'appointments': {'current': 'Professor of Medicine'},
+    'honors': ['Award A', 'Award B'],
+    'publications': {'peer_reviewed_articles': ['Article 1', 'Article 2']},
+    'grants': {'r01': 'NIH R01'},
+}
+
+
+def pdf_bytes(label, pages=3):
+    pdf_doc = fitz.open()
+    for i in range(pages):
+        pdf_doc.new_page().insert_text((72, 72), f'{label} page {i + 1}')
+    data = pdf_doc.tobytes()
+    pdf_doc.close()
+    return data
+
+
+def upload(client, name, content=None):
+    return client.post('/api/files/', {
+        'name': name,
+        'file_type': 'cv',
+        'pdf_file': SimpleUploadedFile(f'{name}.pdf', pdf_bytes(name), 'application/pdf'),
+        'json_file': SimpleUploadedFile(
+            f'{name}.json', json.dumps(content or SAMPLE_JSON).encode(), 'application/json'
+        ),
+    }, format='multipart')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PRERENDER_ENABLED=False)
+class SeededTestCase(TestCase):
+    """通过上传接口写入 seed_files 个文件；file_id / annotation_id 为最后一个"""
+    seed_files = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('tester')
+        client = APIClient()
+        client.force_authenticate(cls.user)
+        for i in range(cls.seed_files):
+            response = upload(client, f'seed-{i}')
+        cls.file_id = response.data['id']
+        cls.annotation_id = Annotation.objects.get(file_id=cls.file_id).pk
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request(self, method, url, data=None, **headers):
+        return getattr(self.client, method)(url, data, format='json', **headers)
+
+    def detail_url(self, suffix=''):
+        return f'/api/annotations/{self.annotation_id}/{suffix}'
@@ -3,7 +3,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
-from .views import FileViewSet, AnnotationViewSet, LoginView
+from .views import FileViewSet, AnnotationViewSet, LoginView, SearchView, serve_preview
+from . import async_views
 
 # 创建路由器
 router = DefaultRouter()
@@ -14,4 +15,12 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),  # API 路由
     path('api/auth/login/', LoginView.as_view()),
+    path('api/search/', SearchView.as_view()),
+    # ASGI 下的异步接口，PDF 处理在进程池中执行
+    path('api/async/files/<int:pk>/preview/', async_views.preview),
+    path('api/async/files/<int:pk>/pdf_info/', async_views.pdf_info),
+    path('api/async/files/<int:pk>/progress/', async_views.progress),
+    path('api/async/metrics/', async_views.metrics),
+    # 预览图片按内容寻址，带上永久缓存的响应头
+    path(f'{settings.MEDIA_URL.lstrip("/")}previews/cache/<path:path>', serve_preview),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)  # 媒体文件服务 
\ No newline at end of file
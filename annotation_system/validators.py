@@ -1,77 +1,282 @@
-from django.core.exceptions import ValidationError
-import json
-
-def validate_cv_json(json_content):
-    """
-    验证简历JSON格式，基于Sean Wu CV的结构
-    """
-    try:
-        # 检查是否为空
-        if not json_content:
-            raise ValidationError('JSON内容不能为空')
-            
-        # 检查是否为字典类型
-        if not isinstance(json_content, dict):
-            raise ValidationError('JSON内容必须是对象类型')
-            
-        # 定义必要字段
-        required_fields = [
-            'personal_info',
-            'education',
-            'appointments',
-            'honors',
-            'publications',
-            'grants'
-        ]
-        
-        missing_fields = [field for field in required_fields if field not in json_content]
-        if missing_fields:
-            raise ValidationError(f'缺少以下必要字段: {", ".join(missing_fields)}')
-            
-        # 验证 personal_info 字段
-        if 'personal_info' in json_content:
-            personal_info = json_content['personal_info']
-            if not isinstance(personal_info, dict):
-                raise ValidationError('personal_info必须是对象类型')
-                
-            # 检查个人信息必要字段
-            required_personal_fields = ['name', 'title', 'address', 'contact_info']
-            missing_personal_fields = [field for field in required_personal_fields 
-                                     if field not in personal_info]
-            if missing_personal_fields:
-                raise ValidationError(f'personal_info缺少以下字段: {", ".join(missing_personal_fields)}')
-                
-            # 验证联系信息
-            if not isinstance(personal_info['contact_info'], dict):
-                raise ValidationError('contact_info必须是对象类型')
-        
-        # 验证 education 字段
-        if 'education' in json_content:
-            education = json_content['education']
-            if not isinstance(education, dict):
-                raise ValidationError('education必须是对象类型')
-                
-        # 验证 appointments 字段
-        if 'appointments' in json_content:
-            appointments = json_content['appointments']
-            if not isinstance(appointments, dict):
-                raise ValidationError('appointments必须是对象类型')
-                
-        # 验证 publications 字段
-        if 'publications' in json_content:
-            publications = json_content['publications']
-            if not isinstance(publications, dict):
-                raise ValidationError('publications必须是对象类型')
-                
-            if 'peer_reviewed_articles' in publications:
-                if not isinstance(publications['peer_reviewed_articles'], list):
-                    raise ValidationError('peer_reviewed_articles必须是数组类型')
-                    
-            if 'book_chapters' in publications:
-                if not isinstance(publications['book_chapters'], list):
-                    raise ValidationError('book_chapters必须是数组类型')
-                
-    except ValidationError as e:
-        raise e
-    except Exception as e:
-        raise ValidationError(f'JSON格式验证失败: {str(e)}') 
\ No newline at end of file
+"""
+标注 JSON 的格式校验
+
+每种文件类型（File.file_type）的格式在 SCHEMAS 中声明，语法是 JSON Schema 的一个子集：
+type、properties、required、additionalProperties、items、minItems、minLength、maxLength、enum。
+schema 在第一次使用时编译为嵌套的校验函数并缓存，校验时不再解释 schema；
+没有约束的子树编译为 None，不会被遍历。校验收集全部错误，每个错误带字段路径。
+
+字段被验证后键名或列表中的字符串值会带上验证后缀（见 progress），
+匹配 properties / required 和检查字符串约束时去掉后缀。
+"""
+from functools import lru_cache
+
+from rest_framework import serializers
+
+from .progress import VERIFIED_SUFFIX
+
+_SUFFIX_LENGTH = len(VERIFIED_SUFFIX)
+_MISSING = object()
+
+# schema 类型 -> (对应的 Python 类型, 错误信息中的名称)
+TYPES = {
+    'object': ((dict,), '对象'),
+    'array': ((list,), '数组'),
+    'string': ((str,), '字符串'),
+    'number': ((int, float), '数字'),
+    'integer': ((int,), '整数'),
+    'boolean': ((bool,), '布尔值'),
+    'null': ((type(None),), 'null'),
+}
+# JSON 值的 Python 类型 -> 错误信息中的名称
+_LABELS = {dict: '对象', list: '数组', str: '字符串', int: '整数', float: '数字', bool: '布尔值', type(None): 'null'}
+
+# 单个字段的值：字符串、数字或空；也可以是带 value / verified 的对象或嵌套的子字段
+TEXT = {
+    'type': ['string', 'number', 'null', 'object'],
+    'properties': {'verified': {'type': 'boolean'}},
+}
+# 一个分段：以名称为键的对象，或条目数组
+SECTION = {'type': ['object', 'array']}
+ENTRIES = {'type': ['object', 'array'], 'additionalProperties': TEXT, 'items': TEXT}
+ARTICLE = {
+    'type': ['string', 'object'],
+    'properties': {
+        'title': TEXT,
+        'authors': {'type': ['string', 'array'], 'items': TEXT},
+        'journal': TEXT,
+        'year': {'type': ['string', 'integer']},
+    },
+}
+ARTICLES = {'type': 'array', 'items': ARTICLE}
+
+CV_SECTIONS = ['personal_info', 'education', 'appointments', 'honors', 'publications', 'grants']
+
+SCHEMAS = {
+    'cv': {
+        'type': 'object',
+        'required': CV_SECTIONS,
+        'properties': {
+            # Annotation.FIELD_ORDER 中的其他分段只要求是对象或数组
+            **{name: SECTION for name in (
+                'clinical_activities', 'clinical_trials', 'community_services', 'editorial_services',
+                'grant_review_services', 'patents', 'presentations', 'professional_organization_services',
+                'teaching_and_training_activities', 'trainees', 'university_administrative_services',
+            )},
+            'personal_info': {
+                'type': 'object',
+                'required': ['name', 'title', 'address', 'contact_info'],
+                'properties': {
+                    'name': TEXT,
+                    'title': TEXT,
+                    'address': TEXT,
+                    'contact_info': {'type': 'object', 'additionalProperties': TEXT},
+                },
+            },
+            'education': ENTRIES,
+            'appointments': ENTRIES,
+            'honors': ENTRIES,
+            'grants': ENTRIES,
+            'publications': {
+                'type': 'object',
+                'properties': {'peer_reviewed_articles': ARTICLES, 'book_chapters': ARTICLES},
+                'additionalProperties': SECTION,
+            },
+        },
+    },
+    'paper': {
+        'type': 'object',
+        'properties': {
+            'title': TEXT,
+            'authors': {'type': ['string', 'array'], 'items': TEXT},
+            'abstract': TEXT,
+            'keywords': {'type': ['string', 'array'], 'items': TEXT},
+            'sections': SECTION,
+            'references': ARTICLES,
+        },
+    },
+    'report': {
+        'type': 'object',
+        'properties': {
+            'title': TEXT,
+            'author': TEXT,
+            'date': TEXT,
+            'summary': TEXT,
+            'sections': SECTION,
+        },
+    },
+    'other': {'type': 'object'},
+}
+
+
+def format_path(path):
+    """(父路径, 键) 链 -> 'a.b.0'"""
+    parts = []
+    while path is not None:
+        path, key = path
+        parts.append(str(key))
+    return '.'.join(reversed(parts))
+
+
+def _error(errors, path, message):
+    errors.append({'path': format_path(path), 'message': message})
+
+
+def _strip(key):
+    return key[:-_SUFFIX_LENGTH] if key.endswith(VERIFIED_SUFFIX) else key
+
+
+def _json_type(value):
+    """值对应的 JSON 类型（Python 类型）；JSON 解析结果都是精确类型，子类按基类处理"""
+    cls = value.__class__
+    if cls in _LABELS:
+        return cls
+    for base in (bool, dict, list, str, int, float):
+        if isinstance(value, base):
+            return base
+    return cls
+
+
+def _object_check(schema):
+    properties = {name: _compile(sub) for name, sub in schema.get('properties', {}).items()}
+    required = tuple(schema.get('required', ()))
+    additional = schema.get('additionalProperties', True)
+    closed = additional is False
+    extra = _compile(additional) if isinstance(additional, dict) else None
+    if not required and not closed and extra is None and not any(properties.values()):
+        return None
+
+    def check(value, path, errors):
+        for key, item in value.items():
+            # 大多数键没有验证后缀，先按原键名查找
+            sub = properties.get(key, _MISSING)
+            if sub is _MISSING and key.endswith(VERIFIED_SUFFIX):
+                sub = properties.get(key[:-_SUFFIX_LENGTH], _MISSING)
+            if sub is _MISSING:
+                if closed:
+                    _error(errors, (path, key), '不允许的字段')
+                    continue
+                sub = extra
+            if sub is not None:
+                sub(item, (path, key), errors)
+        for name in required:
+            if name not in value and name + VERIFIED_SUFFIX not in value:
+                _error(errors, path, f'缺少必要字段 {name}')
+    return check
+
+
+def _array_check(schema):
+    items = _compile(schema['items']) if 'items' in schema else None
+    min_items = schema.get('minItems', 0)
+    if items is None and not min_items:
+        return None
+
+    def check(value, path, errors):
+        if len(value) < min_items:
+            _error(errors, path, f'至少需要 {min_items} 项')
+        if items is not None:
+            for index, item in enumerate(value):
+                items(item, (path, index), errors)
+    return check
+
+
+def _string_check(schema):
+    min_length = schema.get('minLength', 0)
+    max_length = schema.get('maxLength')
+    enum = frozenset(schema['enum']) if 'enum' in schema else None
+    if not min_length and max_length is None and enum is None:
+        return None
+
+    def check(value, path, errors):
+        value = _strip(value)
+        if len(value) < min_length:
+            _error(errors, path, f'长度不能少于 {min_length}')
+        if max_length is not None and len(value) > max_length:
+            _error(errors, path, f'长度不能超过 {max_length}')
+        if enum is not None and value not in enum:
+            _error(errors, path, f'必须是 {", ".join(sorted(enum))} 之一')
+    return check
+
+
+def _compile(schema):
+    """schema -> check(值, 路径, 错误列表)；没有任何约束时返回 None。
+    每个节点只有一个闭包：按值的精确类型判断是否允许，再分派到对象、数组或字符串的检查"""
+    names = schema.get('type')
+    if isinstance(names, str):
+        names = [names]
+    # bool 不是 int 的子类型：只有声明了 boolean 才允许
+    allowed = frozenset(t for name in names for t in TYPES[name][0]) if names else None
+    expected = '或'.join(TYPES[name][1] for name in names) if names else ''
+    on_object = _object_check(schema)
+    on_array = _array_check(schema)
+    on_string = _string_check(schema)
+    if allowed is None and on_object is None and on_array is None and on_string is None:
+        return None
+
+    def check(value, path, errors):
+        cls = value.__class__
+        if cls not in _LABELS:
+            cls = _json_type(value)
+        if allowed is not None and cls not in allowed:
+            _error(errors, path, f'应为{expected}，实际为{_LABELS.get(cls, cls.__name__)}')
+        elif cls is dict:
+            if on_object is not None:
+                on_object(value, path, errors)
+        elif cls is list:
+            if on_array is not None:
+                on_array(value, path, errors)
+        elif cls is str and on_string is not None:
+            on_string(value, path, errors)
+    return check
+
+
+def _subschema(schema, parts):
+    """按字段路径找到子 schema；路径超出 schema 描述的范围时返回空 schema"""
+    for part in parts:
+        part = _strip(part)
+        if part.isdigit() and 'items' in schema:
+            schema = schema['items']
+        elif part in schema.get('properties', {}):
+            schema = schema['properties'][part]
+        elif isinstance(schema.get('additionalProperties'), dict):
+            schema = schema['additionalProperties']
+        else:
+            return {}
+    return schema
+
+
+@lru_cache(maxsize=256)
+def compiled(file_type, parts=()):
+    """编译好的校验函数；parts 为按字段保存的标注所在的路径（数字下标统一为 0）"""
+    schema = SCHEMAS.get(file_type, SCHEMAS['other'])
+    return _compile(_subschema(schema, parts))
+
+
+def field_parts(field_path):
+    if field_path in ('', 'root', None):
+        return ()
+    return tuple('0' if part.isdigit() else part for part in field_path.split('.'))
+
+
+def validate_content(file_type, content, field_path='root'):
+    """返回全部错误 [{'path': 字段路径, 'message': 说明}]，没有错误时返回空列表"""
+    parts = field_parts(field_path)
+    check = compiled(file_type, parts)
+    if check is None:
+        return []
+    errors = []
+    root = None
+    for part in (field_path.split('.') if parts else ()):
+        root = (root, part)
+    check(content, root, errors)
+    return errors
+
+
+def check_content(file_type, content, field_path='root'):
+    """内容不符合文件类型的格式时抛出 ValidationError（400），列出全部错误"""
+    errors = validate_content(file_type, content, field_path)
+    if errors:
+        raise serializers.ValidationError({
+            'error': f'JSON 内容不符合 {file_type} 格式，共 {len(errors)} 处错误',
+            'errors': errors,
+        })
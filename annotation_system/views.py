@@ -2,20 +2,74 @@ from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.core.files.storage import default_storage
-from django.db.models import Count, F
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import (
+    Case, Count, F, FloatField, IntegerField, Max, OuterRef, Subquery, Value, When
+)
+from django.db.models.functions import Cast, Coalesce, Round
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
-import hashlib
+from django.shortcuts import get_object_or_404
+from django.views.static import serve
 import json
-import fitz
+import logging
 import os
+import tempfile
+import zipfile
 from datetime import datetime
-from .models import File, Annotation, AnnotationHistory
-from .serializers import FileSerializer, AnnotationSerializer, AnnotationHistorySerializer
-from .validators import validate_cv_json
+from .models import (
+    File, FileProgress, Annotation, AnnotationHistory, BatchJob, PageText, VersionConflict
+)
+from .serializers import (
+    FileSerializer, AnnotationSerializer, AnnotationHistorySerializer, BatchJobSerializer
+)
+from .validators import check_content
+from .docpool import doc_pool
+from .preview_cache import CACHE_DIR, normalize_zoom, preview_cache, source_key
+from .conditional import (
+    IMMUTABLE, PreconditionFailed, annotation_validators, if_match, make_etag, not_modified, with_validators
+)
+from .prerender import prerenderer
+from .ingest import extract_pages, load_json, sha256_of, store_blob
+from .progress import file_progress, progress_payload
+from .parsers import JSONPatchParser, MergePatchParser
+from .history import build_history, content_at, record_history
+from .jsonpatch import JsonPatchError, to_pointer
+from .batch import validate_items, write_batch
+from .importer import FileImporter
+from .jobs import job_runner
+from .export import export_queryset, iter_rows, stream_csv, write_xlsx
+from .filters import filter_export, filter_history
+from .pagination import FileCursorPagination, HistoryCursorPagination
+from .search import search
+from .dashboard import dashboard as progress_dashboard
+from .response_cache import annotation_cache
+from .positions import WordIndex, annotation_prefix, iter_values, resolve_content
+
+logger = logging.getLogger(__name__)
+
+
+def _history_unavailable(annotation_id, version, error):
+    """历史差量无法回放时返回 409，而不是让请求以 500 结束"""
+    logger.error('标注 %s 的版本 %s 无法从历史记录还原: %s', annotation_id, version, error)
+    return Response(
+        {'error': f'标注 {annotation_id} 的版本 {version} 无法从历史记录还原: {error}'},
+        status=status.HTTP_409_CONFLICT
+    )
+
+def serve_preview(request, path):
+    """提供缓存的预览图片；文件名包含内容校验和，可以永久缓存"""
+    response = serve(request, path, document_root=os.path.join(settings.MEDIA_ROOT, CACHE_DIR))
+    response['ETag'] = make_etag('preview-image', path)
+    response['Cache-Control'] = IMMUTABLE
+    return response
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
@@ -38,48 +92,144 @@ class LoginView(APIView):
             status=status.HTTP_401_UNAUTHORIZED
         )
 
+def with_progress(queryset):
+    """在同一条查询中附加每个文件的标注数和最新版本标注的进度"""
+    annotations = Annotation.objects.filter(file=OuterRef('pk'), is_deleted=False)
+    latest = annotations.order_by('-version')
+    annotation_count = annotations.order_by().values('file').annotate(
+        count=Count('id')
+    ).values('count')
+    return queryset.annotate(
+        annotation_count=Coalesce(Subquery(annotation_count, output_field=IntegerField()), 0),
+        latest_total_fields=Subquery(latest.values('total_fields')[:1]),
+        latest_verified_fields=Subquery(latest.values('verified_fields')[:1]),
+    ).annotate(
+        progress=Case(
+            When(
+                latest_total_fields__gt=0,
+                then=Round(
+                    Cast('latest_verified_fields', FloatField()) * 100 / F('latest_total_fields'), 2
+                )
+            ),
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+    )
+
+# 历史列表只需要这些列，跳过体积较大的内容字段
+HISTORY_LIST_FIELDS = (
+    'id', 'annotation', 'version', 'change_type', 'change_description',
+    'modified_at', 'verification_status', 'modified_by__username'
+)
+
+def stream_ndjson(queryset, serializer_class, chunk_size=2000):
+    """逐行序列化查询结果，内存占用与总行数无关"""
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        data = serializer_class(instance).data
+        yield json.dumps(data, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+
+def job_response(request, job_id, kind):
+    """返回当前用户某个后台任务的状态和结果"""
+    job = BatchJob.objects.filter(pk=job_id, kind=kind, created_by=request.user).first()
+    if job is None:
+        return Response(
+            {'error': f'找不到 ID 为 {job_id} 的批量任务'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(BatchJobSerializer(job).data)
+
+def run_import(importer, source, cleanup=None):
+    """后台任务：执行导入，结束后删除临时上传的压缩包"""
+    try:
+        return importer.run(source)
+    finally:
+        if cleanup:
+            os.remove(cleanup)
+
+class SearchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """在 PDF 文本和标注 JSON 中全文搜索，返回按相关度排序的文件及其页面命中和摘要"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': '必须提供搜索关键词 q'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        file_type = request.query_params.get('file_type')
+        if file_type and file_type not in dict(File.FILE_TYPES):
+            return Response(
+                {'error': f'未知的文件类型: {file_type}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response(
+                {'error': 'limit 必须是整数'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = search(query, limit=limit, file_type=file_type)
+        return Response({'query': query, 'count': len(results), 'results': results})
+
 class FileViewSet(viewsets.ModelViewSet):
     queryset = File.objects.all()
     serializer_class = FileSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FileCursorPagination
 
     def get_queryset(self):
         # 只返回未删除的文件
-        return super().get_queryset().filter(is_deleted=False)
+        queryset = super().get_queryset().filter(is_deleted=False)
+        if self.action in ('list', 'retrieve'):
+            queryset = with_progress(queryset.select_related('uploaded_by'))
+        return queryset
 
     def perform_create(self, serializer):
         pdf_file = self.request.FILES['pdf_file']
         json_file = self.request.FILES['json_file']
         
         try:
-            # 处理PDF文件
-            pdf_file.seek(0)
-            pdf_content = pdf_file.read()
-            checksum = hashlib.sha256(pdf_content).hexdigest()
-            
-            # 获取PDF元数据
-            pdf_doc = fitz.open(stream=pdf_content, filetype="pdf")
-            page_count = len(pdf_doc)
-            file_size = len(pdf_content)
-            
-            # 验证并读取JSON
-            json_file.seek(0)
-            json_content = json.load(json_file)
-            
-            # 重置文件指针
-            pdf_file.seek(0)
-            json_file.seek(0)
+            # 先读取并校验 JSON，格式不符时不写入任何文件
+            json_content = load_json(json_file)
+            check_content(serializer.validated_data.get('file_type', 'other'), json_content)
+
+            # 流式计算校验和，不把整个PDF读入内存
+            checksum = sha256_of(pdf_file)
+            file_size = pdf_file.size
+
+            # 相同内容已存储过时直接复用 blob、页数和各页文本，跳过 PDF 解析
+            existing = File.find_blob(checksum)
+            texts = None
+            if existing and default_storage.exists(existing.pdf_file.name):
+                pdf_name = existing.pdf_file.name
+                page_count = existing.page_count
+                texts = list(existing.pages.order_by('page').values_list('text', flat=True)) or None
+            else:
+                pdf_name = None
+            if texts is None:
+                texts = extract_pages(pdf_file)
+                page_count = len(texts)
+            if pdf_name is None:
+                # 大文件以临时文件上传，存储时会被移走，必须在提取文本之后
+                pdf_name = store_blob(pdf_file, checksum)
             
-            # 保存文件
+            # 保存文件；启用预渲染时先标记为处理中，渲染完成后变为 ready
             file_instance = serializer.save(
+                pdf_file=pdf_name,
                 uploaded_by=self.request.user,
-                status='ready',
+                status='processing' if settings.PRERENDER_ENABLED else 'ready',
                 checksum=checksum,
                 page_count=page_count,
                 file_size=file_size,
                 metadata={'json_structure': list(json_content.keys())}
             )
             
+            # 保存每页文本，供全文搜索
+            PageText.objects.bulk_create(PageText.for_file(file_instance, texts))
+
             # 创建一个初始标注，包含整个 JSON
             annotation = Annotation.objects.create(
                 file=file_instance,
@@ -96,63 +246,52 @@ class FileViewSet(viewsets.ModelViewSet):
             )
             
             # 创建初始历史记录
-            AnnotationHistory.objects.create(
-                annotation=annotation,
-                field_path='root',
-                old_value=None,
-                new_value=json_content,  # 保存完整的 JSON
-                pdf_content='',
-                position={},
-                verification_status='pending',
+            build_history(
+                annotation, self.request.user,
                 change_type='create',
-                change_description='创建初始JSON',
-                modified_by=self.request.user,
-                version=1
-            )
+                description='创建初始JSON'
+            ).save()
+
+            # 进度汇总行，供看板聚合
+            FileProgress.for_file(file_instance, annotation).save(force_insert=True)
+
+            if settings.PRERENDER_ENABLED:
+                transaction.on_commit(lambda: prerenderer.enqueue(file_instance))
             
             return file_instance
             
+        except serializers.ValidationError:
+            raise
         except Exception as e:
             raise serializers.ValidationError(f'文件处理失败: {str(e)}')
 
-    def _get_field_type(self, field_path):
-        """根据字段路径判断字段类型"""
-        if field_path.startswith('personal_info'):
-            return 'personal_info'
-        elif field_path.startswith('education'):
-            return 'education'
-        elif field_path.startswith('work_experience'):
-            return 'work_experience'
-        elif field_path.startswith('skills'):
-            return 'skills'
-        elif field_path.startswith('projects'):
-            return 'projects'
-        elif field_path.startswith('certificates'):
-            return 'certificates'
-        elif field_path.startswith('languages'):
-            return 'languages'
-        else:
-            return 'others'
-
     @action(detail=True, methods=['get'])
     def preview(self, request, pk=None):
         file = self.get_object()
         page = request.query_params.get('page', 1)
+        zoom = request.query_params.get('zoom', 1.0)
         try:
             page = int(page)
-            pdf_doc = fitz.open(file.pdf_file.path)
-            if 1 <= page <= len(pdf_doc):
-                page_obj = pdf_doc[page-1]
-                pix = page_obj.get_pixmap()
-                preview_dir = os.path.join(settings.MEDIA_ROOT, 'previews')
-                os.makedirs(preview_dir, exist_ok=True)
-                preview_path = os.path.join('previews', f'{file.id}_page_{page}.png')
-                pix.save(os.path.join(settings.MEDIA_ROOT, preview_path))
-                return Response({
+            total_pages = file.page_count
+            if total_pages <= 0:
+                # 老数据没有记录页数时才打开 PDF
+                with doc_pool.document(file) as pdf_doc:
+                    total_pages = len(pdf_doc)
+            if 1 <= page <= total_pages:
+                zoom = normalize_zoom(zoom)
+                etag = make_etag('preview', source_key(file), page, zoom, total_pages)
+                # 每个请求只查一次缓存，命中率统计才准确；预览按内容寻址，
+                # 图片在缓存中（或刚重新渲染出来）时客户端已有的响应依然有效
+                preview_path, cached = preview_cache.get_or_render(file, page, zoom)
+                response = not_modified(request, etag)
+                if response is not None:
+                    return response
+                return with_validators(Response({
                     'preview_url': request.build_absolute_uri(settings.MEDIA_URL + preview_path),
                     'page': page,
-                    'total_pages': len(pdf_doc)
-                })
+                    'total_pages': total_pages,
+                    'cached': cached
+                }), etag)
             return Response(
                 {'error': 'Invalid page number'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -163,37 +302,106 @@ class FileViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_files(self, request):
+        """批量导入：上传 zip（archive）或指定 IMPORT_ROOT 下的目录（path），在后台执行"""
+        archive = request.FILES.get('archive')
+        path = request.data.get('path')
+        file_type = request.data.get('file_type', 'cv')
+        if file_type not in dict(File.FILE_TYPES):
+            return Response(
+                {'error': f'未知的文件类型: {file_type}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        checkpoint = cleanup = None
+        if archive is not None:
+            # 上传的临时文件在请求结束后会被删除，复制一份给后台任务
+            with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as fh:
+                for chunk in archive.chunks():
+                    fh.write(chunk)
+            source = cleanup = fh.name
+            if not zipfile.is_zipfile(source):
+                os.remove(source)
+                return Response(
+                    {'error': 'archive 必须是 zip 文件'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        elif path and settings.IMPORT_ROOT:
+            root = os.path.realpath(settings.IMPORT_ROOT)
+            source = os.path.realpath(os.path.join(root, path))
+            if not source.startswith(root + os.sep) or not os.path.isdir(source):
+                return Response(
+                    {'error': f'导入目录不存在: {path}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # 与 import_files 命令共用检查点，中断后可重新提交继续导入
+            checkpoint = f'{source}.import-checkpoint'
+        else:
+            return Response(
+                {'error': '必须上传 archive，或在配置了 IMPORT_ROOT 时提供 path'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        importer = FileImporter(request.user, file_type=file_type, checkpoint_path=checkpoint)
+        job = BatchJob.objects.create(kind='import', created_by=request.user)
+        transaction.on_commit(
+            lambda: job_runner.submit(job.id, run_import, importer, source, cleanup)
+        )
+        return Response(
+            {
+                **BatchJobSerializer(job).data,
+                'status_url': request.build_absolute_uri(f'/api/files/import_jobs/{job.id}/')
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=False, methods=['get'], url_path=r'import_jobs/(?P<job_id>\d+)')
+    def import_job(self, request, job_id=None):
+        """查询批量导入任务的状态和统计"""
+        return job_response(request, job_id, 'import')
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """缓存命中统计"""
+        return Response({
+            'preview_cache': preview_cache.stats(),
+            'document_pool': doc_pool.stats(),
+            'annotation_cache': annotation_cache.stats()
+        })
+
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        """按文件类型、状态、上传人、上传日期分组的进度统计；?ids= 时附带这些文件各自的进度"""
+        try:
+            return Response(progress_dashboard(request.query_params))
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
     @action(detail=True, methods=['get'])
     def progress(self, request, pk=None):
         file = self.get_object()
         try:
-            # 获取最新版本的标注
-            annotation = file.annotations.filter(is_deleted=False).order_by('-version').first()
-            if not annotation:
+            # 直接读取最新版本标注上维护的计数，不加载 json_content
+            counts = file.annotations.filter(is_deleted=False).order_by('-version').values(
+                'id', 'version', 'updated_at', 'total_fields', 'verified_fields', 'section_progress'
+            ).first()
+            if not counts:
                 return Response(
                     {'error': '找不到标注'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            
-            json_content = annotation.json_content
-            total_fields = count_total_fields(json_content)
-            verified_fields = count_verified_fields(json_content)  # 计算带有 -comlhj 后缀的字段数
-            progress = (verified_fields / total_fields * 100) if total_fields > 0 else 0
-            
-            # 更新文件的 metadata
-            file.metadata = {
-                **file.metadata,
-                'total_fields': total_fields,
-                'verified_fields': verified_fields,
-                'progress': round(progress, 2)
-            }
-            file.save()
-            
-            return Response({
-                'total_fields': total_fields,
-                'verified_fields': verified_fields,
-                'progress': round(progress, 2)
-            })
+
+            etag, last_modified = annotation_validators(counts, 'progress')
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+            return with_validators(
+                Response(file_progress(counts, Annotation.FIELD_ORDER)), etag, last_modified
+            )
         except Exception as e:
             return Response(
                 {'error': str(e)},
@@ -202,65 +410,134 @@ class FileViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
+        """文件所有标注的历史记录，游标分页；stream=1 时以 NDJSON 流式导出全部匹配记录"""
         file = self.get_object()
-        annotations = file.annotations.all()
         history = AnnotationHistory.objects.filter(
-            annotation__in=annotations
-        ).order_by('-modified_at')
-        serializer = AnnotationHistorySerializer(history, many=True)
-        return Response(serializer.data)
+            annotation__file_id=file.id
+        ).select_related('modified_by').only(*HISTORY_LIST_FIELDS)
+        try:
+            history = filter_history(history, request.query_params)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.query_params.get('stream') in ('1', 'true'):
+            response = StreamingHttpResponse(
+                stream_ndjson(history.order_by('-modified_at', '-id'), AnnotationHistorySerializer),
+                content_type='application/x-ndjson'
+            )
+            response['Content-Disposition'] = f'attachment; filename="file-{file.id}-history.ndjson"'
+            return response
+
+        paginator = HistoryCursorPagination()
+        page = paginator.paginate_queryset(history, request, view=self)
+        serializer = AnnotationHistorySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['get'])
     def pdf_info(self, request, pk=None):
         file = self.get_object()
         try:
-            pdf_doc = fitz.open(file.pdf_file.path)
-            return Response({
+            etag = make_etag('pdf_info', file.id, file.checksum, file.pdf_file.name, file.name,
+                             file.page_count)
+            response = not_modified(request, etag, file.uploaded_at)
+            if response is not None:
+                return response
+
+            total_pages = file.page_count
+            if total_pages <= 0:
+                with doc_pool.document(file) as pdf_doc:
+                    total_pages = len(pdf_doc)
+            return with_validators(Response({
                 'pdf_url': request.build_absolute_uri(file.pdf_file.url),
-                'total_pages': len(pdf_doc),
+                'total_pages': total_pages,
                 'file_name': file.name,
                 'file_size': file.file_size,
                 'uploaded_at': file.uploaded_at
-            })
+            }), etag, file.uploaded_at)
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    def perform_update(self, serializer):
+        file = serializer.save()
+        # 汇总表冗余保存了可编辑的文件属性
+        FileProgress.objects.filter(file=file).update(file_type=file.file_type, is_deleted=file.is_deleted)
+
     def perform_destroy(self, instance):
-        try:
-            # 删除本地文件
-            if instance.pdf_file and os.path.isfile(instance.pdf_file.path):
-                os.remove(instance.pdf_file.path)
-            if instance.json_file and os.path.isfile(instance.json_file.path):
-                os.remove(instance.json_file.path)
-            
-            # 软删除文件和相关标注
-            instance.soft_delete(self.request.user)
-            
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except Exception as e:
-            return Response(
-                {'error': f'删除失败: {str(e)}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # 只做软删除；PDF、JSON、预览图片和相关数据在保留期过后由 purge_deleted 清理
+        doc_pool.invalidate(instance.pk)
+        instance.soft_delete(self.request.user)
 
 class AnnotationViewSet(viewsets.ModelViewSet):
     queryset = Annotation.objects.all()
     serializer_class = AnnotationSerializer
     permission_classes = [IsAuthenticated]
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES + [JSONPatchParser, MergePatchParser]
 
     def get_queryset(self):
-        # 只返回未删除的标注
+        # 只返回未删除的标注；修改内容时要按文件类型校验
         queryset = super().get_queryset().filter(is_deleted=False)
+        if self.action not in ('list', 'retrieve'):
+            queryset = queryset.select_related('file')
         file_id = self.request.query_params.get('file_id')
         if file_id:
             # 返回文件的最新版本标注
             return queryset.filter(file_id=file_id).order_by('-version')[:1]
         return queryset.order_by('-created_at')
 
+    def list(self, request, *args, **kwargs):
+        """先用版本号和更新时间判断内容是否变化，未变化时返回 304 而不加载 json_content"""
+        queryset = self.filter_queryset(self.get_queryset())
+        values = None
+        if request.query_params.get('file_id'):
+            values = queryset.values('id', 'version', 'updated_at').first()
+            etag, last_modified = annotation_validators(values, 'list')
+        else:
+            stamp = queryset.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+            last_modified = stamp['updated_at']
+            etag = make_etag('annotations', stamp['count'],
+                             last_modified.isoformat() if last_modified else None)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        if values is not None and self._cacheable(request):
+            # 列表只有这一条标注，与详情共用缓存项
+            body = self._cached_body(values, lambda: get_object_or_404(Annotation, pk=values['id']))
+            return with_validators(HttpResponse(b'[' + body + b']', content_type='application/json'),
+                                   etag, last_modified)
+        return with_validators(super().list(request, *args, **kwargs), etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        values = self.get_queryset().filter(pk=kwargs['pk']).values('id', 'version', 'updated_at').first()
+        if values is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag, last_modified = annotation_validators(values, 'detail')
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        if self._cacheable(request):
+            body = self._cached_body(values, self.get_object)
+            return with_validators(HttpResponse(body, content_type='application/json'), etag, last_modified)
+        return with_validators(super().retrieve(request, *args, **kwargs), etag, last_modified)
+
+    def _cacheable(self, request):
+        # 可浏览 API 等其他格式照常渲染
+        return request.accepted_renderer.format == 'json'
+
+    def _cached_body(self, values, load):
+        """序列化后的标注 JSON，按版本缓存"""
+        body, _ = annotation_cache.get_or_render(values, load, lambda a: self.get_serializer(a).data)
+        return body
+
     def perform_create(self, serializer):
+        file = serializer.validated_data['file']
+        check_content(file.file_type, serializer.validated_data['json_content'])
+
         # 创建标注
         annotation = serializer.save(
             annotator=self.request.user,
@@ -269,83 +546,175 @@ class AnnotationViewSet(viewsets.ModelViewSet):
         )
         
         # 创建初始历史记录
-        AnnotationHistory.objects.create(
-            annotation=annotation,
-            field_path=annotation.field_path,
-            old_value=None,
-            new_value=annotation.json_content,
-            pdf_content=annotation.pdf_content,
-            position={},  # 这里也添加默认值
-            verification_status=annotation.verification_status,
+        build_history(
+            annotation, self.request.user,
             change_type='create',
-            change_description='创建初始标注',
-            modified_by=self.request.user,
-            version=1
-        )
+            description='创建初始标注',
+            field_path=annotation.field_path
+        ).save()
+        FileProgress.track(annotation)
+
+    def perform_destroy(self, instance):
+        file_id = instance.file_id
+        instance.delete()
+        # 删除的可能正是汇总行的来源标注
+        FileProgress.refresh(file_id)
+
+    def handle_exception(self, exc):
+        # 乐观并发：版本已被其他请求修改返回 409，If-Match 不一致返回 412
+        if isinstance(exc, VersionConflict):
+            return Response(
+                {'error': str(exc), 'current_version': exc.current_version},
+                status=status.HTTP_409_CONFLICT
+            )
+        if isinstance(exc, PreconditionFailed):
+            return Response(
+                {'error': str(exc), 'current_version': exc.current_version},
+                status=status.HTTP_412_PRECONDITION_FAILED
+            )
+        return super().handle_exception(exc)
+
+    def _check_preconditions(self, request, annotation):
+        """检查客户端期望修改的版本：If-Match 须与标注当前的 ETag（详情或 ?file_id 列表）一致，
+        expected_version（请求体或查询参数）须等于当前版本；都未提供时以本次读取到的版本为准"""
+        values = {'id': annotation.id, 'version': annotation.version, 'updated_at': annotation.updated_at}
+        if not if_match(request, [annotation_validators(values, kind)[0] for kind in ('detail', 'list')]):
+            raise PreconditionFailed('If-Match 与标注的当前 ETag 不一致，请重新获取后再修改', annotation.version)
+
+        expected = request.query_params.get('expected_version')
+        media_type = (request.content_type or '').split(';')[0].strip()
+        if (expected is None and isinstance(request.data, dict)
+                and media_type not in (JSONPatchParser.media_type, MergePatchParser.media_type)):
+            # 补丁请求体本身就是修改内容，只能通过查询参数传递期望版本
+            expected = request.data.get('expected_version')
+        if expected is None:
+            return
+        try:
+            expected = int(expected)
+        except (TypeError, ValueError):
+            raise serializers.ValidationError({'error': 'expected_version 必须是整数'})
+        if expected != annotation.version:
+            raise VersionConflict(annotation.id, expected, annotation.version)
+
+    def _check_content(self, annotation):
+        """写入前按文件类型的格式校验标注内容"""
+        check_content(annotation.file.file_type, annotation.json_content, annotation.field_path)
+
+    def _save_version(self, annotation, bump=True, fields=(), **history):
+        """以读取到的版本为条件写入标注；bump 时版本号加一，并在同一事务中记录历史"""
+        if not bump:
+            annotation.save_version(annotation.version, annotation.updated_at, bump=False, fields=fields)
+            return
+        with transaction.atomic():
+            annotation.save_version(annotation.version, annotation.updated_at, fields=fields)
+            record_history(annotation, self.request.user, **history)
 
     def perform_update(self, serializer):
         annotation = serializer.instance
-        old_content = annotation.json_content
-        new_content = serializer.validated_data.get('json_content', old_content)
+        self._check_preconditions(self.request, annotation)
+        data = dict(serializer.validated_data)
+        data.pop('version', None)
         
+        # 更新标注
+        annotation.set_json_content(data.pop('json_content', annotation.json_content))
+        for name, value in data.items():
+            setattr(annotation, name, value)
+        self._check_content(annotation)
+
         # 创建新的历史记录
-        AnnotationHistory.objects.create(
-            annotation=annotation,
-            field_path='root',
-            old_value=old_content,
-            new_value=new_content,
-            pdf_content=annotation.pdf_content,
-            position=annotation.position,
-            verification_status=serializer.validated_data.get('verification_status', annotation.verification_status),
+        self._save_version(
+            annotation, fields=list(data),
             change_type='update',
-            change_description=f'更新 JSON 版本 {annotation.version + 1}',
-            modified_by=self.request.user,
-            version=annotation.version + 1
+            description=f'更新 JSON 版本 {annotation.version + 1}'
         )
-        
-        # 更新标注
-        annotation = serializer.save(
-            version=annotation.version + 1,
-            updated_at=timezone.now()
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """把标注展开为字段行导出；export_format 为 csv（默认，流式）或 xlsx"""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in ('csv', 'xlsx'):
+            return Response(
+                {'error': 'export_format 必须是 csv 或 xlsx'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            annotations = filter_export(export_queryset(), request.query_params)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        filename = f'annotations-{timezone.now():%Y%m%d-%H%M%S}.{export_format}'
+        if export_format == 'csv':
+            response = StreamingHttpResponse(
+                stream_csv(iter_rows(annotations)), content_type='text/csv; charset=utf-8'
+            )
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+
+        # XLSX 需要完整的 zip 结构，先写入临时文件再流式发送
+        fh = tempfile.TemporaryFile()
+        try:
+            write_xlsx(iter_rows(annotations), fh)
+        except RuntimeError as e:
+            fh.close()
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        fh.seek(0)
+        return FileResponse(
+            fh, as_attachment=True, filename=filename,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
 
     @action(detail=False, methods=['post'])
     def batch_verify(self, request):
-        """批量验证字段"""
+        """批量验证字段：整批校验后在一个事务中写入；超过阈值时转为后台任务"""
         file_id = request.data.get('file_id')
-        annotations = request.data.get('annotations', [])
-        
-        results = []
-        for anno in annotations:
-            field_path = anno['field_path']
-            pdf_content = anno['pdf_content']
-            json_content = anno['json_content']
-            position = anno['position']
-            
-            # 创建或更新标注
-            annotation = Annotation.objects.create(
-                file_id=file_id,
-                field_type=get_field_type(field_path),
-                field_path=field_path,
-                pdf_content=pdf_content,
-                json_content=json_content,
-                position=position,
-                verification_status='verified' if anno['is_correct'] else 'incorrect',
-                is_correct=anno['is_correct'],
-                confidence_score=anno['confidence_score'],
-                comment=anno['comment'],
-                annotator=request.user
+        file_type = File.objects.filter(pk=file_id, is_deleted=False).values_list('file_type', flat=True).first()
+        if file_type is None:
+            return Response(
+                {'error': f'找不到 ID 为 {file_id} 的文件'},
+                status=status.HTTP_404_NOT_FOUND
             )
-            
-            results.append(annotation)
-        
-        serializer = self.get_serializer(results, many=True)
-        return Response(serializer.data)
+
+        items, errors = validate_items(request.data.get('annotations'), file_type)
+        if errors is not None:
+            return Response(
+                {'error': '批量数据校验失败', 'results': errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(items) > settings.BATCH_VERIFY_ASYNC_THRESHOLD:
+            job = BatchJob.objects.create(
+                file_id=file_id, total=len(items), created_by=request.user
+            )
+            transaction.on_commit(
+                lambda: job_runner.submit(job.id, write_batch, file_id, items, request.user)
+            )
+            return Response(
+                {
+                    **BatchJobSerializer(job).data,
+                    'status_url': request.build_absolute_uri(f'/api/annotations/batch_jobs/{job.id}/')
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        results = write_batch(file_id, items, request.user)
+        return Response({'created': len(results), 'results': results}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path=r'batch_jobs/(?P<job_id>\d+)')
+    def batch_job(self, request, job_id=None):
+        """查询后台批量任务的状态和结果"""
+        return job_response(request, job_id, 'batch_verify')
 
     @action(detail=True, methods=['post'])
     def add_missing_field(self, request, pk=None):
         """添加PDF中发现但JSON中缺失的字段"""
         annotation = self.get_object()
+        self._check_preconditions(request, annotation)
         field_path = request.data.get('field_path')
         pdf_content = request.data.get('pdf_content')
         position = request.data.get('position')
@@ -354,7 +723,10 @@ class AnnotationViewSet(viewsets.ModelViewSet):
         annotation.pdf_content = pdf_content
         annotation.position = position
         annotation.comment = f"JSON中缺失字段: {field_path}"
-        annotation.save()
+        self._save_version(
+            annotation, bump=False,
+            fields=('verification_status', 'pdf_content', 'position', 'comment')
+        )
         
         return Response(self.get_serializer(annotation).data)
 
@@ -363,71 +735,113 @@ class AnnotationViewSet(viewsets.ModelViewSet):
         """回滚到指定版本"""
         try:
             # 获取标注对象
-            try:
-                annotation = Annotation.objects.get(file_id=pk)
-            except Annotation.DoesNotExist:
+            annotation = Annotation.objects.filter(
+                file_id=pk, is_deleted=False
+            ).select_related('file').order_by('-version').first()
+            if annotation is None:
                 return Response(
                     {'error': f'找不到 ID 为 {pk} 的标注记录'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
             version = request.data.get('version')
-            historyId = request.data.get('historyId')
             if not version:
                 return Response(
                     {'error': '必须提供目标版本号'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            print(f"Debug: annotation_id={pk}, version={version}")
-            
-            # 获取指定版本的历史记录
-            history = AnnotationHistory.objects.filter(
-                annotation_id=annotation.id,
-                version=version
-            ).first()
+            # 从快照和差量还原指定版本的内容
+            try:
+                content = content_at(annotation.id, version)
+            except JsonPatchError as e:
+                return _history_unavailable(annotation.id, version, e)
             
-            if not history:
+            if content is None:
                 return Response(
                     {'error': f'标注 {annotation.id} 的版本 {version} 不存在'},
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            print(f"Debug: found history record: {history.id}")
-            
-            # 保存当前版本到历史记录
-            AnnotationHistory.objects.create(
-                annotation=annotation,
-                field_path='root',
-                old_value=annotation.json_content,
-                new_value=history.new_value,
-                pdf_content=annotation.pdf_content,
-                position=annotation.position,
-                verification_status=annotation.verification_status,
+            # 更新标注为历史版本的内容，并记录回滚
+            self._check_preconditions(request, annotation)
+            annotation.set_json_content(content)
+            self._check_content(annotation)
+            self._save_version(
+                annotation,
                 change_type='rollback',
-                change_description=f'回滚到版本 {version}',
-                modified_by=request.user,
-                version=annotation.version + 1
+                description=f'回滚到版本 {version}'
             )
             
-            # 更新标注为历史版本的内容
-            annotation.json_content = history.new_value
-            annotation.version += 1
-            annotation.save()
-            
             return Response(self.get_serializer(annotation).data)
             
+        except (VersionConflict, PreconditionFailed, serializers.ValidationError):
+            raise
         except Exception as e:
-            print(f"Error in rollback: {str(e)}")
+            logger.exception('标注 %s 回滚失败', pk)
             return Response(
                 {'error': f'回滚失败: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """标注的历史记录；提供 version 参数时返回该版本还原后的完整内容"""
+        annotation = self.get_object()
+        version = request.query_params.get('version')
+        if version is None:
+            history = annotation.history.select_related('modified_by').order_by('-version', '-id')
+            return Response(AnnotationHistorySerializer(history, many=True).data)
+
+        try:
+            version = int(version)
+        except ValueError:
+            return Response(
+                {'error': '版本号必须是整数'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            content = content_at(annotation.id, version)
+        except JsonPatchError as e:
+            return _history_unavailable(annotation.id, version, e)
+        if content is None:
+            return Response(
+                {'error': f'标注 {annotation.id} 的版本 {version} 不存在'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({'version': version, 'data': content})
+
+    @action(detail=True, methods=['post'])
+    def resolve_positions(self, request, pk=None):
+        """为 JSON 的每个字段值在 PDF 中定位，候选位置按字段路径保存到 field_positions（不创建新版本）"""
+        annotation = self.get_object()
+        self._check_preconditions(request, annotation)
+        try:
+            with doc_pool.document(annotation.file) as pdf_doc:
+                index = WordIndex.from_document(pdf_doc)
+        except Exception as e:
+            return Response(
+                {'error': f'无法读取 PDF: {str(e)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 解析期间标注被修改时，按读取到的版本条件写入会返回 409
+        positions = resolve_content(index, annotation.json_content, annotation_prefix(annotation))
+        annotation.field_positions = positions
+        self._save_version(annotation, bump=False, fields=('field_positions',))
+        total = sum(1 for _ in iter_values(annotation.json_content, annotation_prefix(annotation)))
+        return Response({
+            'version': annotation.version,
+            'resolved': len(positions),
+            'unresolved': total - len(positions),
+            'positions': positions
+        })
+
     @action(detail=True, methods=['POST'])
     def verify_field(self, request, pk=None):
         """更新特定字段的验证状态"""
         annotation = self.get_object()
+        self._check_preconditions(request, annotation)
         field_path = request.data.get('field_path')  # 例如: "personal_info.name.first_name"
         verified = request.data.get('verified', True)
         
@@ -438,40 +852,35 @@ class AnnotationViewSet(viewsets.ModelViewSet):
             )
             
         # 更新字段验证状态
-        json_content = annotation.json_content
         path_parts = field_path.split('.')
         
-        # 递归更新指定字段的验证状态
+        # 递归查找指定字段，返回设置验证状态的 JSON Patch 操作；字段所在的对象不存在时返回 None
         def update_field(data, parts):
+            if not isinstance(data, dict):
+                return None
             if len(parts) == 1:
                 if isinstance(data.get(parts[0]), dict) and 'value' in data[parts[0]]:
-                    data[parts[0]]['verified'] = verified
-                return True
+                    return [{'op': 'add', 'path': to_pointer(path_parts + ['verified']), 'value': verified}]
+                return []
             if parts[0] in data:
                 return update_field(data[parts[0]], parts[1:])
-            return False
+            return None
             
-        if update_field(json_content, path_parts):
-            # 创建新的历史记录
-            AnnotationHistory.objects.create(
-                annotation=annotation,
-                field_path=field_path,
-                old_value=None,
-                new_value={'verified': verified},
-                pdf_content=annotation.pdf_content,
-                position=annotation.position,
-                verification_status='verified' if verified else 'pending',
+        operations = update_field(annotation.json_content, path_parts)
+        if operations is not None:
+            # 以补丁更新标注：只统计修改的字段，历史记录直接保存这一操作
+            annotation.apply_json_patch(operations)
+            self._check_content(annotation)
+
+            # 创建新的版本和历史记录
+            self._save_version(
+                annotation,
                 change_type='verify',
-                change_description=f'{"验证" if verified else "取消验证"}字段 {field_path}',
-                modified_by=request.user,
-                version=annotation.version + 1
+                description=f'{"验证" if verified else "取消验证"}字段 {field_path}',
+                field_path=field_path,
+                verification_status='verified' if verified else 'pending'
             )
             
-            # 更新标注
-            annotation.json_content = json_content
-            annotation.version += 1
-            annotation.save()
-            
             return Response(self.get_serializer(annotation).data)
         
         return Response(
@@ -479,183 +888,149 @@ class AnnotationViewSet(viewsets.ModelViewSet):
             status=status.HTTP_404_NOT_FOUND
         )
 
-    @action(detail=True, methods=['PUT'])
-    def verify(self, request, pk=None):
-        """更新当前版本的 JSON（字段验证状态）"""
+    def _read_changes(self, request):
+        """解析请求中的修改，返回 (类型, 内容)：
+        patch 为 RFC 6902 操作数组，merge 为 RFC 7396 merge patch，full 为完整的 json_content；
+        没有提供修改时返回 None"""
+        data = request.data
+        media_type = (request.content_type or '').split(';')[0].strip()
+        if media_type == JSONPatchParser.media_type:
+            return 'patch', data
+        if media_type == MergePatchParser.media_type:
+            return 'merge', data
+        if isinstance(data, dict) and 'patch' in data:
+            return 'patch', data['patch']
+        if isinstance(data, dict) and 'merge_patch' in data:
+            return 'merge', data['merge_patch']
+        new_json = data.get('json_content') if isinstance(data, dict) else None
+        if not new_json:
+            return None
+        return 'full', new_json
+
+    def _apply_changes(self, annotation, changes):
+        kind, payload = changes
+        if kind == 'patch':
+            annotation.apply_json_patch(payload)
+        elif kind == 'merge':
+            annotation.apply_merge_patch(payload)
+        else:
+            annotation.set_json_content(payload)
+        self._check_content(annotation)
+
+    def _patch_response(self, annotation):
+        """补丁请求只返回新版本号和进度，不回传整个 JSON"""
+        return Response({
+            'id': annotation.id,
+            'version': annotation.version,
+            'updated_at': annotation.updated_at.isoformat(),
+            'progress': progress_payload(annotation.total_fields, annotation.verified_fields)
+        })
+
+    def _edit_current_version(self, request, error_prefix=''):
+        """修改当前版本的 JSON（不创建新版本），并同步文件进度"""
         annotation = self.get_object()
-        new_json = request.data.get('json_content')
+        self._check_preconditions(request, annotation)
+        changes = self._read_changes(request)
         
-        if not new_json:
+        if changes is None:
             return Response(
                 {'error': '必须提供 json_content'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         try:
-            # 直接更新当前版本的标注
-            annotation.json_content = new_json
-            annotation.save()
-            
-            # 计算新的进度
-            total_fields = count_total_fields(new_json)
-            verified_fields = count_verified_fields(new_json)
-            progress = (verified_fields / total_fields * 100) if total_fields > 0 else 0
+            # 直接更新当前版本的标注，只重新统计变化的字段；
+            # 以读取到的版本和更新时间为条件，并发的就地修改不会互相覆盖
+            self._apply_changes(annotation, changes)
+            self._save_version(annotation, bump=False)
             
             # 更新文件进度
+            progress = progress_payload(annotation.total_fields, annotation.verified_fields)
             file = annotation.file
             file.metadata = {
-                **file.metadata,
-                'total_fields': total_fields,
-                'verified_fields': verified_fields,
-                'progress': round(progress, 2)
+                **(file.metadata or {}),
+                **progress
             }
-            file.save()
-            
+            file.save(update_fields=['metadata'])
+
+            if changes[0] != 'full':
+                return self._patch_response(annotation)
             return Response({
                 'annotation': self.get_serializer(annotation).data,
-                'progress': {
-                    'total_fields': total_fields,
-                    'verified_fields': verified_fields,
-                    'progress': round(progress, 2)
-                }
+                'progress': progress
             })
             
+        except (VersionConflict, serializers.ValidationError):
+            raise
         except Exception as e:
             return Response(
-                {'error': str(e)},
+                {'error': f'{error_prefix}{str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    @action(detail=True, methods=['PUT'])
-    def update_content(self, request, pk=None):
-        """创建新版本（修改内容）"""
-        annotation = self.get_object()
-        new_json = request.data.get('json_content')
-        
-        if not new_json:
-            return Response(
-                {'error': '必须提供 json_content'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+    def _create_version(self, annotation, changes):
+        """应用修改并创建新版本及历史记录"""
+        self._apply_changes(annotation, changes)
+        self._save_version(
+            annotation,
+            change_type='update',
+            description='更新 JSON 内容',
+            verification_status='pending'
+        )
+
+    def partial_update(self, request, *args, **kwargs):
+        """PATCH 支持 JSON Patch / merge patch 请求体，其余情况按普通的部分更新处理"""
+        changes = self._read_changes(request)
+        if changes is None or changes[0] == 'full':
+            return super().partial_update(request, *args, **kwargs)
 
+        annotation = self.get_object()
+        self._check_preconditions(request, annotation)
         try:
-            # 创建历史记录
-            AnnotationHistory.objects.create(
-                annotation=annotation,
-                field_path='root',
-                old_value=annotation.json_content,
-                new_value=new_json,
-                pdf_content=annotation.pdf_content,
-                position=annotation.position,
-                verification_status='pending',
-                change_type='update',
-                change_description='更新 JSON 内容',
-                modified_by=request.user,
-                version=annotation.version + 1
-            )
-            
-            # 更新标注
-            annotation.json_content = new_json
-            annotation.version += 1
-            annotation.save()
-            
-            return Response(self.get_serializer(annotation).data)
-            
+            self._create_version(annotation, changes)
+        except (VersionConflict, serializers.ValidationError):
+            raise
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        return self._patch_response(annotation)
 
-    @action(detail=True, methods=['PUT'])
-    def edit_field(self, request, pk=None):
-        """编辑字段值（不创建新版本）"""
+    @action(detail=True, methods=['PUT', 'PATCH'])
+    def verify(self, request, pk=None):
+        """更新当前版本的 JSON（字段验证状态）"""
+        return self._edit_current_version(request)
+
+    @action(detail=True, methods=['PUT', 'PATCH'])
+    def update_content(self, request, pk=None):
+        """创建新版本（修改内容）"""
         annotation = self.get_object()
-        new_json = request.data.get('json_content')
+        self._check_preconditions(request, annotation)
+        changes = self._read_changes(request)
         
-        if not new_json:
+        if changes is None:
             return Response(
                 {'error': '必须提供 json_content'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         try:
-            # 直接更新当前版本的标注
-            annotation.json_content = new_json
-            annotation.save()
-            
-            # 计算新的进度
-            total_fields = count_total_fields(new_json)
-            verified_fields = count_verified_fields(new_json)
-            progress = (verified_fields / total_fields * 100) if total_fields > 0 else 0
-            
-            # 更新文件进度
-            file = annotation.file
-            file.metadata = {
-                **file.metadata,
-                'total_fields': total_fields,
-                'verified_fields': verified_fields,
-                'progress': round(progress, 2)
-            }
-            file.save()
+            self._create_version(annotation, changes)
             
-            return Response({
-                'annotation': self.get_serializer(annotation).data,
-                'progress': {
-                    'total_fields': total_fields,
-                    'verified_fields': verified_fields,
-                    'progress': round(progress, 2)
-                }
-            })
+            if changes[0] != 'full':
+                return self._patch_response(annotation)
+            return Response(self.get_serializer(annotation).data)
             
+        except (VersionConflict, serializers.ValidationError):
+            raise
         except Exception as e:
             return Response(
-                {'error': f'编辑失败: {str(e)}'},
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-def traverse_json(obj):
-    """递归遍历JSON对象，计算字段数"""
-    if isinstance(obj, dict):
-        for key, value in obj.items():
-            yield key
-            yield from traverse_json(value)
-    elif isinstance(obj, list):
-        for item in obj:
-            yield from traverse_json(item)
-
-def count_verified_fields(json_obj):
-    """计算已验证的字段数（带有 -comlhj 后缀的字段或值）"""
-    count = 0
-    if isinstance(json_obj, dict):
-        for key, value in json_obj.items():
-            if key.endswith('-comlhj'):
-                count += 1
-            if isinstance(value, (dict, list)):
-                count += count_verified_fields(value)
-    elif isinstance(json_obj, list):
-        for item in json_obj:
-            if isinstance(item, str) and item.endswith('-comlhj'):
-                count += 1
-            elif isinstance(item, (dict, list)):
-                count += count_verified_fields(item)
-    return count
-
-def count_total_fields(json_obj):
-    """计算总字段数"""
-    count = 0
-    if isinstance(json_obj, dict):
-        for key, value in json_obj.items():
-            # 去掉后缀计算总数
-            key = key.replace('-comlhj', '')
-            count += 1
-            if isinstance(value, (dict, list)):
-                count += count_total_fields(value)
-    elif isinstance(json_obj, list):
-        for item in json_obj:
-            if isinstance(item, str):
-                # 去掉后缀计算总数
-                count += 1
-            elif isinstance(item, (dict, list)):
-                count += count_total_fields(item)
-    return count 
\ No newline at end of file
+    @action(detail=True, methods=['PUT', 'PATCH'])
+    def edit_field(self, request, pk=None):
+        """编辑字段值（不创建新版本）"""
+        return self._edit_current_version(request, error_prefix='编辑失败: ')